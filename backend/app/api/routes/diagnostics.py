@@ -1,8 +1,11 @@
 import os
 import requests
-from fastapi import APIRouter, Query
+import orjson
+from fastapi import APIRouter, Query, Response
+from app.core import response_cache
 from app.core.config import get_settings
 from app.services.mercadolivre_service import meli_request, MeliAuthError
+from app.services.meli_concurrency import concurrency_metrics
 
 router = APIRouter(prefix="/diagnostics/meli")
 
@@ -38,10 +41,30 @@ async def meli_whoami():
 @router.get("/items-sample")
 async def meli_items_sample(limit: int = Query(5, ge=1, le=50)):
     settings = get_settings()
-    try:
+
+    async def _calcular() -> str:
         payload = await meli_request("GET", f"/users/{settings.ML_SELLER_ID}/items/search", params={"status": "active", "limit": limit})
         total = int(payload.get("paging", {}).get("total", 0))
         sample_ids = payload.get("results", [])[:limit]
-        return {"status_code": 200, "total": total, "sample_ids": sample_ids}
+        return orjson.dumps({"status_code": 200, "total": total, "sample_ids": sample_ids}).decode("utf-8")
+
+    try:
+        # Erros de autenticação não vão para o cache (a exceção atravessa obter_async)
+        body = await response_cache.obter_async(
+            "meli_items_sample", (limit,), ("meli_items",), response_cache.ttl_de("meli_items_sample", 60), _calcular
+        )
+        return Response(body, media_type="application/json")
     except MeliAuthError as e:
-        return {"status_code": e.status, "total": 0, "sample_ids": []}
\ No newline at end of file
+        return {"status_code": e.status, "total": 0, "sample_ids": []}
+
+
+@router.get("/response-cache")
+def response_cache_metrics():
+    """Hits/misses do cache de respostas (este processo e o total no Redis)."""
+    return response_cache.metricas()
+
+
+@router.get("/concurrency")
+def meli_concurrency():
+    """Janela AIMD atual (requisições em voo permitidas) das importações: deste processo e dos workers (via Redis)."""
+    return concurrency_metrics()
@@ -1,16 +1,29 @@
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlmodel import Session, select
-from sqlalchemy import asc, desc, func
+from sqlalchemy import asc, desc
 
 from app.core.database import get_session
 from app.schemas.produto import ProdutoCreate, ProdutoRead
 from app.repositories.produto_repo import (
     create_produto,
     list_produtos,
-    save_product,
     get_by_sku,
+    filtros_produto,
+    list_produtos_keyset,
+    coluna_ordenacao,
+    colunas_listagem,
 )
+from app.repositories.produto_count_repo import chave_contagem, contar_produtos
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.db_schema import search_schema_ready
+from app.core import response_cache
+from app.core.http_cache import cabecalhos_cache, etag_da_requisicao, gerar_etag, nao_modificado, resposta_304, versao_tabela
+from app.repositories.produto_search_repo import rank_busca
+from app.services.estoque_export_service import FORMATOS, iter_exportacao
 from app.services.mercadolivre_service import (
     get_meli_products,
     normalize_meli_product,
@@ -28,54 +41,127 @@ from time import perf_counter
 router = APIRouter(prefix="/estoque")
 
 
-@router.get("")
+@router.get("", response_class=ORJSONResponse)
 def get_estoque(
+    request: Request,
     session: Session = Depends(get_session),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=500),
-    sort_by: str = Query("created_at"),
+    sort_by: str | None = Query(None, description="Coluna de ordenação; com busca, o padrão é 'relevancia'"),
     sort_dir: str = Query("desc"),
     origem: str | None = Query(None),
     search: str | None = Query(None),
     status: str | None = Query(None),
+    cursor: str | None = Query(None, description="Paginação por keyset: vazio na primeira página, depois o next_cursor recebido"),
+    incluir_total: bool | None = Query(None, description="Calcula o total (padrão: sim no modo página, não no modo cursor)"),
+    fields: str | None = Query(None, description="Campos separados por vírgula, 'compacto' (padrão) ou 'completo'; id e a coluna de ordenação sempre vêm"),
 ):
+    # GET condicional: produto inalterado desde a última resposta => 304 sem rodar a listagem
+    versao = versao_tabela(session, "produto")
+    headers = {}
+    if versao is not None:
+        etag = etag_da_requisicao(request, "produto", versao[0])
+        if nao_modificado(request, etag, versao[1]):
+            return resposta_304(etag, versao[1])
+        headers = cabecalhos_cache(etag, versao[1])
+
+    sort_dir = "desc" if sort_dir.lower() == "desc" else "asc"
+    search = search.strip() if search else None
+    busca_indexada = bool(search) and search_schema_ready(session)
+    filtros = filtros_produto(origem=origem, search=search, status=status, busca_indexada=busca_indexada)
+    chave = chave_contagem(origem=origem, search=search, status=status, busca_indexada=busca_indexada)
+    if versao is not None:
+        # Com a versão na chave, escritas de outros processos também invalidam o total em cache
+        chave = (*chave, versao[0])
+    if sort_by is None:
+        sort_by = "relevancia" if search and cursor is None else "created_at"
+    sort_col = None
+    if sort_by != "relevancia" or not search:
+        try:
+            sort_col = coluna_ordenacao(sort_by)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # Padrão compacto: a tabela de estoque não usa descricao/imagens (fields=completo traz tudo)
+        colunas = colunas_listagem(fields or "compacto", obrigatorias=("id", sort_col.key) if sort_col is not None else ("id",))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Modo cursor: sem OFFSET, custo constante em qualquer profundidade
+    after = None
+    if cursor is not None:
+        if sort_by == "relevancia":
+            raise HTTPException(status_code=400, detail="ordenação por relevância não suporta cursor")
+        if cursor:
+            try:
+                after = decode_cursor(cursor, sort_by, sort_dir)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    def _calcular() -> str:
+        if cursor is not None:
+            payload = _listar_cursor(session, filtros, chave, colunas, sort_by, sort_dir, size, after, incluir_total)
+        else:
+            payload = _listar_pagina(
+                session, filtros, chave, colunas, sort_col, sort_by, sort_dir, page, size, incluir_total,
+                rank=rank_busca(search, indexada=busca_indexada) if sort_col is None else None,
+            )
+        return orjson.dumps(payload).decode("utf-8")
+
+    # Cache no Redis por query string normalizada; escritas em produto invalidam a tag "produto".
+    # A versão da tabela entra na chave para o corpo em cache ser sempre o do ETag enviado.
+    partes = (sorted(request.query_params.multi_items()),)
+    if versao is not None:
+        partes = (*partes, versao[0])
+    body = response_cache.obter(
+        "estoque", partes, ("produto",), response_cache.ttl_de("estoque", 30), _calcular
+    )
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _listar_cursor(session, filtros, chave, colunas, sort_by, sort_dir, size, after, incluir_total) -> dict:
+    items, proximo = list_produtos_keyset(
+        session, filtros, sort_by=sort_by, sort_dir=sort_dir, size=size, after=after, colunas=colunas
+    )
+    total, total_exact = contar_produtos(session, filtros, chave) if incluir_total else (None, None)
+    return {
+        "items": [r._asdict() for r in items],
+        "size": size,
+        "next_cursor": encode_cursor(sort_by, sort_dir, *proximo) if proximo else None,
+        "total": total,
+        "total_exact": total_exact,
+    }
+
+
+def _listar_pagina(session, filtros, chave, colunas, sort_col, sort_by, sort_dir, page, size, incluir_total, rank=None) -> dict:
     from app.models.produto import Produto
-    sort_col = getattr(Produto, sort_by, Produto.created_at)
-    order = desc(sort_col) if sort_dir.lower() == "desc" else asc(sort_col)
-    
-    # Build the base query with filters
-    query = select(Produto)
-    count_query = select(func.count()).select_from(Produto)
-    
-    # Apply filters
-    if origem:
-        query = query.where(Produto.origem == origem)
-        count_query = count_query.where(Produto.origem == origem)
-    
-    if search:
-        search_filter = (
-            (Produto.sku.ilike(f"%{search}%")) |
-            (Produto.titulo.ilike(f"%{search}%"))
-        )
-        query = query.where(search_filter)
-        count_query = count_query.where(search_filter)
-    
-    if status:
-        query = query.where(Produto.status == status.upper())
-        count_query = count_query.where(Produto.status == status.upper())
-    
-    # Get total count
-    total = session.exec(count_query).one()
-    
-    # Apply pagination and ordering
-    query = query.order_by(order).offset((page - 1) * size).limit(size)
+    if sort_col is None:
+        order = desc(rank)
+    else:
+        order = desc(sort_col) if sort_dir == "desc" else asc(sort_col)
+    tiebreak = desc(Produto.id) if sort_dir == "desc" else asc(Produto.id)
+
+    # Total em cache por filtro; em listagens amplas pode ser a estimativa do planner (total_exact=False)
+    total, total_exact = None, None
+    if incluir_total is not False:
+        total, total_exact = contar_produtos(session, filtros, chave)
+
+    # Página como tuplas só das colunas pedidas, serializadas direto pelo orjson
+    query = select(*colunas).where(*filtros).order_by(order, tiebreak).offset((page - 1) * size).limit(size)
     items = session.exec(query).all()
+    # Cursor da última linha: permite continuar em modo keyset a partir desta página
+    next_cursor = None
+    if len(items) == size and sort_col is not None:
+        ultimo = items[-1]
+        next_cursor = encode_cursor(sort_by, sort_dir, getattr(ultimo, sort_col.key), ultimo.id)
     return {
-        "items": [ProdutoRead.model_validate(i).model_dump() for i in items],
+        "items": [r._asdict() for r in items],
         "page": page,
         "size": size,
         "total": total,
-        "total_pages": (total + size - 1) // size,  # Ceiling division
+        "total_pages": (total + size - 1) // size if total is not None else None,  # Ceiling division
+        "total_exact": total_exact,
+        "next_cursor": next_cursor,
     }
 
 
@@ -93,15 +179,12 @@ def importar_meli_endpoint(
     limit: int = Query(100, ge=1, le=500),
     dias: int | None = Query(None, ge=1, le=30),
     novos: bool = Query(False),
-    session: Session = Depends(get_session),
 ):
     try:
         logger.info({"event": "IMPORT_MELI_START", "limit": limit, "dias": dias, "novos": novos})
+        # Os itens já são gravados lote a lote pelo pipeline de importação
         result = importar_meli(limit=limit, dias=dias, novos=novos)
-        count = 0
-        for normalized in result.get("items", []):
-            save_product(session, normalized)
-            count += 1
+        count = result.get("importados", 0)
         tempo_exec = result.get("tempo_execucao")
         logger.info({"event": "IMPORT_MELI_DONE", "importados": count, "duracao": tempo_exec})
         return {
@@ -159,36 +242,81 @@ def publicar_shopify(session: Session = Depends(get_session)):
         raise HTTPException(status_code=500, detail="Falha ao publicar no Shopify")
 
 
-@router.get("/sincronizar")
-def sincronizar(session: Session = Depends(get_session)):
+# Nomes usados pelo /sincronizar para algumas colunas de produto
+_SINCRONIZAR_ALIAS = {"estoque_atual": "estoque", "updated_at": "data_importacao"}
+_SINCRONIZAR_FIELDS = "sku,titulo,preco,estoque_atual,origem,updated_at"
+
+
+@router.get("/sincronizar", response_class=ORJSONResponse)
+def sincronizar(
+    request: Request,
+    session: Session = Depends(get_session),
+    fields: str | None = Query(None, description="Campos de produto separados por vírgula ou 'compacto'"),
+):
     try:
-        # Retorna lista de itens normalizados para o frontend
-        produtos, _ = list_produtos(session, page=1, size=250)
-        itens = []
-        for p in produtos:
-            try:
-                itens.append({
-                    "sku": p.sku,
-                    "titulo": p.titulo,
-                    "preco": float(p.preco or 0.0),
-                    "estoque": int(p.estoque_atual or 0),
-                    "origem": p.origem,
-                    "data_importacao": getattr(p, "updated_at", None).isoformat() if getattr(p, "updated_at", None) else None,
-                })
-            except Exception as inner:
-                logger.error({"event": "sync_item_format_error", "sku": p.sku, "error": str(inner)})
-                continue
-        return {"status": "ok", "itens": itens}
+        colunas = colunas_listagem(fields or _SINCRONIZAR_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    versao = versao_tabela(session, "produto")
+    headers = {}
+    if versao is not None:
+        etag = etag_da_requisicao(request, "produto", versao[0])
+        if nao_modificado(request, etag, versao[1]):
+            return resposta_304(etag, versao[1])
+        headers = cabecalhos_cache(etag, versao[1])
+    try:
+        # Retorna lista de itens normalizados para o frontend, lendo só as colunas pedidas
+        produtos, _ = list_produtos(session, page=1, size=250, colunas=colunas)
+        itens = [{_SINCRONIZAR_ALIAS.get(k, k): v for k, v in p._asdict().items()} for p in produtos]
+        return ORJSONResponse({"status": "ok", "itens": itens}, headers=headers)
     except Exception as e:
         logger.error({"event": "sync_error", "error": str(e)})
         raise HTTPException(status_code=500, detail="Falha na sincronização")
 
 
+@router.get("/exportar")
+def exportar_estoque(
+    request: Request,
+    session: Session = Depends(get_session),
+    formato: str = Query("ndjson", description="ndjson ou csv"),
+    origem: str | None = Query(None),
+    search: str | None = Query(None),
+    status: str | None = Query(None),
+    fields: str | None = Query(None, description="Campos separados por vírgula ou 'compacto'"),
+    gzip: bool | None = Query(None, description="Comprime a resposta; padrão: conforme Accept-Encoding"),
+):
+    """Catálogo inteiro (com os mesmos filtros de GET /estoque) em streaming, com memória constante."""
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"formato inválido: {formato!r} (use {', '.join(FORMATOS)})")
+    try:
+        colunas = colunas_listagem(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    search = search.strip() if search else None
+    busca_indexada = bool(search) and search_schema_ready(session)
+    filtros = filtros_produto(origem=origem, search=search, status=status, busca_indexada=busca_indexada)
+    if gzip is None:
+        gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+
+    media_type, extensao = FORMATOS[formato]
+    headers = {"Content-Disposition": f'attachment; filename="estoque.{extensao}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    logger.info({"event": "ESTOQUE_EXPORT_START", "formato": formato, "gzip": gzip, "origem": origem, "status": status})
+    return StreamingResponse(iter_exportacao(filtros, colunas, formato=formato, gzip=gzip), media_type=media_type, headers=headers)
+
+
 @router.get("/meli/status")
-def meli_status(session: Session = Depends(get_session)):
+def meli_status(request: Request, response: Response, session: Session = Depends(get_session)):
     try:
         from sqlmodel import select
         last = session.exec(select(MLLog).order_by(MLLog.created_at.desc()).limit(1)).first()
+        # O último log é o próprio marcador: novo import => novo ETag
+        etag = gerar_etag("mllog", last.id if last else None)
+        last_modified = last.created_at if last else None
+        if nao_modificado(request, etag, last_modified):
+            return resposta_304(etag, last_modified)
+        response.headers.update(cabecalhos_cache(etag, last_modified))
         if not last:
             return {"status": "vazio"}
         return {
@@ -207,7 +335,6 @@ def meli_status(session: Session = Depends(get_session)):
 def importar_meli_todos_status_endpoint(
     limit: int = Query(20000, ge=1, le=50000),
     dias: int | None = Query(None, ge=1, le=365),
-    session: Session = Depends(get_session),
 ):
     """
     Importa TODOS os produtos do Mercado Livre (ativos, vendidos, pausados, encerrados).
@@ -216,10 +343,8 @@ def importar_meli_todos_status_endpoint(
     try:
         logger.info({"event": "IMPORT_MELI_TODOS_STATUS_START", "limit": limit, "dias": dias})
         result = importar_meli_todos_status(limit=limit, dias=dias)
-        count = 0
-        for normalized in result.get("items", []):
-            save_product(session, normalized)
-            count += 1
+        count = result.get("importados", 0)
+        stats = result.get("stats", {})
         tempo_exec = result.get("tempo_execucao")
         logger.info({"event": "IMPORT_MELI_TODOS_STATUS_DONE", "importados": count, "duracao": tempo_exec})
         return {
@@ -229,10 +354,10 @@ def importar_meli_todos_status_endpoint(
             "origem": "Mercado Livre - Todos Status",
             "tempo_execucao": tempo_exec,
             "stats": {
-                "fetched": result.get("fetched", 0),
-                "novos": result.get("novos", 0),
-                "atualizados": result.get("atualizados", 0),
-                "ignorados": result.get("ignorados_sem_mudanca", 0)
+                "fetched": stats.get("fetched", 0),
+                "novos": stats.get("novos", 0),
+                "atualizados": stats.get("atualizados", 0),
+                "ignorados": stats.get("ignorados_sem_mudanca", 0)
             }
         }
     except MeliAuthError as auth_e:
@@ -254,7 +379,6 @@ def importar_meli_todos_status_endpoint(
 @router.post("/importar-meli-incremental")
 def importar_meli_incremental_endpoint(
     hours: int = Query(24, ge=1, le=168),
-    session: Session = Depends(get_session),
 ):
     """
     Importa apenas produtos que foram modificados nas últimas horas.
@@ -263,10 +387,8 @@ def importar_meli_incremental_endpoint(
     try:
         logger.info({"event": "IMPORT_MELI_INCREMENTAL_START", "hours": hours})
         result = importar_meli_incremental(hours=hours)
-        count = 0
-        for normalized in result.get("items", []):
-            save_product(session, normalized)
-            count += 1
+        count = result.get("importados", 0)
+        stats = result.get("stats", {})
         tempo_exec = result.get("tempo_execucao")
         logger.info({"event": "IMPORT_MELI_INCREMENTAL_DONE", "importados": count, "duracao": tempo_exec})
         return {
@@ -276,10 +398,10 @@ def importar_meli_incremental_endpoint(
             "origem": "Mercado Livre - Incremental",
             "tempo_execucao": tempo_exec,
             "stats": {
-                "fetched": result.get("fetched", 0),
-                "novos": result.get("novos", 0),
-                "atualizados": result.get("atualizados", 0),
-                "ignorados": result.get("ignorados_sem_mudanca", 0)
+                "fetched": stats.get("fetched", 0),
+                "novos": stats.get("novos", 0),
+                "atualizados": stats.get("atualizados", 0),
+                "ignorados": stats.get("ignorados_sem_mudanca", 0)
             }
         }
     except MeliAuthError as auth_e:
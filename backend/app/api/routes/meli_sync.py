@@ -1,88 +1,178 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Dict, Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlmodel import Session
 
 from app.core.database import engine
+from app.core import response_cache
 from app.core.config import get_settings
-from app.repositories.meli_full_sync_job_repo import get_or_create_singleton, reset_queue, save
-from app.workers.celery_tasks import meli_full_sync
+from app.core.http_cache import cabecalhos_cache, gerar_etag, nao_modificado, resposta_304
+from app.core.logger import logger
+from app.repositories.meli_full_sync_job_repo import get_job, job_atual, jobs_ativos, listar_jobs, resumo_filhos
+from app.repositories.meli_sync_checkpoint_repo import checkpoint_aberto, checkpoint_parado
+from app.services import sync_lock, sync_scheduler
+from app.services.sync_progress import eventos_progresso, job_status
 
 
 router = APIRouter()
 
+# Modo do checkpoint de cada tipo de sync completa
+_MODOS = {"full": "FULL", "todos_status": "TODOS_STATUS"}
+
+
+def _em_execucao(session: Session, tipo: str):
+    """
+    Job do tipo em execução; um parado (worker morto: ninguém renova o lease e o checkpoint
+    está sem commit) é encerrado e libera a vaga.
+    """
+    for job in jobs_ativos(session, tipo):
+        if job.status != "running":
+            continue
+        parado = tipo in _MODOS and checkpoint_parado(checkpoint_aberto(session, _MODOS[tipo]))
+        if parado and not sync_lock.lease_ocupado(sync_scheduler.classe_do_tipo(tipo), job.id):
+            # O próximo job retoma o checkpoint de onde este parou
+            sync_scheduler.finalizar(session, job, "error", "execução parada sem progresso; retomada por um novo job")
+            continue
+        return job
+    return None
+
+
+def _solicitar(tipo: str, params: Optional[Dict] = None, exclusivo: bool = True) -> Dict:
+    with Session(engine) as session:
+        if exclusivo and _em_execucao(session, tipo) is not None:
+            raise HTTPException(status_code=409, detail={"status": "ja_em_execucao"})
+        job = sync_scheduler.solicitar(session, tipo, params)
+        return {"status": "iniciado" if job.status == "running" else "enfileirado", "job_id": job.id, "tipo": tipo}
+
 
 @router.post("/meli/sync/full-start")
 def full_start():
+    return _solicitar("full")
+
+
+def _sync_status_body() -> str:
     with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        if job.status == "running":
-            raise HTTPException(status_code=409, detail={"status": "ja_em_execucao"})
-        settings = get_settings()
-        batch_size = int(getattr(settings, "ML_FULL_SYNC_BATCH", 300))
-        job = reset_queue(session, job, batch_size)
-    meli_full_sync.delay()
-    return {"status": "iniciado"}
+        return orjson.dumps(job_status(job_atual(session))).decode("utf-8")
 
 
 @router.get("/meli/sync/status")
-def full_status():
-    with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        return {
-            "status": job.status,
-            "total_previsto": job.total_previsto,
-            "processados": job.processados,
-            "novos": job.novos,
-            "atualizados": job.atualizados,
-            "ignorados": job.ignorados,
-            "offset_atual": job.offset_atual,
-            "batch_tamanho": job.batch_tamanho,
-            "started_at": job.started_at.isoformat() if job.started_at else None,
-            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
-            "error_message": job.error_message,
-        }
+def full_status(request: Request):
+    # Cache no Redis invalidado a cada save() do job; polling de várias abas não chega ao banco
+    body = response_cache.obter(
+        "meli_sync_status", (), ("meli_sync_job",), response_cache.ttl_de("meli_sync_status", 5), _sync_status_body
+    )
+    # Uma linha só: o ETag vem do próprio corpo e poupa a transferência enquanto o job não avança
+    etag = gerar_etag("meli_sync", body)
+    if nao_modificado(request, etag):
+        return resposta_304(etag)
+    return Response(body, media_type="application/json", headers=cabecalhos_cache(etag))
+
+
+@router.get("/meli/sync/events")
+async def full_sync_events(request: Request):
+    """Progresso do job em tempo real (Server-Sent Events), publicado pelo worker via Redis pub/sub."""
+    return StreamingResponse(
+        eventos_progresso(request.is_disconnected),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: sem buffer no nginx, cada evento sai na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/meli/sync/todos-status-start")
 def todos_status_start():
     """
     Inicia sincronização completa de TODOS os produtos do Mercado Livre (ativos, vendidos, pausados, encerrados).
-    Ideal para inventários grandes (17k+ produtos).
+    Ideal para inventários grandes (17k+ produtos). Divide a vaga com a full-start: se uma estiver
+    rodando, a outra espera na fila.
     """
-    from app.workers.celery_tasks import meli_full_sync_todos_status
-    
-    with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        if job.status == "running":
-            raise HTTPException(status_code=409, detail={"status": "ja_em_execucao"})
-        # Reset do job para nova sincronização
-        settings = get_settings()
-        batch_size = 50  # Batch menor para respeitar rate limit
-        job = get_or_create_singleton(session)  # Garante singleton
-        job.status = "queued"
-        job.processados = 0
-        job.novos = 0
-        job.atualizados = 0
-        job.ignorados = 0
-        job.offset_atual = 0
-        job.batch_tamanho = batch_size
-        save(session, job)
-    
-    meli_full_sync_todos_status.delay()
-    return {"status": "iniciado", "tipo": "todos_status"}
+    return _solicitar("todos_status")
 
 
 @router.post("/meli/sync/incremental-start")
 def incremental_start(hours: int = 24):
     """
     Inicia sincronização incremental de produtos modificados nas últimas horas.
-    Ideal para atualizações frequentes (ex: a cada 15-30 minutos).
+    Ideal para atualizações frequentes (ex: a cada 15-30 minutos). Roda ao lado de uma sync
+    completa; um pedido igual que ainda espera na fila é reaproveitado.
     """
-    from app.workers.celery_tasks import meli_incremental_sync
-    
+    return {**_solicitar("incremental", {"hours": hours}, exclusivo=False), "hours": hours}
+
+
+@router.get("/meli/sync/jobs")
+def jobs_list(status: Optional[str] = None, tipo: Optional[str] = None, limit: int = 50):
     with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        if job.status == "running":
-            raise HTTPException(status_code=409, detail={"status": "ja_em_execucao"})
-    
-    meli_incremental_sync.delay(hours)
-    return {"status": "iniciado", "tipo": "incremental", "hours": hours}
\ No newline at end of file
+        return [job_status(j) for j in listar_jobs(session, status=status, tipo=tipo, limit=min(max(limit, 1), 200))]
+
+
+@router.get("/meli/sync/jobs/{job_id}")
+def jobs_get(job_id: int):
+    with Session(engine) as session:
+        job = get_job(session, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        return {**job_status(job), "params": job.params, "prioridade": job.prioridade, "shards": resumo_filhos(session, job_id)}
+
+
+class JobInput(BaseModel):
+    tipo: str
+    params: Optional[Dict] = None
+    prioridade: Optional[int] = None
+
+
+@router.post("/meli/sync/jobs")
+def jobs_create(payload: JobInput):
+    """Enfileira um job de qualquer tipo (full, todos_status, incremental) com prioridade opcional."""
+    with Session(engine) as session:
+        try:
+            job = sync_scheduler.enfileirar(session, payload.tipo, payload.params, payload.prioridade)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return job_status(job)
+
+
+@router.delete("/meli/sync/jobs/{job_id}")
+def jobs_cancel(job_id: int):
+    """Cancela um job que ainda está na fila; em execução não é interrompido (409)."""
+    with Session(engine) as session:
+        job = get_job(session, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        if not sync_scheduler.cancelar(session, job):
+            raise HTTPException(status_code=409, detail={"status": job.status})
+        return {"status": "cancelled", "job_id": job_id}
+
+
+@router.post("/meli/notificacoes")
+async def meli_notificacoes(request: Request):
+    """
+    Callback de notificações do ML (URL de notificações da aplicação, tópicos items e
+    orders_v2). Só valida e grava no stream do Redis: o ML espera a resposta em até 500 ms e
+    o worker (meli.notificacoes) sincroniza os itens em lote.
+    """
+    from app.core.redis_client import get_redis
+    from app.services import meli_notificacoes as notificacoes
+
+    if not getattr(get_settings(), "ML_NOTIFICACOES_ENABLED", False):
+        return {"status": "desativado"}
+    try:
+        payload = orjson.loads(await request.body())
+        recurso = notificacoes.validar(payload)
+    except notificacoes.NotificacaoAlheia as e:
+        logger.warning({"event": "ML_NOTIFICACAO_REJEITADA", "error": str(e)})
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if recurso is None:
+        return {"status": "ignorado", "topic": payload.get("topic")}
+    try:
+        await asyncio.to_thread(notificacoes.enfileirar, get_redis(), *recurso)
+    except Exception as e:
+        # Sem o 200 o ML reenvia a notificação mais tarde
+        logger.error({"event": "ML_NOTIFICACAO_ENQUEUE_ERROR", "topic": recurso[0], "id": recurso[1], "error": str(e)})
+        raise HTTPException(status_code=503, detail="fila de notificações indisponível")
+    return {"status": "enfileirado", "topic": recurso[0], "id": recurso[1]}
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
-from app.services.mercadolivre_service import meli_request, MeliAuthError, importar_meli_async
+from app.services.mercadolivre_service import meli_request, MeliAuthError, _iter_ids_busca
+from app.services.meli_client import MeliClient
+from app.services.meli_import_pipeline import executar_pipeline, filtro_itens
 from app.core.logger import logger
 from app.core.config import get_settings
 
@@ -24,7 +26,22 @@ async def meli_full_test():
         sample_status = e.status
         sample_ids = []
 
-    items, count = await importar_meli_async(limit=2)
+    # Importação de teste pelo pipeline, sem gravar: só conta os itens que chegariam ao banco
+    lotes = []
+
+    def contar(lote, mode):
+        lotes.append(len(lote))
+        return {}
+
+    async with MeliClient() as client:
+        await executar_pipeline(
+            client,
+            _iter_ids_busca(client, {"status": "active"}, limit=2),
+            limit=2,
+            item_filter=filtro_itens(somente_ativos=True),
+            persist=contar,
+        )
+    count = sum(lotes)
     import_status = "OK"
 
     result = {
@@ -24,9 +24,63 @@ class Settings(BaseSettings):
     MERCADOLIVRE_SEED_LIMIT: int = 10
     ML_IMPORT_LIMIT: int = 100
     ML_RATE_LIMIT: int = 250
+    ML_RATE_BURST: int = 20
+    ML_MAX_IN_FLIGHT: int = 16
+    ML_CONCURRENCY_MIN: int = 1
+    ML_CONCURRENCY_INITIAL: int = 4
+    ML_LATENCY_TARGET_MS: int = 1500
+    ML_RATE_LIMIT_BACKEND: str = "local"
     ML_IMPORT_BATCH: int = 100
     ML_FULL_SYNC_BATCH: int = 300
     ML_FULL_SYNC_MAX: int | None = None
+    # auto = COPY em massa só quando produto/snapshots estão vazios; always | never
+    ML_FULL_SYNC_BULK_LOAD: str = "auto"
+    # Sync completa distribuída: chord de shards (IDs por shard) em vez de um pipeline numa task só
+    ML_FULL_SYNC_FANOUT: bool = False
+    ML_FULL_SYNC_SHARD_SIZE: int = 200
+    ML_MULTIGET_SIZE: int = 20
+    ML_MULTIGET_RETRIES: int = 2
+    ML_IMPORT_WRITE_BATCH: int = 200
+    ML_PIPELINE_QUEUE_SIZE: int = 4
+    ML_HTTP_POOL_LIMIT: int = 20
+    ML_HTTP_POOL_LIMIT_PER_HOST: int = 20
+    ML_HTTP_DNS_TTL: int = 300
+    ML_HTTP_KEEPALIVE: int = 30
+    ML_TOKEN_CACHE_SECONDS: int = 1800
+    # SSE de progresso: heartbeat (e intervalo do fallback sem Redis), em segundos
+    ML_SYNC_EVENTS_HEARTBEAT: int = 15
+    # Sync completa: sem commit de lote por este tempo (s), a execução é dada como parada e retomada
+    ML_SYNC_CHECKPOINT_STALE: int = 900
+    # Fila de jobs de sync: quantos rodam ao mesmo tempo por classe (catálogo = full/todos_status)
+    ML_SYNC_LIMITE_CATALOGO: int = 1
+    ML_SYNC_LIMITE_INCREMENTAL: int = 1
+    # Lease no Redis por classe de sync (s; o worker renova a cada 1/3) e validade da chave de dedup de pedidos
+    ML_SYNC_LEASE_TTL: int = 120
+    # Prazo do lease entregue ao chord de shards (s): cobre a espera dos shards na fila do Celery
+    ML_SYNC_FANOUT_LEASE_TTL: int = 900
+    ML_SYNC_DEDUP_TTL: int = 3600
+    # Sync por notificações do ML (items/orders_v2): intervalo do consumidor (s), entradas por lote,
+    # tamanho máximo do stream, tempo (s) até reprocessar entradas de um consumidor que morreu e,
+    # ligada, intervalo (h) do incremental de reconciliação que substitui o polling de 30 min
+    ML_NOTIFICACOES_ENABLED: bool = False
+    ML_NOTIFICACOES_INTERVALO: int = 5
+    ML_NOTIFICACOES_LOTE: int = 1000
+    ML_NOTIFICACOES_STREAM_MAX: int = 100000
+    ML_NOTIFICACOES_REIVINDICAR: int = 300
+    ML_NOTIFICACOES_RECONCILIACAO: int = 6
+
+    # Estoque: cache do total da listagem e limiar a partir do qual o total é estimado
+    ESTOQUE_COUNT_CACHE_TTL: int = 60
+    ESTOQUE_COUNT_ESTIMATE_MIN: int = 50000
+    # Linhas por lote do cursor de servidor na exportação em streaming
+    ESTOQUE_EXPORT_BATCH: int = 1000
+
+    # Cache de respostas no Redis (TTL em segundos por endpoint; lock do single flight em ms)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_ESTOQUE: int = 30
+    RESPONSE_CACHE_TTL_MELI_SYNC_STATUS: int = 5
+    RESPONSE_CACHE_TTL_MELI_ITEMS_SAMPLE: int = 60
+    RESPONSE_CACHE_LOCK_MS: int = 5000
 
     # Shopify
     SHOPIFY_STORE_DOMAIN: str = ""
@@ -20,7 +20,12 @@ def _get_engine():
 engine = _get_engine()
 
 
-def init_db():
+def init_db(schema_extras: bool = False):
+    """
+    Conecta (com retry) e cria as tabelas que faltam. schema_extras=True só no startup da API:
+    o DDL complementar (ALTER TABLE, CREATE EXTENSION) pede lock exclusivo em produto e não
+    deve rodar a cada task dos workers.
+    """
     settings = get_settings()
     start = time.time()
     deadline = start + 30
@@ -40,6 +45,9 @@ def init_db():
         raise last_err
 
     SQLModel.metadata.create_all(engine)
+    if schema_extras:
+        from app.core.db_schema import ensure_schema_extras
+        ensure_schema_extras(engine)
     logger.info("Database tables ensured.")
 
 
@@ -0,0 +1,86 @@
+"""
+DDL complementar ao SQLModel.metadata.create_all.
+
+create_all não cria extensões, colunas geradas nem índices com operator class; estes
+objetos também estão nas migrations Alembic, mas o startup não roda Alembic, então
+init_db(schema_extras=True) aplica esta lista no startup da API (todas as instruções são
+idempotentes). Os workers chamam init_db() sem ela: ALTER TABLE pede ACCESS EXCLUSIVE em
+produto e enfileiraria as leituras da listagem a cada task.
+"""
+from typing import List, Optional
+
+from sqlalchemy import Engine, text
+
+from app.core.logger import logger
+
+
+# Busca de estoque: trigramas (substring em sku/titulo), full-text em português e prefixo de SKU
+SEARCH_DDL: List[str] = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    (
+        "ALTER TABLE produto ADD COLUMN IF NOT EXISTS busca_tsv tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'B')"
+        ") STORED"
+    ),
+    "CREATE INDEX IF NOT EXISTS ix_produto_busca_tsv ON produto USING gin (busca_tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_sku_trgm ON produto USING gin (sku gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_titulo_trgm ON produto USING gin (titulo gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_sku_lower_prefix ON produto (lower(sku) text_pattern_ops)",
+]
+
+# Listagem de estoque: filtros por origem/status + ORDER BY (coluna, id) na mesma direção,
+# como em get_estoque/list_produtos_keyset (índice DESC, DESC também atende ASC, ASC)
+LISTAGEM_DDL: List[str] = [
+    "CREATE INDEX IF NOT EXISTS ix_produto_created_id ON produto (created_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_updated_id ON produto (updated_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_preco_id ON produto (preco DESC, id DESC)",
+    # ORDER BY sku, id: só com uq_produto_sku (sku) o plano ainda faz um Incremental Sort
+    "CREATE INDEX IF NOT EXISTS ix_produto_sku_id ON produto (sku, id)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_origem_created ON produto (origem, created_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_origem_status_created ON produto (origem, status, created_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_produto_status_updated ON produto (status, updated_at DESC, id DESC)",
+    # Parciais: a maior parte das consultas é sobre produtos ativos
+    "CREATE INDEX IF NOT EXISTS ix_produto_ativo_created ON produto (created_at DESC, id DESC) WHERE status = 'ATIVO'",
+    "CREATE INDEX IF NOT EXISTS ix_produto_ativo_preco ON produto (preco DESC, id DESC) WHERE status = 'ATIVO'",
+]
+
+# Fila de jobs de sync: o índice parcial da fila (create_all só cria os índices simples do
+# modelo). As colunas novas de melifullsyncjob vêm da migration 20261017_meli_sync_jobs
+JOBS_DDL: List[str] = [
+    # Próximo da fila: WHERE status = 'queued' ORDER BY prioridade DESC, criado_em, id
+    "CREATE INDEX IF NOT EXISTS ix_melifullsyncjob_fila ON melifullsyncjob (prioridade DESC, criado_em, id) WHERE status = 'queued'",
+]
+
+SCHEMA_EXTRAS: List[List[str]] = [SEARCH_DDL, LISTAGEM_DDL, JOBS_DDL]
+
+_search_ready: Optional[bool] = None
+
+
+def ensure_schema_extras(engine: Engine) -> None:
+    """Aplica cada grupo de DDL numa transação própria; uma falha (ex.: sem permissão) não derruba o startup."""
+    global _search_ready
+    for grupo in SCHEMA_EXTRAS:
+        try:
+            with engine.begin() as conn:
+                for ddl in grupo:
+                    conn.execute(text(ddl))
+        except Exception as e:
+            logger.warning({"event": "DB_SCHEMA_EXTRAS_ERROR", "error": str(e), "ddl": grupo[0]})
+    _search_ready = None
+
+
+def search_schema_ready(session) -> bool:
+    """True se a coluna busca_tsv e o pg_trgm existem (resultado em cache por processo)."""
+    global _search_ready
+    if _search_ready is None:
+        try:
+            _search_ready = bool(session.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') "
+                "AND EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'produto' AND column_name = 'busca_tsv')"
+            )).scalar())
+        except Exception as e:
+            logger.warning({"event": "DB_SEARCH_SCHEMA_CHECK_ERROR", "error": str(e)})
+            return False
+    return _search_ready
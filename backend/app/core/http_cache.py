@@ -0,0 +1,116 @@
+"""
+GET condicional (ETag / Last-Modified) para endpoints consultados em polling.
+
+O ETag é derivado de um marcador barato (versão da tabela, id do último log, ...) e dos
+parâmetros da requisição; quando o cliente manda If-None-Match igual, o endpoint responde
+304 antes de rodar a consulta principal e sem corpo.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.logger import logger
+
+
+# Sempre revalidar: o navegador guarda a resposta, mas pergunta ao servidor antes de usar
+CACHE_CONTROL = "private, no-cache"
+
+
+def versao_tabela(session: Session, tabela: str) -> Optional[tuple]:
+    """
+    (versao, atualizado_em) de tabelaversao; None sem a tabela (sem ETag). A versão sobe em
+    incrementar_versao, chamado depois de cada commit que altera a tabela.
+    """
+    try:
+        row = session.execute(
+            text("SELECT versao, atualizado_em FROM tabelaversao WHERE tabela = :t"),
+            {"t": tabela},
+        ).first()
+    except Exception as e:
+        session.rollback()
+        logger.warning({"event": "HTTP_CACHE_VERSAO_ERROR", "tabela": tabela, "error": str(e)})
+        return None
+    # Sem linha: nenhuma escrita desde que a tabela foi criada
+    return (row[0], row[1]) if row else (0, None)
+
+
+_INCREMENTAR_VERSAO = text(
+    "INSERT INTO tabelaversao (tabela, versao, atualizado_em) VALUES (:t, 1, timezone('utc', now())) "
+    "ON CONFLICT (tabela) DO UPDATE SET versao = tabelaversao.versao + 1, atualizado_em = excluded.atualizado_em"
+)
+
+
+def incrementar_versao(tabela: str) -> None:
+    """
+    Incrementa a versão numa transação própria, depois do commit de quem gravou. O lock da
+    linha dura só este statement; um trigger o seguraria até o commit de cada escritor e
+    enfileiraria os shards e lotes concorrentes atrás uns dos outros.
+    """
+    from app.core.database import engine
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(_INCREMENTAR_VERSAO, {"t": tabela})
+    except Exception as e:
+        logger.warning({"event": "HTTP_CACHE_VERSAO_BUMP_ERROR", "tabela": tabela, "error": str(e)})
+
+
+def gerar_etag(*partes: Any) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_da_requisicao(request: Request, *marcador: Any) -> str:
+    """ETag do marcador + path + query string (parâmetros em ordem canônica)."""
+    params = sorted(request.query_params.multi_items())
+    return gerar_etag(*marcador, request.url.path, params)
+
+
+def _sem_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _utc_naive(dt: datetime) -> datetime:
+    # Timestamps do banco já são UTC sem tzinfo
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _http_date(dt: datetime) -> str:
+    return format_datetime(_utc_naive(dt).replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)
+
+
+def cabecalhos_cache(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def nao_modificado(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    If-None-Match (comparação fraca, lista ou "*") tem precedência; If-Modified-Since só é
+    considerado sem If-None-Match, com resolução de segundos.
+    """
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        if inm.strip() == "*":
+            return True
+        alvo = _sem_weak(etag)
+        return any(_sem_weak(t.strip()) == alvo for t in inm.split(","))
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            desde = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return _utc_naive(last_modified).replace(microsecond=0) <= _utc_naive(desde)
+    return False
+
+
+def resposta_304(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=cabecalhos_cache(etag, last_modified))
@@ -0,0 +1,38 @@
+"""
+Cursor opaco para paginação por keyset.
+
+O cursor guarda a coluna/direção de ordenação e o par (valor da coluna, id) da última
+linha entregue, em JSON codificado com base64 url-safe.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+
+def encode_cursor(sort_by: str, sort_dir: str, value: Any, last_id: int) -> str:
+    if isinstance(value, datetime):
+        v = {"t": "dt", "v": value.isoformat()}
+    else:
+        v = {"v": value}
+    payload = {"s": sort_by, "d": sort_dir, "id": int(last_id), **v}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_dir: str) -> Tuple[Any, int]:
+    """Devolve (valor, id) da última linha. ValueError se o cursor for inválido ou de outra ordenação."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+        last_id = int(payload["id"])
+    except Exception:
+        raise ValueError("cursor inválido")
+    if payload.get("s") != sort_by or payload.get("d") != sort_dir:
+        raise ValueError("cursor gerado para outra ordenação")
+    if value is None:
+        raise ValueError("cursor inválido")
+    return value, last_id
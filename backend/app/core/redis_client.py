@@ -0,0 +1,22 @@
+from typing import Optional
+
+import redis
+
+from app.core.config import get_settings
+
+
+_redis: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Cliente Redis compartilhado pelo processo (o pool de conexões é thread-safe)."""
+    global _redis
+    if _redis is None:
+        settings = get_settings()
+        _redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+            decode_responses=True,
+        )
+    return _redis
@@ -0,0 +1,210 @@
+"""
+Cache de respostas no Redis para endpoints de leitura muito consultados.
+
+- Chave = nome do endpoint + parâmetros normalizados + versão atual de cada tag.
+- Invalidação por tag: invalidar("produto") incrementa cache:tag:produto; as chaves
+  antigas deixam de ser lidas e expiram pelo TTL (nada de varrer chaves).
+- Single flight: no miss, só quem obtém o lock (SET NX PX) calcula; os demais esperam o
+  valor aparecer e, se o lock expirar sem valor, calculam por conta própria sem gravar.
+- Contadores de hit/miss por endpoint no processo e no Redis (todas as instâncias).
+
+Sem Redis (ou com RESPONSE_CACHE_ENABLED=false), tudo é calculado direto; após uma
+falha o Redis fica 30s sem ser consultado, como no rate limiter.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+
+PREFIXO = "cache:resp"
+_STATS_KEY = f"{PREFIXO}:stats"
+_ESPERA_INTERVALO = 0.05
+
+# Libera o lock só se ainda for nosso (o lock pode ter expirado e sido pego por outro)
+_LIBERAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_lock = threading.Lock()
+_contadores: Counter = Counter()
+_redis_failed_at = 0.0
+
+
+def _redis():
+    """Cliente Redis, ou None se o cache estiver desligado ou o Redis falhou há menos de 30s."""
+    if not getattr(get_settings(), "RESPONSE_CACHE_ENABLED", True):
+        return None
+    if time.monotonic() - _redis_failed_at < 30:
+        return None
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+def _falhou(evento: str, e: Exception) -> None:
+    global _redis_failed_at
+    _redis_failed_at = time.monotonic()
+    logger.warning({"event": evento, "error": str(e)})
+
+
+def _contar(nome: str, resultado: str) -> None:
+    with _lock:
+        _contadores[f"{nome}:{resultado}"] += 1
+    r = _redis()
+    if r is not None:
+        try:
+            r.hincrby(_STATS_KEY, f"{nome}:{resultado}", 1)
+        except Exception as e:
+            _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+
+
+def ttl_de(nome: str, padrao: int) -> int:
+    """TTL em segundos de RESPONSE_CACHE_TTL_<NOME>."""
+    return int(getattr(get_settings(), f"RESPONSE_CACHE_TTL_{nome.upper()}", padrao))
+
+
+def invalidar(*tags: str) -> None:
+    """Invalida todas as respostas marcadas com as tags (em qualquer processo)."""
+    r = _redis()
+    if r is None or not tags:
+        return
+    try:
+        with r.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{PREFIXO}:tag:{tag}")
+            pipe.execute()
+    except Exception as e:
+        _falhou("RESPONSE_CACHE_INVALIDATE_ERROR", e)
+
+
+def _chave(r, nome: str, partes: Iterable[Any], tags: Tuple[str, ...]) -> str:
+    versoes = r.mget([f"{PREFIXO}:tag:{t}" for t in tags]) if tags else []
+    bruto = "|".join(str(p) for p in (*partes, *(v or "0" for v in versoes)))
+    return f"{PREFIXO}:{nome}:{hashlib.sha1(bruto.encode('utf-8')).hexdigest()}"
+
+
+def _lock_ms() -> int:
+    return int(getattr(get_settings(), "RESPONSE_CACHE_LOCK_MS", 5000))
+
+
+def _preparar(nome: str, partes: Iterable[Any], tags: Tuple[str, ...]):
+    """(redis, chave, valor em cache, token do lock). Sem Redis: (None, None, None, None)."""
+    r = _redis()
+    if r is None:
+        return None, None, None, None
+    try:
+        chave = _chave(r, nome, partes, tags)
+        valor = r.get(chave)
+        if valor is not None:
+            return r, chave, valor, None
+        token = uuid.uuid4().hex
+        if r.set(f"{chave}:lock", token, nx=True, px=_lock_ms()):
+            return r, chave, None, token
+        return r, chave, None, None
+    except Exception as e:
+        _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+        return None, None, None, None
+
+
+def _esperar_valor(r, chave: str) -> Optional[str]:
+    """Poll do valor enquanto outro processo calcula (até o lock expirar)."""
+    try:
+        fim = time.monotonic() + _lock_ms() / 1000.0
+        while time.monotonic() < fim:
+            valor = r.get(chave)
+            if valor is not None:
+                return valor
+            if not r.exists(f"{chave}:lock"):
+                return r.get(chave)
+            time.sleep(_ESPERA_INTERVALO)
+    except Exception as e:
+        _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+    return None
+
+
+def _gravar(r, chave: str, valor: str, ttl: int, token: str) -> None:
+    try:
+        with r.pipeline(transaction=False) as pipe:
+            pipe.set(chave, valor, ex=max(1, int(ttl)))
+            pipe.eval(_LIBERAR_LOCK, 1, f"{chave}:lock", token)
+            pipe.execute()
+    except Exception as e:
+        _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+
+
+def _liberar(r, chave: str, token: str) -> None:
+    try:
+        r.eval(_LIBERAR_LOCK, 1, f"{chave}:lock", token)
+    except Exception as e:
+        _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+
+
+def obter(nome: str, partes: Iterable[Any], tags: Iterable[str], ttl: int, calcular: Callable[[], str]) -> str:
+    """Valor (string, em geral o JSON da resposta) em cache ou calculado com single flight."""
+    tags = tuple(tags)
+    r, chave, valor, token = _preparar(nome, tuple(partes), tags)
+    if valor is not None:
+        _contar(nome, "hit")
+        return valor
+    _contar(nome, "miss")
+    if r is None:
+        return calcular()
+    if token is None:
+        valor = _esperar_valor(r, chave)
+        if valor is not None:
+            return valor
+        return calcular()
+    try:
+        valor = calcular()
+    except BaseException:
+        _liberar(r, chave, token)
+        raise
+    _gravar(r, chave, valor, ttl, token)
+    return valor
+
+
+async def obter_async(nome: str, partes: Iterable[Any], tags: Iterable[str], ttl: int, calcular: Callable[[], Awaitable[str]]) -> str:
+    """Igual a obter(), para endpoints async: o Redis (síncrono) roda em thread."""
+    tags = tuple(tags)
+    r, chave, valor, token = await asyncio.to_thread(_preparar, nome, tuple(partes), tags)
+    if valor is not None:
+        await asyncio.to_thread(_contar, nome, "hit")
+        return valor
+    await asyncio.to_thread(_contar, nome, "miss")
+    if r is None:
+        return await calcular()
+    if token is None:
+        valor = await asyncio.to_thread(_esperar_valor, r, chave)
+        if valor is not None:
+            return valor
+        return await calcular()
+    try:
+        valor = await calcular()
+    except BaseException:
+        await asyncio.to_thread(_liberar, r, chave, token)
+        raise
+    await asyncio.to_thread(_gravar, r, chave, valor, ttl, token)
+    return valor
+
+
+def metricas() -> Dict[str, Any]:
+    """Hits/misses deste processo e de todas as instâncias (Redis)."""
+    with _lock:
+        processo = dict(_contadores)
+    global_ = None
+    r = _redis()
+    if r is not None:
+        try:
+            global_ = {k: int(v) for k, v in r.hgetall(_STATS_KEY).items()}
+        except Exception as e:
+            _falhou("RESPONSE_CACHE_REDIS_UNAVAILABLE", e)
+    return {"processo": processo, "global": global_}
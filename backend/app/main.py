@@ -65,8 +65,8 @@ async def log_requests(request, call_next):
 @app.on_event("startup")
 def on_startup():
     app.state.start_time = time()
-    # Garante criação das tabelas ao iniciar a aplicação
-    init_db()
+    # Garante criação das tabelas (e o DDL complementar) ao iniciar a aplicação
+    init_db(schema_extras=True)
     try:
         with Session(engine) as session:
             create_if_not_exists(session, "vendedor@dl.com", "123456", "vendedor")
@@ -1,3 +1,5 @@
 from .produto import Produto
 from .sincronizacao import Sincronizacao
-from .ml_token import MlToken
\ No newline at end of file
+from .ml_token import MlToken
+from .tabela_versao import TabelaVersao
+from .meli_sync_checkpoint import MeliSyncCheckpoint, MeliSyncChunk
\ No newline at end of file
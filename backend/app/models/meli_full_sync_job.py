@@ -1,12 +1,23 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
+from sqlalchemy import Column
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import SQLModel, Field
 
 
 class MeliFullSyncJob(SQLModel, table=True):
+    """Uma execução de sincronização com o ML (fila em services/sync_scheduler)."""
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    status: str = Field(default="idle")
+    # full | todos_status | incremental | shard (parte de uma sync distribuída)
+    tipo: str = Field(default="full", index=True)
+    params: Optional[Any] = Field(default=None, sa_column=Column(JSONB))
+    # queued -> running -> done | error | cancelled
+    status: str = Field(default="queued", index=True)
+    prioridade: int = 0
+    parent_id: Optional[int] = Field(default=None, index=True)
+    task_id: Optional[str] = None
     total_previsto: Optional[int] = None
     processados: int = 0
     novos: int = 0
@@ -14,6 +25,7 @@ class MeliFullSyncJob(SQLModel, table=True):
     ignorados: int = 0
     offset_atual: int = 0
     batch_tamanho: int = 0
+    criado_em: Optional[datetime] = Field(default_factory=datetime.utcnow)
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
-    error_message: Optional[str] = None
\ No newline at end of file
+    error_message: Optional[str] = None
@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import Column
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field, SQLModel
+
+
+class MeliSyncCheckpoint(SQLModel, table=True):
+    """Ponto de retomada de uma sincronização completa (ver services/meli_sync_checkpoint)."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(index=True)
+    modo: str
+    # em_andamento: uma execução nova do mesmo modo retoma daqui; concluido: só para idempotência
+    status: str = Field(default="em_andamento", index=True)
+    # Ids das mensagens Celery que já executaram esta sincronização (reentregas viram no-op)
+    task_ids: Optional[Any] = Field(default=None, sa_column=Column(JSONB))
+    # Fronteira da listagem: fonte (scan/janelas), scroll_id ou pilha de janelas de data
+    cursor: Optional[Any] = Field(default=None, sa_column=Column(JSONB))
+    stats: Optional[Any] = Field(default=None, sa_column=Column(JSONB))
+    criado_em: datetime = Field(default_factory=datetime.utcnow)
+    atualizado_em: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MeliSyncChunk(SQLModel, table=True):
+    """Chunk de IDs (um multiget) já gravado, commitado junto com o lote que o contém."""
+
+    checkpoint_id: int = Field(primary_key=True)
+    # sha1 dos IDs ordenados: a mesma gravação repetida não duplica
+    chave: str = Field(primary_key=True)
+    ids: Any = Field(sa_column=Column(JSONB, nullable=False))
+    concluido_em: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+class TabelaVersao(SQLModel, table=True):
+    """Contador por tabela, incrementado depois de cada commit que altera linhas (http_cache.incrementar_versao)."""
+
+    tabela: str = Field(primary_key=True)
+    versao: int = 0
+    atualizado_em: Optional[datetime] = None
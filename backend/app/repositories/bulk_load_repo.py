@@ -0,0 +1,157 @@
+"""
+Carga inicial em massa via COPY FROM STDIN.
+
+Para ambientes com produto/meliitemsnapshot vazios (ambiente novo, recuperação,
+refresh de staging): os lotes normalizados são copiados para tabelas temporárias
+e, no final, mesclados nas tabelas reais numa única transação.
+"""
+import csv
+import io
+import json
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Engine, text
+from sqlmodel import Session
+
+from app.core.database import engine as default_engine
+from app.core.logger import logger
+from app.models.meli_item_snapshot import MeliItemSnapshot
+from app.models.produto import Produto
+from app.repositories.produto_repo import produtos_alterados
+
+
+_PRODUTO = Produto.__tablename__
+_SNAPSHOT = MeliItemSnapshot.__tablename__
+
+_STAGE_PRODUTO_COLS = ("sku", "titulo", "descricao", "preco", "estoque_atual", "origem", "status", "imagens")
+_STAGE_SNAPSHOT_COLS = ("sku", "meli_id", "hash_conteudo", "status_meli", "raw_payload")
+
+# NULL explícito: no CSV do COPY, campo vazio sem aspas também seria NULL e confundiria com ""
+_NULL = r"\N"
+
+_CREATE_STAGES = f"""
+CREATE TEMP TABLE _stage_produto (
+    seq bigserial, sku text, titulo text, descricao text, preco double precision,
+    estoque_atual integer, origem text, status text, imagens jsonb
+) ON COMMIT DROP;
+CREATE TEMP TABLE _stage_snapshot (
+    seq bigserial, sku text, meli_id text, hash_conteudo text, status_meli text, raw_payload jsonb
+) ON COMMIT DROP;
+"""
+
+# SKU/meli_id repetidos no staging: vale a última ocorrência (maior seq)
+_MERGE_PRODUTO = f"""
+INSERT INTO {_PRODUTO} (sku, titulo, descricao, preco, estoque_atual, origem, status, imagens, created_at, updated_at)
+SELECT DISTINCT ON (sku) sku, titulo, descricao, preco, estoque_atual, origem, status,
+       COALESCE(imagens, '[]'::jsonb), timezone('utc', now()), timezone('utc', now())
+FROM _stage_produto
+ORDER BY sku, seq DESC
+ON CONFLICT (sku) DO UPDATE SET
+    titulo = excluded.titulo, descricao = excluded.descricao, preco = excluded.preco,
+    estoque_atual = excluded.estoque_atual, origem = excluded.origem, status = excluded.status,
+    imagens = excluded.imagens, updated_at = excluded.updated_at
+"""
+
+_MERGE_SNAPSHOT = f"""
+INSERT INTO {_SNAPSHOT} (sku, meli_id, hash_conteudo, status_meli, raw_payload,
+                         primeira_importacao_em, ultima_sincronizacao_em, ultima_modificacao_detectada_em)
+SELECT DISTINCT ON (sku, meli_id) sku, meli_id, hash_conteudo, status_meli, raw_payload,
+       timezone('utc', now()), timezone('utc', now()), timezone('utc', now())
+FROM _stage_snapshot
+ORDER BY sku, meli_id, seq DESC
+ON CONFLICT ON CONSTRAINT uq_meli_item_snapshot_sku_meli_id DO UPDATE SET
+    hash_conteudo = excluded.hash_conteudo, status_meli = excluded.status_meli,
+    raw_payload = excluded.raw_payload, ultima_sincronizacao_em = excluded.ultima_sincronizacao_em,
+    ultima_modificacao_detectada_em = excluded.ultima_modificacao_detectada_em
+"""
+
+
+def tabelas_vazias(session: Session) -> bool:
+    """True quando produto e meliitemsnapshot não têm nenhuma linha (caso da carga inicial)."""
+    return bool(session.execute(text(
+        f"SELECT NOT EXISTS (SELECT 1 FROM {_PRODUTO}) AND NOT EXISTS (SELECT 1 FROM {_SNAPSHOT})"
+    )).scalar())
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return _NULL
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def to_csv(rows: Iterable[Dict], cols: Iterable[str]) -> io.StringIO:
+    cols = tuple(cols)
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for r in rows:
+        writer.writerow([_csv_value(r.get(c)) for c in cols])
+    buf.seek(0)
+    return buf
+
+
+class CopyBulkLoader:
+    """
+    Abre uma conexão/transação própria, recebe lotes via copy_batch() (podendo ser chamado
+    de threads diferentes, um lote por vez) e grava tudo em merge(). Sem merge(), nada é
+    gravado: as tabelas de staging são temporárias e somem no rollback.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None):
+        self.engine = engine or default_engine
+        self._conn = None
+        self.copiados = 0
+
+    def __enter__(self) -> "CopyBulkLoader":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self._conn = self.engine.raw_connection()
+        with self._conn.cursor() as cur:
+            cur.execute(_CREATE_STAGES)
+        self.copiados = 0
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def _copy(self, table: str, cols: tuple, rows: List[Dict]) -> None:
+        sql = f"COPY {table} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv, NULL '{_NULL}')"
+        with self._conn.cursor() as cur:
+            cur.copy_expert(sql, to_csv(rows, cols))
+
+    def copy_batch(self, registros: List[Dict]) -> int:
+        """Copia um lote de registros do pipeline (produto + snapshot) para o staging."""
+        if not registros:
+            return 0
+        self._copy("_stage_produto", _STAGE_PRODUTO_COLS, [r["produto"] for r in registros])
+        self._copy("_stage_snapshot", _STAGE_SNAPSHOT_COLS, registros)
+        self.copiados += len(registros)
+        return len(registros)
+
+    def persistir(self, registros: List[Dict], mode: str) -> Dict[str, int]:
+        """Assinatura de `persist` do pipeline; na carga inicial todo item conta como novo."""
+        return {"novos": self.copy_batch(registros)}
+
+    def merge(self) -> Dict[str, int]:
+        """Mescla o staging nas tabelas reais e faz o commit (uma transação para tudo)."""
+        with self._conn.cursor() as cur:
+            cur.execute(_MERGE_PRODUTO)
+            produtos = cur.rowcount
+            cur.execute(_MERGE_SNAPSHOT)
+            snapshots = cur.rowcount
+        self._conn.commit()
+        produtos_alterados()
+        result = {"copiados": self.copiados, "produtos": produtos, "snapshots": snapshots}
+        logger.info({"event": "ML_BULK_LOAD_MERGED", **result})
+        return result
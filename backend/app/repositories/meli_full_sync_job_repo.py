@@ -1,38 +1,124 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from sqlalchemy import func, insert, update
 from sqlmodel import Session, select
 
+from app.core import response_cache
 from app.models.meli_full_sync_job import MeliFullSyncJob
 
 
-def get_or_create_singleton(session: Session) -> MeliFullSyncJob:
-    job = session.exec(select(MeliFullSyncJob).order_by(MeliFullSyncJob.id.asc()).limit(1)).first()
-    if job:
-        return job
-    job = MeliFullSyncJob(id=1, status="idle")
-    session.add(job)
-    session.commit()
-    session.refresh(job)
-    return job
+# Contadores do job -> chave correspondente nas estatísticas do pipeline
+_CAMPOS_PROGRESSO = {"processados": "fetched", "novos": "novos", "atualizados": "atualizados", "ignorados": "ignorados_sem_mudanca", "offset_atual": "listados"}
+
+
+# Estados em que o job não volta a rodar
+FINAIS = ("done", "error", "cancelled")
+
+
+def get_job(session: Session, job_id: int) -> Optional[MeliFullSyncJob]:
+    return session.get(MeliFullSyncJob, job_id)
+
+
+def listar_jobs(
+    session: Session,
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    parent_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[MeliFullSyncJob]:
+    """Jobs mais recentes primeiro; sem parent_id, só os de primeiro nível (shards ficam de fora)."""
+    query = select(MeliFullSyncJob)
+    query = query.where(MeliFullSyncJob.parent_id == parent_id) if parent_id is not None else query.where(MeliFullSyncJob.parent_id.is_(None))
+    if status:
+        query = query.where(MeliFullSyncJob.status == status)
+    if tipo:
+        query = query.where(MeliFullSyncJob.tipo == tipo)
+    return list(session.exec(query.order_by(MeliFullSyncJob.id.desc()).limit(limit)).all())
+
+
+def jobs_ativos(session: Session, tipo: Optional[str] = None) -> List[MeliFullSyncJob]:
+    """Jobs de primeiro nível na fila ou em execução (mais antigos primeiro)."""
+    query = select(MeliFullSyncJob).where(MeliFullSyncJob.parent_id.is_(None), MeliFullSyncJob.status.in_(("queued", "running")))
+    if tipo:
+        query = query.where(MeliFullSyncJob.tipo == tipo)
+    return list(session.exec(query.order_by(MeliFullSyncJob.id.asc())).all())
+
+
+def job_atual(session: Session) -> Optional[MeliFullSyncJob]:
+    """Job exibido no painel: o de catálogo em execução, senão qualquer um em execução, senão o último."""
+    ativos = [j for j in jobs_ativos(session) if j.status == "running"]
+    if ativos:
+        return next((j for j in ativos if j.tipo != "incremental"), ativos[0])
+    return session.exec(
+        select(MeliFullSyncJob).where(MeliFullSyncJob.parent_id.is_(None)).order_by(MeliFullSyncJob.id.desc()).limit(1)
+    ).first()
+
+
+def resumo_filhos(session: Session, parent_id: int) -> Dict[str, int]:
+    """Quantidade de shards por status."""
+    rows = session.execute(
+        select(MeliFullSyncJob.status, func.count()).where(MeliFullSyncJob.parent_id == parent_id).group_by(MeliFullSyncJob.status)
+    ).all()
+    return {status: int(n) for status, n in rows}
+
+
+def criar_filhos(session: Session, parent: MeliFullSyncJob, tamanhos: List[int], tipo: str = "shard") -> List[int]:
+    """Um job filho (queued) por shard, num único INSERT ... RETURNING id, sem commit."""
+    if not tamanhos:
+        return []
+    agora = datetime.utcnow()
+    stmt = insert(MeliFullSyncJob.__table__).values([
+        {"tipo": tipo, "status": "queued", "parent_id": parent.id, "prioridade": parent.prioridade, "params": {"ids": n},
+         "total_previsto": n, "criado_em": agora, "processados": 0, "novos": 0, "atualizados": 0, "ignorados": 0,
+         "offset_atual": 0, "batch_tamanho": n}
+        for n in tamanhos
+    ]).returning(MeliFullSyncJob.__table__.c.id)
+    return [r[0] for r in session.execute(stmt).all()]
+
+
+def finalizar_filho(session: Session, job_id: int, status: str, stats: Optional[Dict] = None, erro: Optional[str] = None) -> None:
+    """Fecha um shard (sem commit: vai na transação do próprio shard)."""
+    valores = {"status": status, "finished_at": datetime.utcnow(), "error_message": erro}
+    if stats:
+        valores.update({campo: int(stats.get(chave, 0)) for campo, chave in _CAMPOS_PROGRESSO.items()})
+    session.execute(update(MeliFullSyncJob).where(MeliFullSyncJob.id == job_id).values(**valores))
 
 
 def save(session: Session, job: MeliFullSyncJob) -> MeliFullSyncJob:
     session.add(job)
     session.commit()
+    response_cache.invalidar("meli_sync_job")
     session.refresh(job)
+    # Dashboards conectados em GET /meli/sync/events recebem o novo estado na hora
+    from app.services.sync_progress import publicar_progresso
+    publicar_progresso(job)
     return job
 
 
-def reset_queue(session: Session, job: MeliFullSyncJob, batch_size: int) -> MeliFullSyncJob:
-    job.status = "queued"
-    job.processados = 0
-    job.novos = 0
-    job.atualizados = 0
-    job.ignorados = 0
-    job.offset_atual = 0
-    job.batch_tamanho = batch_size
-    job.error_message = None
-    job.started_at = None
-    job.finished_at = None
-    return save(session, job)
\ No newline at end of file
+def update_progress(session: Session, job_id: int, stats: Dict) -> Optional[MeliFullSyncJob]:
+    """Atualiza os contadores do job a partir das estatísticas acumuladas do pipeline."""
+    job = session.get(MeliFullSyncJob, job_id)
+    if not job:
+        return None
+    job.processados = int(stats.get("fetched", 0))
+    job.novos = int(stats.get("novos", 0))
+    job.atualizados = int(stats.get("atualizados", 0))
+    job.ignorados = int(stats.get("ignorados_sem_mudanca", 0))
+    job.offset_atual = int(stats.get("listados", job.offset_atual or 0))
+    return save(session, job)
+
+
+def somar_progresso(session: Session, job_id: int, stats: Dict) -> None:
+    """Incremento atômico dos contadores (shards em paralelo), sem commit."""
+    valores = {campo: getattr(MeliFullSyncJob, campo) + int(stats.get(chave, 0)) for campo, chave in _CAMPOS_PROGRESSO.items()}
+    session.execute(update(MeliFullSyncJob).where(MeliFullSyncJob.id == job_id).values(**valores))
+
+
+def notificar_progresso(session: Session, job_id: int) -> None:
+    """Depois de um commit fora de save(): invalida o cache de status e publica o estado."""
+    response_cache.invalidar("meli_sync_job")
+    job = session.get(MeliFullSyncJob, job_id)
+    if job is not None:
+        from app.services.sync_progress import publicar_progresso
+        publicar_progresso(job)
@@ -1,7 +1,10 @@
-from typing import Optional, Dict
+import json
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 
 from sqlmodel import Session, select
+from sqlalchemy import Integer, String, any_, bindparam, cast, column, func, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert as pg_insert
 
 from app.models.meli_item_snapshot import MeliItemSnapshot
 
@@ -64,4 +67,152 @@ def update_snapshot_changed(session: Session, snap: MeliItemSnapshot, new_hash:
     session.add(snap)
     session.commit()
     session.refresh(snap)
-    return snap
\ No newline at end of file
+    return snap
+
+
+def load_snapshots(session: Session, meli_ids: List[str], skus: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Snapshots existentes de um lote numa única consulta (meli_id = ANY, com fallback por sku).
+    Devolve linhas leves (id, sku, meli_id, hash_conteudo, status_meli, raw_payload)
+    indexadas por meli_id e por sku.
+    """
+    if not meli_ids:
+        return {}
+    T = MeliItemSnapshot
+    skus = skus or meli_ids
+    stmt = select(T.id, T.sku, T.meli_id, T.hash_conteudo, T.status_meli, T.raw_payload).where(
+        (T.meli_id == any_(bindparam("meli_ids", list(meli_ids), type_=ARRAY(String))))
+        | (T.sku == any_(bindparam("skus", list(skus), type_=ARRAY(String))))
+    )
+    por_chave: Dict[str, Any] = {}
+    for row in session.exec(stmt).all():
+        por_chave.setdefault(f"sku:{row.sku}", row)
+        por_chave[f"meli:{row.meli_id}"] = row
+    return por_chave
+
+
+def classify_snapshot_batch(
+    existentes: Dict[str, Any],
+    entries: List[Dict],
+    mudou: Optional[Callable[[Any, Dict], bool]] = None,
+    ignorar_existentes: bool = False,
+) -> Dict[str, List]:
+    """
+    Classifica o lote em memória: novos, alterados (par snapshot/entrada), inalterados e ignorados.
+    Cada entrada tem sku, meli_id, hash_conteudo, status_meli e raw_payload; meli_id repetido
+    no lote vale a última ocorrência.
+    """
+    mudou = mudou or (lambda snap, e: snap.hash_conteudo != e["hash_conteudo"])
+    unicos = {e["meli_id"]: e for e in entries}
+    out: Dict[str, List] = {"novos": [], "alterados": [], "inalterados": [], "ignorados": []}
+    for e in unicos.values():
+        snap = existentes.get(f"meli:{e['meli_id']}") or existentes.get(f"sku:{e['sku']}")
+        if snap is None:
+            out["novos"].append(e)
+        elif ignorar_existentes:
+            out["ignorados"].append(e)
+        elif mudou(snap, e):
+            out["alterados"].append((snap, e))
+        else:
+            out["inalterados"].append((snap, e))
+    return out
+
+
+def _insert_novos_stmt(entries: List[Dict], now: datetime):
+    stmt = pg_insert(MeliItemSnapshot.__table__).values([
+        {
+            "sku": e["sku"],
+            "meli_id": e["meli_id"],
+            "hash_conteudo": e["hash_conteudo"],
+            "status_meli": e["status_meli"],
+            "raw_payload": e.get("raw_payload"),
+            "primeira_importacao_em": now,
+            "ultima_sincronizacao_em": now,
+            "ultima_modificacao_detectada_em": now,
+        }
+        for e in entries
+    ])
+    # Outra importação pode ter criado o mesmo snapshot entre a leitura e a escrita
+    return stmt.on_conflict_do_update(
+        constraint="uq_meli_item_snapshot_sku_meli_id",
+        set_={
+            "hash_conteudo": stmt.excluded.hash_conteudo,
+            "status_meli": stmt.excluded.status_meli,
+            "raw_payload": stmt.excluded.raw_payload,
+            "ultima_sincronizacao_em": stmt.excluded.ultima_sincronizacao_em,
+            "ultima_modificacao_detectada_em": stmt.excluded.ultima_modificacao_detectada_em,
+        },
+    )
+
+
+def _update_alterados_stmt(pares: List, now: datetime):
+    v = values(
+        column("id", Integer),
+        column("hash_conteudo", String),
+        column("status_meli", String),
+        column("raw_payload", String),
+        name="v",
+    ).data([
+        (snap.id, e["hash_conteudo"], e["status_meli"], json.dumps(e.get("raw_payload")) if e.get("raw_payload") is not None else None)
+        for snap, e in pares
+    ])
+    T = MeliItemSnapshot
+    return (
+        update(T)
+        .where(T.id == v.c.id)
+        .values(
+            hash_conteudo=v.c.hash_conteudo,
+            status_meli=v.c.status_meli,
+            raw_payload=cast(v.c.raw_payload, JSONB),
+            ultima_sincronizacao_em=now,
+            ultima_modificacao_detectada_em=now,
+        )
+    )
+
+
+def touch_snapshots(session: Session, ids: List[int], commit: bool = True) -> int:
+    """
+    Marca snapshots inalterados como sincronizados agora, num único UPDATE:
+    SET ultima_sincronizacao_em = now() WHERE id = ANY(:ids). Usa o relógio do banco (em UTC,
+    como o restante das colunas) e não carrega os objetos.
+    """
+    if not ids:
+        return 0
+    T = MeliItemSnapshot
+    stmt = (
+        update(T)
+        .where(T.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer))))
+        .values(ultima_sincronizacao_em=func.timezone("utc", func.now()))
+        .execution_options(synchronize_session=False)
+    )
+    result = session.execute(stmt)
+    if commit:
+        session.commit()
+    return result.rowcount
+
+
+def apply_snapshot_batch(
+    session: Session,
+    entries: List[Dict],
+    mudou: Optional[Callable[[Any, Dict], bool]] = None,
+    ignorar_existentes: bool = False,
+    commit: bool = True,
+) -> Dict[str, List]:
+    """
+    Diff de snapshots de um lote inteiro: 1 SELECT, depois 1 INSERT (novos), 1 UPDATE ... FROM
+    VALUES (alterados) e 1 UPDATE via touch_snapshots (inalterados), tudo na mesma transação.
+    """
+    if not entries:
+        return {"novos": [], "alterados": [], "inalterados": [], "ignorados": []}
+    existentes = load_snapshots(session, [e["meli_id"] for e in entries], [e["sku"] for e in entries])
+    resultado = classify_snapshot_batch(existentes, entries, mudou=mudou, ignorar_existentes=ignorar_existentes)
+    now = datetime.utcnow()
+    if resultado["novos"]:
+        session.execute(_insert_novos_stmt(resultado["novos"], now))
+    if resultado["alterados"]:
+        session.execute(_update_alterados_stmt(resultado["alterados"], now))
+    if resultado["inalterados"]:
+        touch_snapshots(session, [snap.id for snap, _ in resultado["inalterados"]], commit=False)
+    if commit:
+        session.commit()
+    return resultado
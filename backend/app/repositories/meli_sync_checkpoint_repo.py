@@ -0,0 +1,110 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.models.meli_sync_checkpoint import MeliSyncCheckpoint, MeliSyncChunk
+
+
+def chave_chunk(ids: List[str]) -> str:
+    return hashlib.sha1(",".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+
+def checkpoint_da_task(session: Session, task_id: str) -> Optional[MeliSyncCheckpoint]:
+    """Checkpoint que já foi executado pela mensagem Celery `task_id` (se houver)."""
+    return session.exec(
+        select(MeliSyncCheckpoint).where(MeliSyncCheckpoint.task_ids.contains([task_id])).limit(1)
+    ).first()
+
+
+def checkpoint_aberto(session: Session, modo: str) -> Optional[MeliSyncCheckpoint]:
+    """Checkpoint em andamento do modo, de qualquer job (um job novo retoma o de um job que parou)."""
+    return session.exec(
+        select(MeliSyncCheckpoint)
+        .where(MeliSyncCheckpoint.modo == modo, MeliSyncCheckpoint.status == "em_andamento")
+        .order_by(MeliSyncCheckpoint.id.desc())
+        .limit(1)
+    ).first()
+
+
+def checkpoint_parado(checkpoint: Optional[MeliSyncCheckpoint]) -> bool:
+    """Sem commit de lote há mais de ML_SYNC_CHECKPOINT_STALE segundos: o worker morreu."""
+    limite = int(getattr(get_settings(), "ML_SYNC_CHECKPOINT_STALE", 900))
+    return checkpoint is not None and checkpoint.atualizado_em < datetime.utcnow() - timedelta(seconds=limite)
+
+
+def abrir_checkpoint(session: Session, job_id: int, modo: str, task_id: str) -> MeliSyncCheckpoint:
+    """Checkpoint em andamento do modo (retomada, passa a ser do job) ou um novo; registra a mensagem que o executa."""
+    ck = checkpoint_aberto(session, modo)
+    if ck is None:
+        ck = MeliSyncCheckpoint(job_id=job_id, modo=modo, task_ids=[], cursor={}, stats={})
+    ck.job_id = job_id
+    ck.task_ids = list(ck.task_ids or []) + [task_id]
+    ck.atualizado_em = datetime.utcnow()
+    session.add(ck)
+    session.commit()
+    session.refresh(ck)
+    return ck
+
+
+def ids_concluidos(session: Session, checkpoint_id: int) -> Set[str]:
+    rows = session.exec(select(MeliSyncChunk.ids).where(MeliSyncChunk.checkpoint_id == checkpoint_id)).all()
+    return {i for ids in rows for i in ids}
+
+
+def registrar_chunks(session: Session, checkpoint_id: int, chunks: List[List[str]]) -> int:
+    """INSERT dos chunks gravados, sem commit (vai na transação do lote); devolve quantos eram novos."""
+    if not chunks:
+        return 0
+    now = datetime.utcnow()
+    stmt = pg_insert(MeliSyncChunk.__table__).values([
+        {"checkpoint_id": checkpoint_id, "chave": chave_chunk(ids), "ids": list(ids), "concluido_em": now}
+        for ids in chunks
+    ])
+    stmt = stmt.on_conflict_do_nothing(index_elements=["checkpoint_id", "chave"]).returning(MeliSyncChunk.__table__.c.chave)
+    return len(session.execute(stmt).all())
+
+
+def chunk_registrado(session: Session, checkpoint_id: int, ids: List[str]) -> bool:
+    return session.get(MeliSyncChunk, (checkpoint_id, chave_chunk(ids))) is not None
+
+
+def atualizar_checkpoint(session: Session, checkpoint_id: int, cursor: Dict, stats: Dict) -> None:
+    """Grava fronteira e contadores, sem commit (vai na transação do lote)."""
+    session.execute(
+        update(MeliSyncCheckpoint)
+        .where(MeliSyncCheckpoint.id == checkpoint_id)
+        .values(cursor=cursor, stats=stats, atualizado_em=datetime.utcnow())
+    )
+
+
+def somar_stats_checkpoint(session: Session, checkpoint_id: int, contadores: Dict[str, int]) -> None:
+    """
+    Soma contadores ao JSON de stats num único UPDATE, sem commit: shards concorrentes
+    serializam no lock da linha e nenhum incremento se perde.
+    """
+    if not contadores:
+        return
+    pares = ", ".join(f"'{k}', coalesce((stats->>'{k}')::bigint, 0) + :{k}" for k in contadores)
+    session.execute(
+        text(
+            f"UPDATE melisynccheckpoint SET stats = coalesce(stats, '{{}}'::jsonb) || jsonb_build_object({pares}), "
+            "atualizado_em = :agora WHERE id = :id"
+        ),
+        {**{k: int(v) for k, v in contadores.items()}, "agora": datetime.utcnow(), "id": checkpoint_id},
+    )
+
+
+def concluir_checkpoint(session: Session, checkpoint_id: int) -> None:
+    """Marca como concluído e apaga os chunks; a linha fica para reconhecer mensagens reentregues."""
+    session.execute(
+        update(MeliSyncCheckpoint)
+        .where(MeliSyncCheckpoint.id == checkpoint_id)
+        .values(status="concluido", atualizado_em=datetime.utcnow())
+    )
+    session.execute(delete(MeliSyncChunk).where(MeliSyncChunk.checkpoint_id == checkpoint_id))
+    session.commit()
@@ -0,0 +1,114 @@
+"""
+Contagem de produtos da listagem de estoque, com cache e estimativa.
+
+O total de cada conjunto de filtros (origem/status/busca normalizados) fica em cache no
+processo até uma escrita em produto (invalidar_contagens) ou até ESTOQUE_COUNT_CACHE_TTL
+segundos, que limita o atraso quando a escrita acontece em outro processo (worker Celery).
+
+Sem filtros, o total vem de pg_class.reltuples; com filtros, da estimativa de linhas do
+EXPLAIN. A estimativa só é usada quando passa de ESTOQUE_COUNT_ESTIMATE_MIN: abaixo disso
+o count(*) exato é barato e é ele que vai para o cache.
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.models.produto import Produto
+
+
+_MAX_ENTRADAS = 512
+
+_lock = threading.Lock()
+# chave -> (expira_em, total, exato)
+_cache: Dict[tuple, Tuple[float, int, bool]] = {}
+
+
+def chave_contagem(origem: Optional[str] = None, search: Optional[str] = None, status: Optional[str] = None, busca_indexada: bool = False) -> tuple:
+    """Chave normalizada: a busca ignora caixa e espaços repetidos, como os predicados de filtro_busca."""
+    termo = " ".join(search.lower().split()) if search else None
+    return (origem or None, status.upper() if status else None, termo or None, bool(termo) and busca_indexada)
+
+
+def invalidar_contagens() -> None:
+    """Descarta todos os totais em cache; chamado pelas escritas em produto."""
+    with _lock:
+        _cache.clear()
+
+
+def _ler_cache(chave: tuple) -> Optional[Tuple[int, bool]]:
+    with _lock:
+        entrada = _cache.get(chave)
+        if entrada is None:
+            return None
+        expira_em, total, exato = entrada
+        if expira_em <= time.monotonic():
+            _cache.pop(chave, None)
+            return None
+        return total, exato
+
+
+def _gravar_cache(chave: tuple, total: int, exato: bool) -> None:
+    ttl = float(getattr(get_settings(), "ESTOQUE_COUNT_CACHE_TTL", 60))
+    if ttl <= 0:
+        return
+    with _lock:
+        # Termos de busca são ilimitados: descarta as entradas mais antigas
+        while len(_cache) >= _MAX_ENTRADAS:
+            _cache.pop(next(iter(_cache)))
+        _cache[chave] = (time.monotonic() + ttl, int(total), exato)
+
+
+def _reltuples(session: Session) -> Optional[int]:
+    """Linhas estimadas de produto segundo o último ANALYZE/VACUUM (-1 = tabela nunca analisada)."""
+    valor = session.execute(text(
+        f"SELECT reltuples::bigint FROM pg_class WHERE oid = '{Produto.__tablename__}'::regclass"
+    )).scalar()
+    return int(valor) if valor is not None and valor >= 0 else None
+
+
+def _plan_rows(session: Session, filtros: List) -> Optional[int]:
+    """Linhas estimadas pelo planner para SELECT ... WHERE filtros (sem executar a consulta)."""
+    compiled = select(Produto.id).where(*filtros).compile(dialect=postgresql.dialect())
+    plano = session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    try:
+        return int(plano[0]["Plan"]["Plan Rows"])
+    except (TypeError, LookupError, ValueError):
+        return None
+
+
+def estimar_total(session: Session, filtros: List) -> Optional[int]:
+    try:
+        return _plan_rows(session, filtros) if filtros else _reltuples(session)
+    except Exception as e:
+        logger.warning({"event": "ESTOQUE_COUNT_ESTIMATE_ERROR", "error": str(e)})
+        return None
+
+
+def contar_exato(session: Session, filtros: List) -> int:
+    return session.exec(select(func.count()).select_from(Produto).where(*filtros)).one()
+
+
+def contar_produtos(session: Session, filtros: List, chave: tuple, estimar: bool = True) -> Tuple[int, bool]:
+    """Devolve (total, exato). `chave` deve vir de chave_contagem com os mesmos parâmetros dos filtros."""
+    chave = (*chave, estimar)
+    cached = _ler_cache(chave)
+    if cached is not None:
+        return cached
+    if estimar:
+        minimo = int(getattr(get_settings(), "ESTOQUE_COUNT_ESTIMATE_MIN", 50000))
+        estimado = estimar_total(session, filtros)
+        if estimado is not None and estimado >= minimo:
+            _gravar_cache(chave, estimado, False)
+            return estimado, False
+    total = contar_exato(session, filtros)
+    _gravar_cache(chave, total, True)
+    return total, True
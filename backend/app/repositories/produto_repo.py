@@ -1,12 +1,51 @@
-from typing import List, Tuple, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Optional
 from sqlmodel import Session, select
-from sqlalchemy import asc, desc, func
+from sqlalchemy import asc, desc, event, func, literal_column, or_, tuple_
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.produto import Produto
-from app.schemas.produto import ProdutoCreate
+from app.repositories.produto_count_repo import contar_produtos, invalidar_contagens
+from app.core import http_cache, response_cache
+from app.repositories.produto_search_repo import filtro_busca
+from app.schemas.produto import ProdutoCreate, ProdutoRead
 from app.core.logger import logger
 
 
+def produtos_alterados() -> None:
+    """
+    Depois de gravar em produto: sobe a versão da tabela (ETag da listagem) e descarta totais
+    em cache e respostas marcadas com a tag produto.
+    """
+    http_cache.incrementar_versao("produto")
+    invalidar_contagens()
+    response_cache.invalidar("produto")
+
+
+# Marca em session.info: a sessão gravou em produto numa transação que quem chamou ainda vai commitar
+_ALTERADOS = "produtos_alterados"
+
+
+def produtos_alterados_no_commit(session: Session) -> None:
+    """Adia produtos_alterados() para depois do commit da sessão (descartado no rollback)."""
+    session.info[_ALTERADOS] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidar_apos_commit(session) -> None:
+    # Só depois do commit: invalidar antes deixaria outro request recalcular e cachear o estado antigo
+    if session.info.pop(_ALTERADOS, False):
+        produtos_alterados()
+
+
+@event.listens_for(OrmSession, "after_transaction_end")
+def _descartar_invalidacao(session, transacao) -> None:
+    # Fim da transação externa sem commit (rollback): nada mudou para os outros
+    if transacao.parent is None:
+        session.info.pop(_ALTERADOS, None)
+
+
 def create_produto(session: Session, data: ProdutoCreate) -> Produto:
     # Verificar SKU único
     exists = session.exec(select(Produto).where(Produto.sku == data.sku)).first()
@@ -24,6 +63,7 @@ def create_produto(session: Session, data: ProdutoCreate) -> Produto:
     )
     session.add(produto)
     session.commit()
+    produtos_alterados()
     session.refresh(produto)
     return produto
 
@@ -48,6 +88,7 @@ def save_product(session: Session, data: dict) -> Produto:
             produto.imagens = imagens
         session.add(produto)
         session.commit()
+        produtos_alterados()
         session.refresh(produto)
         logger.info({"event": "produto_salvo_update", "sku": sku})
         return produto
@@ -64,11 +105,72 @@ def save_product(session: Session, data: dict) -> Produto:
     )
     session.add(novo)
     session.commit()
+    produtos_alterados()
     session.refresh(novo)
     logger.info({"event": "produto_salvo_create", "sku": novo.sku})
     return novo
 
 
+# Colunas sobrescritas pelo upsert; se nenhuma mudou, a linha não é tocada
+_UPSERT_COLS = ("titulo", "descricao", "preco", "estoque_atual", "origem", "status", "imagens")
+
+
+def _upsert_produtos_stmt(rows: List[dict], now: datetime):
+    T = Produto.__table__
+    stmt = pg_insert(T).values([
+        {
+            "sku": r.get("sku"),
+            "titulo": r.get("titulo"),
+            "descricao": r.get("descricao"),
+            "preco": float(r.get("preco") or 0.0),
+            "estoque_atual": int(r.get("estoque_atual") or 0),
+            "origem": r.get("origem", "LOCAL"),
+            "status": r.get("status", "ATIVO"),
+            "imagens": r.get("imagens"),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for r in rows
+    ])
+    ex = stmt.excluded
+    novos = {c: ex[c] for c in _UPSERT_COLS}
+    # imagens ausente (None) mantém as atuais, como em save_product
+    novos["imagens"] = func.coalesce(ex.imagens, T.c.imagens)
+    return (
+        stmt.on_conflict_do_update(
+            index_elements=["sku"],
+            set_={**novos, "updated_at": ex.updated_at},
+            where=or_(*[T.c[c].is_distinct_from(v) for c, v in novos.items()]),
+        )
+        # xmax = 0 só na linha recém-inserida; updates pulados pelo WHERE não retornam linha
+        .returning(literal_column("(xmax = 0)").label("inserido"))
+    )
+
+
+def bulk_upsert_produtos(session: Session, rows: List[dict], chunk_size: int = 500, commit: bool = True) -> Dict[str, int]:
+    """
+    Idempotente em lote: INSERT ... ON CONFLICT (sku) DO UPDATE, pulando updates sem mudança.
+    Um statement por `chunk_size` linhas; SKU repetido na entrada vale a última ocorrência.
+    """
+    unicos = list({r.get("sku"): r for r in rows if r.get("sku")}.values())
+    inseridos = atualizados = 0
+    now = datetime.utcnow()
+    for i in range(0, len(unicos), max(1, chunk_size)):
+        for (inserido,) in session.execute(_upsert_produtos_stmt(unicos[i:i + chunk_size], now)):
+            if inserido:
+                inseridos += 1
+            else:
+                atualizados += 1
+    if inseridos or atualizados:
+        # Com commit=False a invalidação espera o commit de quem chamou (checkpoint, shard)
+        produtos_alterados_no_commit(session)
+    if commit:
+        session.commit()
+    result = {"inseridos": inseridos, "atualizados": atualizados, "inalterados": len(unicos) - inseridos - atualizados}
+    logger.info({"event": "produtos_upsert_lote", **result})
+    return result
+
+
 def update_stock(session: Session, sku: str, quantity: int) -> Produto:
     produto = get_by_sku(session, sku)
     if not produto:
@@ -76,22 +178,111 @@ def update_stock(session: Session, sku: str, quantity: int) -> Produto:
     produto.estoque_atual = int(quantity)
     session.add(produto)
     session.commit()
+    produtos_alterados()
     session.refresh(produto)
     return produto
 
 
+# sort_by aceito na listagem: cada coluna tem índice (coluna, id) em db_schema.LISTAGEM_DDL
+COLUNAS_ORDENACAO = ("created_at", "updated_at", "preco", "sku")
+
+
+# Projeção da listagem: as colunas de ProdutoRead, lidas como tuplas (sem instanciar o ORM)
+PRODUTO_LISTA_COLS = tuple(getattr(Produto, c) for c in ProdutoRead.model_fields)
+
+# fields=compacto: o que as tabelas de estoque exibem (sem descricao e imagens)
+PROJECAO_COMPACTA = ("id", "sku", "titulo", "preco", "estoque_atual", "origem", "status", "updated_at")
+
+
+def colunas_listagem(fields: Optional[str] = None, obrigatorias: Tuple[str, ...] = ()) -> tuple:
+    """
+    Colunas a selecionar para `fields`: vazio ou "completo" = todas as de ProdutoRead,
+    "compacto" = PROJECAO_COMPACTA, ou nomes separados por vírgula. `obrigatorias` entram
+    sempre (ex.: id e a coluna de ordenação, usados no cursor). ValueError para campo desconhecido.
+    """
+    if not fields or fields.strip() in ("", "completo"):
+        nomes = list(ProdutoRead.model_fields)
+    elif fields.strip() == "compacto":
+        nomes = list(PROJECAO_COMPACTA)
+    else:
+        nomes = [f.strip() for f in fields.split(",") if f.strip()]
+        invalidos = [f for f in nomes if f not in ProdutoRead.model_fields]
+        if invalidos:
+            raise ValueError(f"fields inválido: {', '.join(invalidos)}")
+    for nome in obrigatorias:
+        if nome not in nomes:
+            nomes.append(nome)
+    # Ordem do schema e sem repetição
+    return tuple(getattr(Produto, c) for c in ProdutoRead.model_fields if c in nomes)
+
+
+def coluna_ordenacao(sort_by: str):
+    if sort_by not in COLUNAS_ORDENACAO:
+        raise ValueError(f"sort_by inválido: {sort_by!r} (use {', '.join(COLUNAS_ORDENACAO)})")
+    return getattr(Produto, sort_by)
+
+
 def list_produtos(
     session: Session,
     page: int = 1,
     size: int = 10,
     sort_by: str = "created_at",
     sort_dir: str = "desc",
-) -> Tuple[List[Produto], int]:
-    # Campo de ordenação dinâmico
-    sort_col = getattr(Produto, sort_by, Produto.created_at)
-    order = desc(sort_col) if sort_dir.lower() == "desc" else asc(sort_col)
+    colunas: Optional[tuple] = None,
+) -> Tuple[List[Any], int]:
+    """Página por OFFSET de todos os produtos; com `colunas`, os itens são Rows em vez de Produto."""
+    sort_col = coluna_ordenacao(sort_by)
+    descending = sort_dir.lower() == "desc"
+    order = desc(sort_col) if descending else asc(sort_col)
+    tiebreak = desc(Produto.id) if descending else asc(Produto.id)
 
-    total = session.exec(select(func.count()).select_from(Produto)).one()
-    query = select(Produto).order_by(order).offset((page - 1) * size).limit(size)
+    total, _ = contar_produtos(session, [], chave=(), estimar=False)
+    query = (select(*colunas) if colunas else select(Produto)).order_by(order, tiebreak).offset((page - 1) * size).limit(size)
     items = session.exec(query).all()
     return items, total
+
+
+def filtros_produto(origem: Optional[str] = None, search: Optional[str] = None, status: Optional[str] = None, busca_indexada: bool = False) -> List:
+    """Cláusulas WHERE da listagem de estoque (mesmos filtros para página, cursor e contagem)."""
+    filtros = []
+    if origem:
+        filtros.append(Produto.origem == origem)
+    if search and search.strip():
+        filtros.append(filtro_busca(search, indexada=busca_indexada))
+    if status:
+        filtros.append(Produto.status == status.upper())
+    return filtros
+
+
+def list_produtos_keyset(
+    session: Session,
+    filtros: List,
+    sort_by: str = "created_at",
+    sort_dir: str = "desc",
+    size: int = 10,
+    after: Optional[Tuple[Any, int]] = None,
+    colunas: Optional[tuple] = None,
+) -> Tuple[List[Any], Optional[Tuple[Any, int]]]:
+    """
+    Página por keyset: ORDER BY (coluna, id) e WHERE (coluna, id) < / > (valor, id) da última
+    linha vista, sem OFFSET. Devolve os itens e o par (valor, id) da próxima página (ou None).
+    Com `colunas` (que devem incluir id e a coluna de ordenação), os itens são Rows em vez de Produto.
+    """
+    sort_col = coluna_ordenacao(sort_by)
+    descending = sort_dir.lower() == "desc"
+    query = (select(*colunas) if colunas else select(Produto)).where(*filtros)
+    if after is not None:
+        chave = tuple_(sort_col, Produto.id)
+        query = query.where(chave < tuple_(*after) if descending else chave > tuple_(*after))
+    if descending:
+        query = query.order_by(desc(sort_col), desc(Produto.id))
+    else:
+        query = query.order_by(asc(sort_col), asc(Produto.id))
+    # Uma linha a mais só para saber se existe próxima página
+    rows = session.exec(query.limit(size + 1)).all()
+    items = rows[:size]
+    proximo = None
+    if len(rows) > size and items:
+        ultimo = items[-1]
+        proximo = (getattr(ultimo, sort_col.key), ultimo.id)
+    return items, proximo
@@ -0,0 +1,79 @@
+"""
+Busca de produtos do estoque.
+
+Escolhe o predicado pelo formato do termo, para que cada consulta caia num índice:
+    curto (< 3 chars)  prefixo de SKU (btree lower(sku) text_pattern_ops) + prefixo no tsvector
+    SKU (MLB123, AB-12) prefixo de SKU + substring por trigrama em sku
+    texto              full-text em português (GIN busca_tsv) + substring por trigrama em titulo
+Sem o schema de busca (extensão/coluna ausentes), volta ao ILIKE em sku/titulo.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import case, func, literal_column, or_
+
+from app.models.produto import Produto
+
+
+BUSCA_TSV = literal_column("produto.busca_tsv")
+
+_SKU_RE = re.compile(r"^[A-Za-z]{0,6}[-_]?\d[\w\-]*$")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def forma_busca(term: str) -> str:
+    term = term.strip()
+    if len(term) < 3:
+        return "curta"
+    if " " not in term and _SKU_RE.match(term):
+        return "sku"
+    return "texto"
+
+
+def tsquery_prefixo(term: str) -> Optional[str]:
+    """Termo digitado -> tsquery com prefixo em cada palavra ('filtro & ar:*'); só \\w, sem operadores."""
+    tokens = _TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    return " & ".join(f"{t}:*" for t in tokens)
+
+
+def _sku_prefixo(term: str):
+    return func.lower(Produto.sku).like(_escape_like(term.lower()) + "%", escape="\\")
+
+
+def filtro_busca(search: str, indexada: bool = True):
+    """Cláusula WHERE da busca."""
+    term = search.strip()
+    contem = f"%{_escape_like(term)}%"
+    if not indexada:
+        return Produto.sku.ilike(contem, escape="\\") | Produto.titulo.ilike(contem, escape="\\")
+    forma = forma_busca(term)
+    q = tsquery_prefixo(term)
+    if forma == "sku":
+        return or_(_sku_prefixo(term), Produto.sku.ilike(contem, escape="\\"))
+    clausulas: List = []
+    if q:
+        clausulas.append(BUSCA_TSV.op("@@")(func.to_tsquery("portuguese", q)))
+    if forma == "curta":
+        clausulas.append(_sku_prefixo(term))
+    else:
+        clausulas.append(Produto.titulo.ilike(contem, escape="\\"))
+    return or_(*clausulas)
+
+
+def rank_busca(search: str, indexada: bool = True):
+    """Relevância: prefixo exato de SKU primeiro, depois ts_rank_cd + similaridade de trigramas."""
+    term = search.strip()
+    prefixo = case((_sku_prefixo(term), 1.0), else_=0.0)
+    if not indexada:
+        return prefixo
+    q = tsquery_prefixo(term)
+    rank = prefixo + func.similarity(Produto.titulo, term)
+    if q:
+        rank = rank + func.ts_rank_cd(BUSCA_TSV, func.to_tsquery("portuguese", q))
+    return rank
@@ -0,0 +1,113 @@
+"""
+Benchmark: carga inicial de N itens sintéticos (produto + snapshot).
+
+Caminhos comparados, cada um partindo de tabelas sem os itens BENCH-*:
+    por_linha  upsert_snapshot_new + save_product por item (caminho antigo)
+    em_lote    persistir_lote do pipeline (diff em lote + INSERT ... ON CONFLICT)
+    copy       CopyBulkLoader (COPY FROM STDIN no staging + merge numa transação)
+
+Uso (precisa do Postgres de DATABASE_URL; cria e apaga itens BENCH-*):
+    python -m app.scripts.bench_bulk_load
+    python -m app.scripts.bench_bulk_load --itens 5000 --sem-por-linha
+"""
+import argparse
+import time
+from typing import Dict, List
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from app.core.database import engine, init_db
+from app.models.meli_item_snapshot import MeliItemSnapshot
+from app.models.produto import Produto
+from app.repositories.bulk_load_repo import CopyBulkLoader
+from app.repositories.meli_item_snapshot_repo import upsert_snapshot_new
+from app.repositories.produto_repo import save_product
+from app.services.meli_import_pipeline import montar_registro, persistir_lote
+
+
+PREFIXO = "BENCH-"
+
+
+def _registros(total: int) -> List[Dict]:
+    itens = (
+        {
+            "id": f"{PREFIXO}{i}",
+            "title": f"Peça sintética {i}",
+            "permalink": f"https://example.com/{i}",
+            "price": 10.0 + i % 500,
+            "available_quantity": i % 7,
+            "status": "active",
+            "category_id": "MLB1747",
+            "condition": "new",
+            "pictures": [{"secure_url": f"https://img.example.com/{i}.jpg"}],
+        }
+        for i in range(total)
+    )
+    return [montar_registro(it, "FULL") for it in itens]
+
+
+def _limpar() -> None:
+    with Session(engine) as session:
+        session.execute(delete(MeliItemSnapshot).where(MeliItemSnapshot.sku.like(f"{PREFIXO}%")))
+        session.execute(delete(Produto).where(Produto.sku.like(f"{PREFIXO}%")))
+        session.commit()
+
+
+def _por_linha(registros: List[Dict], lote: int) -> None:
+    with Session(engine) as session:
+        for r in registros:
+            upsert_snapshot_new(session, r["sku"], r["meli_id"], r["hash_conteudo"], r["status_meli"], r["raw_payload"])
+            save_product(session, r["produto"])
+
+
+def _em_lote(registros: List[Dict], lote: int) -> None:
+    with Session(engine) as session:
+        for i in range(0, len(registros), lote):
+            persistir_lote(session, registros[i:i + lote], "FULL")
+
+
+def _copy(registros: List[Dict], lote: int) -> None:
+    with CopyBulkLoader() as loader:
+        for i in range(0, len(registros), lote):
+            loader.copy_batch(registros[i:i + lote])
+        loader.merge()
+
+
+def _medir(nome: str, fn, registros: List[Dict], lote: int) -> Dict:
+    _limpar()
+    t0 = time.perf_counter()
+    fn(registros, lote)
+    dt = time.perf_counter() - t0
+    with Session(engine) as session:
+        gravados = session.query(Produto).filter(Produto.sku.like(f"{PREFIXO}%")).count()
+    return {"caminho": nome, "gravados": gravados, "segundos": round(dt, 3), "itens_s": round(len(registros) / dt, 1) if dt else None}
+
+
+def main(total: int, lote: int, por_linha: bool) -> None:
+    init_db(schema_extras=True)
+    registros = _registros(total)
+    caminhos = [("em_lote", _em_lote), ("copy", _copy)]
+    if por_linha:
+        caminhos.insert(0, ("por_linha", _por_linha))
+    try:
+        resultados = [_medir(nome, fn, registros, lote) for nome, fn in caminhos]
+    finally:
+        _limpar()
+
+    print(f"{total} itens sintéticos, lote de {lote}")
+    for r in resultados:
+        print(f"{r['caminho']:>10}: {r['gravados']:>6} gravados | {r['segundos']:>8}s | {r['itens_s']:>9} itens/s")
+    copy = resultados[-1]
+    for r in resultados[:-1]:
+        if copy["segundos"]:
+            print(f"copy vs {r['caminho']}: {r['segundos'] / copy['segundos']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=20000)
+    parser.add_argument("--lote", type=int, default=200, help="tamanho do lote (ML_IMPORT_WRITE_BATCH)")
+    parser.add_argument("--sem-por-linha", action="store_true", help="pula o caminho por item (o mais lento)")
+    args = parser.parse_args()
+    main(args.itens, args.lote, not args.sem_por_linha)
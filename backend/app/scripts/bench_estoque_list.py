@@ -0,0 +1,110 @@
+"""
+Benchmark: requisições/s da listagem de estoque em size=10/100/500.
+
+Compara, com a mesma consulta ao banco:
+    pydantic  select(Produto) -> ProdutoRead.model_validate().model_dump() -> JSONResponse (caminho antigo)
+    orjson    select(colunas) -> Row._asdict() -> ORJSONResponse (caminho atual de get_estoque)
+e mede também GET /estoque ponta a ponta pelo TestClient (roteamento, dependências e resposta).
+
+Uso (precisa do Postgres de DATABASE_URL; cria e apaga produtos BENCH-*):
+    python -m app.scripts.bench_estoque_list
+    python -m app.scripts.bench_estoque_list --produtos 2000 --segundos 3
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, desc
+from sqlmodel import Session, select
+
+from app.core.database import engine, init_db
+from app.models.produto import Produto
+from app.repositories.produto_repo import PRODUTO_LISTA_COLS, bulk_upsert_produtos
+from app.schemas.produto import ProdutoRead
+
+
+PREFIXO = "BENCH-"
+ORIGEM = "BENCH"
+TAMANHOS = (10, 100, 500)
+
+
+def _popular(total: int) -> None:
+    rows = [
+        {
+            "sku": f"{PREFIXO}{i}",
+            "titulo": f"Peça sintética {i} para benchmark de listagem",
+            "descricao": "Descrição de teste " * 5,
+            "preco": 10.0 + i % 500,
+            "estoque_atual": i % 30,
+            "origem": ORIGEM,
+            "status": "ATIVO",
+            "imagens": [f"https://img.example.com/{i}-{n}.jpg" for n in range(3)],
+        }
+        for i in range(total)
+    ]
+    with Session(engine) as session:
+        bulk_upsert_produtos(session, rows)
+
+
+def _limpar() -> None:
+    with Session(engine) as session:
+        session.execute(delete(Produto).where(Produto.sku.like(f"{PREFIXO}%")))
+        session.commit()
+
+
+def _pydantic(session: Session, size: int) -> bytes:
+    query = select(Produto).where(Produto.origem == ORIGEM).order_by(desc(Produto.created_at), desc(Produto.id)).limit(size)
+    items = session.exec(query).all()
+    return JSONResponse({"items": [ProdutoRead.model_validate(i).model_dump(mode="json") for i in items]}).body
+
+
+def _orjson(session: Session, size: int) -> bytes:
+    query = select(*PRODUTO_LISTA_COLS).where(Produto.origem == ORIGEM).order_by(desc(Produto.created_at), desc(Produto.id)).limit(size)
+    items = session.exec(query).all()
+    return ORJSONResponse({"items": [r._asdict() for r in items]}).body
+
+
+def _rps(fn: Callable[[], object], segundos: float) -> float:
+    fn()  # aquecimento
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < segundos:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - t0)
+
+
+def main(produtos: int, segundos: float) -> None:
+    init_db(schema_extras=True)
+    _limpar()
+    _popular(produtos)
+    from app.main import app
+
+    resultados: Dict[int, Dict[str, float]] = {}
+    try:
+        client = TestClient(app)
+        with Session(engine) as session:
+            for size in TAMANHOS:
+                resultados[size] = {
+                    "pydantic": _rps(lambda: _pydantic(session, size), segundos),
+                    "orjson": _rps(lambda: _orjson(session, size), segundos),
+                    "http": _rps(lambda: client.get("/estoque", params={"size": size, "origem": ORIGEM}).raise_for_status(), segundos),
+                }
+    finally:
+        _limpar()
+
+    print(f"{produtos} produtos sintéticos, {segundos}s por medição (req/s)")
+    print(f"{'size':>5} | {'pydantic':>9} | {'orjson':>9} | {'ganho':>6} | {'GET /estoque':>12}")
+    for size, r in resultados.items():
+        ganho = r["orjson"] / r["pydantic"] if r["pydantic"] else 0.0
+        print(f"{size:>5} | {r['pydantic']:>9.1f} | {r['orjson']:>9.1f} | {ganho:>5.1f}x | {r['http']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=1000)
+    parser.add_argument("--segundos", type=float, default=2.0, help="duração de cada medição")
+    args = parser.parse_args()
+    main(args.produtos, args.segundos)
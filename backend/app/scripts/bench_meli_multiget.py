@@ -0,0 +1,108 @@
+"""
+Benchmark: detalhe de itens por ID (/items/{id}) x multiget (/items?ids=).
+
+Uso:
+    python -m app.scripts.bench_meli_multiget                 # simulado (latência fixa por requisição)
+    python -m app.scripts.bench_meli_multiget --itens 17000 --latencia 0.12
+    python -m app.scripts.bench_meli_multiget --live --itens 200   # API real (consome cota do ML)
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.services import mercadolivre_service as ml
+
+
+class _Contador:
+    def __init__(self):
+        self.requisicoes = 0
+
+
+def _instalar_simulador(contador: _Contador, latencia: float) -> None:
+    async def fake_meli_request(method: str, endpoint: str, params: Optional[Dict] = None, **kwargs):
+        contador.requisicoes += 1
+        await asyncio.sleep(latencia)
+        if endpoint == "/items":
+            ids = (params or {}).get("ids", "").split(",")
+            return [{"code": 200, "body": {"id": i, "status": "active", "price": 1.0}} for i in ids]
+        return {"id": endpoint.rsplit("/", 1)[-1], "status": "active", "price": 1.0}
+
+    ml.meli_request = fake_meli_request
+
+
+def _instalar_contador_live(contador: _Contador) -> None:
+    original = ml.meli_request
+
+    async def counted(*args, **kwargs):
+        contador.requisicoes += 1
+        return await original(*args, **kwargs)
+
+    ml.meli_request = counted
+
+
+async def _por_item(ids: List[str]) -> List[Dict]:
+    """Caminho antigo: uma requisição por ID, lotes de 20 em paralelo."""
+    items: List[Dict] = []
+    for i in range(0, len(ids), 20):
+        batch = ids[i:i + 20]
+        results = await asyncio.gather(
+            *[ml.meli_request("GET", f"/items/{item_id}", params={"include_attributes": "all"}) for item_id in batch],
+            return_exceptions=True,
+        )
+        items.extend(r for r in results if isinstance(r, dict))
+    return items
+
+
+async def _ids_live(total: int) -> List[str]:
+    settings = get_settings()
+    ids: List[str] = []
+    offset = 0
+    while len(ids) < total and offset < 1000:
+        payload = await ml.meli_request("GET", f"/users/{settings.ML_SELLER_ID}/items/search", params={"limit": 50, "offset": offset})
+        page = payload.get("results", [])
+        if not page:
+            break
+        ids.extend(page)
+        offset += 50
+    return ids[:total]
+
+
+async def _medir(nome: str, contador: _Contador, coro) -> Dict:
+    contador.requisicoes = 0
+    t0 = time.perf_counter()
+    items = await coro
+    dt = time.perf_counter() - t0
+    return {"caminho": nome, "itens": len(items), "requisicoes": contador.requisicoes, "segundos": round(dt, 3)}
+
+
+async def main(total: int, latencia: float, live: bool) -> None:
+    contador = _Contador()
+    if live:
+        ids = await _ids_live(total)
+        _instalar_contador_live(contador)
+    else:
+        ids = [f"MLB{1000000000 + i}" for i in range(total)]
+        _instalar_simulador(contador, latencia)
+
+    resultados = [
+        await _medir("por_item", contador, _por_item(ids)),
+        await _medir("multiget", contador, ml.fetch_items_multiget(ids)),
+    ]
+    for r in resultados:
+        print(f"{r['caminho']:>10}: {r['itens']:>6} itens | {r['requisicoes']:>6} requisições | {r['segundos']:>8}s")
+    base, novo = resultados
+    if novo["requisicoes"]:
+        print(f"redução de requisições: {base['requisicoes'] / novo['requisicoes']:.1f}x")
+    if novo["segundos"]:
+        print(f"speedup de tempo: {base['segundos'] / novo['segundos']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=2000)
+    parser.add_argument("--latencia", type=float, default=0.12, help="latência simulada por requisição (s)")
+    parser.add_argument("--live", action="store_true", help="usa a API real do Mercado Livre")
+    args = parser.parse_args()
+    asyncio.run(main(args.itens, args.latencia, args.live))
@@ -0,0 +1,131 @@
+"""
+Benchmark: idas ao banco para N itens inalterados no diff de snapshots.
+
+Compara o caminho por item (SELECT por meli_id + mark_snapshot_unchanged com commit/refresh)
+com o diff em lote (1 SELECT ... = ANY + 1 UPDATE ... WHERE id = ANY). Conta cada statement
+enviado ao Postgres (evento before_cursor_execute) e cada COMMIT.
+
+Uso (precisa do Postgres de DATABASE_URL; cria e apaga snapshots BENCH-*):
+    python -m app.scripts.bench_meli_snapshot_touch
+    python -m app.scripts.bench_meli_snapshot_touch --itens 5000 --lote 200
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import delete, event
+from sqlmodel import Session
+
+from app.core.database import engine, init_db
+from app.models.meli_item_snapshot import MeliItemSnapshot
+from app.repositories.meli_item_snapshot_repo import (
+    apply_snapshot_batch,
+    get_snapshot_by_meli_id,
+    mark_snapshot_unchanged,
+)
+
+
+PREFIXO = "BENCH-"
+
+
+class _Contador:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def instalar(self) -> None:
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def remover(self) -> None:
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+        event.remove(engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def zerar(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+def _entradas(total: int) -> List[Dict]:
+    return [
+        {"sku": f"{PREFIXO}{i}", "meli_id": f"{PREFIXO}{i}", "hash_conteudo": "h", "status_meli": "active", "raw_payload": {"id": f"{PREFIXO}{i}"}}
+        for i in range(total)
+    ]
+
+
+def _limpar() -> None:
+    with Session(engine) as session:
+        session.execute(delete(MeliItemSnapshot).where(MeliItemSnapshot.sku.like(f"{PREFIXO}%")))
+        session.commit()
+
+
+def _por_item(entradas: List[Dict]) -> None:
+    with Session(engine) as session:
+        for e in entradas:
+            snap = get_snapshot_by_meli_id(session, e["meli_id"])
+            if snap and snap.hash_conteudo == e["hash_conteudo"]:
+                mark_snapshot_unchanged(session, snap)
+
+
+def _em_lote(entradas: List[Dict], lote: int) -> None:
+    with Session(engine) as session:
+        for i in range(0, len(entradas), lote):
+            apply_snapshot_batch(session, entradas[i:i + lote])
+
+
+def _medir(nome: str, contador: _Contador, total: int, fn) -> Dict:
+    contador.zerar()
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    idas = contador.statements + contador.commits
+    return {
+        "caminho": nome,
+        "statements": contador.statements,
+        "commits": contador.commits,
+        "idas_por_1k": round(idas * 1000 / total, 1),
+        "segundos": round(dt, 3),
+    }
+
+
+def main(total: int, lote: int) -> None:
+    init_db(schema_extras=True)
+    _limpar()
+    entradas = _entradas(total)
+    # Carga inicial: todos os itens passam a existir com o mesmo hash (= inalterados nas medições)
+    _em_lote(entradas, lote)
+
+    contador = _Contador()
+    contador.instalar()
+    try:
+        resultados = [
+            _medir("por_item", contador, total, lambda: _por_item(entradas)),
+            _medir("em_lote", contador, total, lambda: _em_lote(entradas, lote)),
+        ]
+    finally:
+        contador.remover()
+        _limpar()
+
+    print(f"{total} itens inalterados, lote de {lote} ({datetime.utcnow().isoformat()})")
+    for r in resultados:
+        print(f"{r['caminho']:>9}: {r['statements']:>6} statements | {r['commits']:>5} commits | {r['idas_por_1k']:>8} idas/1k itens | {r['segundos']:>8}s")
+    base, novo = resultados
+    if novo["idas_por_1k"]:
+        print(f"redução de idas ao banco: {base['idas_por_1k'] / novo['idas_por_1k']:.1f}x")
+    if novo["segundos"]:
+        print(f"speedup de tempo: {base['segundos'] / novo['segundos']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=1000)
+    parser.add_argument("--lote", type=int, default=200, help="tamanho do lote do diff (ML_IMPORT_WRITE_BATCH)")
+    args = parser.parse_args()
+    main(args.itens, args.lote)
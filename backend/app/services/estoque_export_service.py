@@ -0,0 +1,106 @@
+"""
+Exportação do catálogo em streaming (NDJSON ou CSV, opcionalmente gzip).
+
+A consulta roda num cursor do servidor (yield_per => stream_results no psycopg2) e cada
+partição de linhas vira um pedaço da resposta; a memória fica limitada ao tamanho do lote,
+qualquer que seja o tamanho do catálogo.
+"""
+import csv
+import io
+import zlib
+from typing import Callable, Iterator, List, Optional
+
+import orjson
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.models.produto import Produto
+
+
+FORMATOS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def query_exportacao(filtros: List, colunas: tuple):
+    """SELECT das colunas pedidas em ordem de id (PK): estável e sem sort no servidor."""
+    lote = int(getattr(get_settings(), "ESTOQUE_EXPORT_BATCH", 1000))
+    return select(*colunas).where(*filtros).order_by(Produto.id).execution_options(yield_per=lote)
+
+
+def _csv_valor(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (list, dict)):
+        return orjson.dumps(valor).decode("utf-8")
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def _ndjson(partes: Iterator[list], nomes: List[str]) -> Iterator[bytes]:
+    for linhas in partes:
+        yield b"".join(orjson.dumps(dict(zip(nomes, r))) + b"\n" for r in linhas)
+
+
+def _csv(partes: Iterator[list], nomes: List[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(nomes)
+    for linhas in partes:
+        writer.writerows([_csv_valor(v) for v in r] for r in linhas)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    # Catálogo vazio: só o cabeçalho
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _gzip(pedacos: Iterator[bytes]) -> Iterator[bytes]:
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+    for pedaco in pedacos:
+        saida = comp.compress(pedaco)
+        if saida:
+            yield saida
+    yield comp.flush()
+
+
+def _sessao_padrao() -> Session:
+    from app.core.database import engine
+    return Session(engine)
+
+
+def iter_exportacao(
+    filtros: List,
+    colunas: tuple,
+    formato: str = "ndjson",
+    gzip: bool = False,
+    session_factory: Optional[Callable[[], Session]] = None,
+) -> Iterator[bytes]:
+    """
+    Gera os bytes da exportação. Abre a própria sessão: o gerador roda depois que o
+    endpoint retornou, quando a sessão do Depends(get_session) já foi fechada.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"formato inválido: {formato!r} (use {', '.join(FORMATOS)})")
+    nomes = [c.key for c in colunas]
+
+    def _gerar() -> Iterator[bytes]:
+        total = 0
+        with (session_factory or _sessao_padrao)() as session:
+            partes = session.execute(query_exportacao(filtros, colunas)).partitions()
+
+            def _contando():
+                nonlocal total
+                for linhas in partes:
+                    total += len(linhas)
+                    yield linhas
+
+            serializador = _ndjson if formato == "ndjson" else _csv
+            yield from serializador(_contando(), nomes)
+        logger.info({"event": "ESTOQUE_EXPORT_DONE", "formato": formato, "linhas": total, "gzip": gzip})
+
+    return _gzip(_gerar()) if gzip else _gerar()
@@ -0,0 +1,126 @@
+"""
+Cliente HTTP do Mercado Livre com escopo de importação.
+
+Mantém uma única aiohttp.ClientSession (pool de conexões com keep-alive e cache
+de DNS) e um único token de leitura durante toda a execução. O token só é
+renovado quando expira ou quando a API responde 401.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.services.meli_concurrency import AdaptiveConcurrency
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+class MeliClient:
+    def __init__(
+        self,
+        pool_limit: Optional[int] = None,
+        pool_limit_per_host: Optional[int] = None,
+        token_ttl: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.base_url = getattr(settings, "ML_API_BASE_URL", "https://api.mercadolibre.com")
+        self.pool_limit = int(pool_limit or getattr(settings, "ML_HTTP_POOL_LIMIT", 20))
+        self.pool_limit_per_host = int(pool_limit_per_host or getattr(settings, "ML_HTTP_POOL_LIMIT_PER_HOST", 20))
+        self.token_ttl = int(token_ttl or getattr(settings, "ML_TOKEN_CACHE_SECONDS", 1800))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_generation = 0
+        self._token_lock: Optional[asyncio.Lock] = None
+        # Janela AIMD de requisições em voo desta importação
+        self.concurrency = AdaptiveConcurrency()
+
+    async def __aenter__(self) -> "MeliClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self._session is not None and not self._session.closed:
+            return
+        settings = get_settings()
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            ttl_dns_cache=int(getattr(settings, "ML_HTTP_DNS_TTL", 300)),
+            keepalive_timeout=int(getattr(settings, "ML_HTTP_KEEPALIVE", 30)),
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=20),
+            headers={"User-Agent": USER_AGENT},
+        )
+        self._token_lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("MeliClient não está aberto (use 'async with MeliClient()')")
+        return self._session
+
+    def url_for(self, endpoint: str) -> str:
+        return endpoint if endpoint.startswith("http") else f"{self.base_url}{endpoint}"
+
+    async def get_token(self) -> str:
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            from app.services.mercadolivre_service import get_access_token
+            token = await asyncio.to_thread(get_access_token, "read")
+            self._set_token(token)
+            return token
+
+    async def refresh_token(self, stale_token: Optional[str] = None) -> Optional[str]:
+        """
+        Renova o token após um 401. Requisições concorrentes que receberam 401 com o
+        mesmo token disparam uma única renovação.
+        """
+        async with self._token_lock:
+            if stale_token is not None and self._token and self._token != stale_token:
+                return self._token
+            from app.services.mercadolivre_service import refresh_access_token
+            new_access, _ = await asyncio.to_thread(refresh_access_token)
+            if not new_access:
+                logger.error({"event": "ML_CLIENT_REFRESH_FAIL"})
+                self._token = None
+                self._token_expires_at = 0.0
+                return None
+            self._set_token(new_access)
+            logger.info({"event": "ML_CLIENT_REFRESH_OK", "generation": self._token_generation})
+            return new_access
+
+    def _set_token(self, token: str) -> None:
+        self._token = token
+        self._token_expires_at = time.monotonic() + self.token_ttl
+        self._token_generation += 1
+
+
+@asynccontextmanager
+async def meli_client_scope(client: Optional[MeliClient] = None) -> AsyncIterator[MeliClient]:
+    """Reutiliza o cliente recebido ou abre um novo para a duração do bloco."""
+    if client is not None:
+        await client.open()
+        yield client
+        return
+    async with MeliClient() as own:
+        yield own
@@ -0,0 +1,265 @@
+"""
+Controle adaptativo (AIMD) de concorrência para as chamadas ao Mercado Livre.
+
+A janela de requisições em voo cresce +1 a cada rodada saudável (p95 abaixo do
+alvo e sem 429) e é reduzida multiplicativamente ao receber 429/Retry-After ou
+quando a latência estoura o alvo.
+
+As importações rodam nos workers: cada controlador publica o snapshot no Redis (hash
+meli:concurrency, um campo por processo, e o último em meli:concurrency:last) para o
+/diagnostics/meli/concurrency da API enxergar a janela deles.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import orjson
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+
+CHAVE = "meli:concurrency"
+ULTIMO = f"{CHAVE}:last"
+# Snapshot mais velho que isso é de um processo que parou (ou terminou a importação)
+_SNAPSHOT_TTL = 600
+# Fora das mudanças de janela, publica no máximo a cada N segundos
+_PUBLICAR_INTERVALO = 5.0
+
+_controllers: "weakref.WeakSet[AdaptiveConcurrency]" = weakref.WeakSet()
+_last_snapshot: Dict = {}
+_registry_lock = threading.Lock()
+_redis_failed_at = 0.0
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        name: str = "meli",
+        min_window: Optional[int] = None,
+        max_window: Optional[int] = None,
+        initial_window: Optional[int] = None,
+        latency_target_ms: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_decrease_factor: float = 0.8,
+        sample_size: int = 50,
+    ):
+        settings = get_settings()
+        self.name = name
+        self.min_window = max(1, int(min_window or getattr(settings, "ML_CONCURRENCY_MIN", 1)))
+        self.max_window = max(self.min_window, int(max_window or getattr(settings, "ML_MAX_IN_FLIGHT", 16)))
+        initial = int(initial_window or getattr(settings, "ML_CONCURRENCY_INITIAL", 4))
+        self.window = float(min(max(initial, self.min_window), self.max_window))
+        self.latency_target = float(latency_target_ms or getattr(settings, "ML_LATENCY_TARGET_MS", 1500)) / 1000.0
+        self.decrease_factor = decrease_factor
+        self.latency_decrease_factor = latency_decrease_factor
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_throttled = 0
+        self._latencies: deque = deque(maxlen=sample_size)
+        self._throttled: deque = deque(maxlen=sample_size)
+        self._round_successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self._published_at = 0.0
+        with _registry_lock:
+            _controllers.add(self)
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < int(self.window):
+                    self.in_flight += 1
+                    return
+                await cond.wait()
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def p95_latency(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def throttle_rate(self) -> float:
+        if not self._throttled:
+            return 0.0
+        return sum(self._throttled) / len(self._throttled)
+
+    def record(self, latency: float, status: int, retry_after: Optional[float] = None) -> None:
+        """Registra o resultado de uma requisição e ajusta a janela."""
+        self.total_requests += 1
+        throttled = status == 429
+        self._throttled.append(1 if throttled else 0)
+        if throttled:
+            self.total_throttled += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + float(retry_after))
+            self._decrease(self.decrease_factor, "429")
+            return
+        self._latencies.append(latency)
+        p95 = self.p95_latency()
+        if p95 is not None and len(self._latencies) >= 10 and p95 > self.latency_target:
+            self._decrease(self.latency_decrease_factor, "latency")
+            # Exige novas amostras antes de reduzir de novo pelo mesmo motivo
+            self._latencies.clear()
+            return
+        self._round_successes += 1
+        # Uma "rodada" = janela inteira concluída sem sinais de congestionamento
+        if self._round_successes >= int(self.window) and self.throttle_rate() == 0.0:
+            self._round_successes = 0
+            if self.window < self.max_window:
+                self._set_window(self.window + 1, "increase")
+                return
+        if time.monotonic() - self._published_at >= _PUBLICAR_INTERVALO:
+            self._publish()
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        now = time.monotonic()
+        self._round_successes = 0
+        # Vários 429 da mesma rajada contam como um único sinal
+        if now - self._last_decrease < max(self.latency_target, 1.0):
+            return
+        self._last_decrease = now
+        self._set_window(max(self.min_window, self.window * factor), reason)
+
+    def _set_window(self, value: float, reason: str) -> None:
+        old = self.window
+        self.window = float(value)
+        if int(old) != int(self.window):
+            logger.info({"event": "ML_CONCURRENCY_WINDOW", "controller": self.name, "window": int(self.window), "previous": int(old), "reason": reason})
+        # Não é preciso acordar ninguém aqui: record() roda dentro do slot e o release() seguinte notifica
+        self._publish()
+
+    def snapshot(self) -> Dict:
+        p95 = self.p95_latency()
+        return {
+            "controller": self.name,
+            "processo": _processo(),
+            "window": int(self.window),
+            "min_window": self.min_window,
+            "max_window": self.max_window,
+            "in_flight": self.in_flight,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "throttle_rate": round(self.throttle_rate(), 3),
+            "total_requests": self.total_requests,
+            "total_throttled": self.total_throttled,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+    def _publish(self) -> None:
+        global _last_snapshot
+        self._published_at = time.monotonic()
+        _last_snapshot = self.snapshot()
+        _publicar_redis(f"{_last_snapshot['processo']}:{self.name}", _last_snapshot)
+
+
+def _processo() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _redis():
+    if time.monotonic() - _redis_failed_at < 30:
+        return None
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+def _falhou(evento: str, e: Exception) -> None:
+    global _redis_failed_at
+    _redis_failed_at = time.monotonic()
+    logger.warning({"event": evento, "error": str(e)})
+
+
+def _publicar_redis(campo: str, snapshot: Dict) -> None:
+    """Grava o snapshot do processo; falha do Redis só gera aviso (e 30s sem tentar de novo)."""
+    r = _redis()
+    if r is None:
+        return
+    try:
+        data = orjson.dumps(snapshot).decode("utf-8")
+        with r.pipeline(transaction=False) as pipe:
+            pipe.hset(CHAVE, campo, data)
+            pipe.expire(CHAVE, _SNAPSHOT_TTL)
+            pipe.set(ULTIMO, data, ex=86400)
+            pipe.execute()
+    except Exception as e:
+        _falhou("ML_CONCURRENCY_PUBLISH_ERROR", e)
+
+
+def _snapshots_publicados() -> Optional[Dict]:
+    """Snapshots recentes de todos os processos (workers) e o último publicado; None sem Redis."""
+    r = _redis()
+    if r is None:
+        return None
+    try:
+        campos = r.hgetall(CHAVE)
+        ultimo = r.get(ULTIMO)
+    except Exception as e:
+        _falhou("ML_CONCURRENCY_READ_ERROR", e)
+        return None
+    limite = datetime.utcnow().timestamp() - _SNAPSHOT_TTL
+    processos, vencidos = [], []
+    for campo, data in campos.items():
+        snapshot = orjson.loads(data)
+        try:
+            recente = datetime.fromisoformat(snapshot["updated_at"]).timestamp() >= limite
+        except (KeyError, TypeError, ValueError):
+            recente = False
+        if recente:
+            processos.append(snapshot)
+        else:
+            vencidos.append(campo)
+    if vencidos:
+        try:
+            r.hdel(CHAVE, *vencidos)
+        except Exception as e:
+            _falhou("ML_CONCURRENCY_READ_ERROR", e)
+    processos.sort(key=lambda s: s["updated_at"], reverse=True)
+    return {"processos": processos, "last": orjson.loads(ultimo) if ultimo else None}
+
+
+def concurrency_metrics() -> Dict:
+    """
+    Janela atual dos controladores ativos neste processo, os snapshots publicados pelos
+    outros processos (workers) e o último estado conhecido.
+    """
+    with _registry_lock:
+        active: List[Dict] = [c.snapshot() for c in list(_controllers)]
+    publicados = _snapshots_publicados()
+    if publicados is None:
+        return {"active": active, "workers": [], "last": _last_snapshot or None}
+    return {"active": active, "workers": publicados["processos"], "last": publicados["last"] or _last_snapshot or None}
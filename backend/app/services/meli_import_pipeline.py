@@ -0,0 +1,268 @@
+"""
+Pipeline de importação do Mercado Livre em estágios com filas limitadas.
+
+    listagem de IDs -> detalhes (multiget) -> normalização/hash -> gravação em lotes
+
+Cada estágio conversa com o seguinte por uma asyncio.Queue com maxsize: quando o
+banco fica para trás, o multiget para de buscar; quando o multiget fica para trás,
+a listagem para de paginar. A memória fica constante (alguns lotes em voo) e cada
+lote é gravado e commitado assim que fica pronto, em vez de tudo no final.
+
+Com um checkpoint (services/meli_sync_checkpoint), cada chunk de IDs acompanha seus itens
+até o lote em que foi gravado, e o commit do lote grava também o ponto de retomada.
+"""
+import asyncio
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.core.database import engine
+from app.core.logger import logger
+from app.repositories.meli_item_snapshot_repo import apply_snapshot_batch
+from app.repositories.produto_repo import bulk_upsert_produtos
+from app.services.meli_client import MeliClient
+from app.services.meli_hash_utils import compute_meli_item_hash
+from app.services.mercadolivre_service import (
+    MELI_MULTIGET_MAX_IDS,
+    _chunk_ids,
+    fetch_items_multiget,
+    normalize_meli_product,
+)
+
+
+# Modos que guardam status/quantidades do ML e tratam mudança de status ou estoque como alteração
+MODOS_ESTENDIDOS = ("TODOS_STATUS", "INCREMENTAL")
+
+_FIM = object()
+
+
+def filtro_itens(dias: Optional[int] = None, somente_ativos: bool = False) -> Optional[Callable[[Dict], bool]]:
+    """Filtro aplicado logo após o multiget (status ativo e/ou atualizado nos últimos `dias`)."""
+    if not dias and not somente_ativos:
+        return None
+    limite = datetime.utcnow() - timedelta(days=int(dias)) if dias else None
+
+    def _aceita(item: Dict) -> bool:
+        if somente_ativos and item.get("status") != "active":
+            return False
+        if limite is not None:
+            last_updated = item.get("last_updated") or item.get("stop_time")
+            try:
+                if last_updated:
+                    dt = datetime.fromisoformat(last_updated.replace("Z", "+00:00")).replace(tzinfo=None)
+                    if dt < limite:
+                        return False
+            except Exception:
+                # Data ilegível: mantém o item
+                pass
+        return True
+
+    return _aceita
+
+
+def montar_registro(item: Dict, mode: str) -> Dict:
+    """Normaliza um item do ML e calcula o hash; o JSON bruto não segue adiante."""
+    pictures = item.get("pictures") or []
+    imagens = [p.get("secure_url") or p.get("url") for p in pictures if isinstance(p, dict)]
+    base = normalize_meli_product(item)
+    base["imagens"] = [u for u in imagens if u]
+    raw_payload = {"id": item.get("id"), "title": item.get("title"), "price": item.get("price"), "status": item.get("status")}
+    if mode in MODOS_ESTENDIDOS:
+        # Informações de status do ML para sincronização em tempo real
+        base["ml_status"] = item.get("status", "")
+        base["ml_available_quantity"] = item.get("available_quantity", 0)
+        base["ml_sold_quantity"] = item.get("sold_quantity", 0)
+        base["ml_last_updated"] = item.get("last_updated", "")
+        base["ml_stop_time"] = item.get("stop_time", "")
+        raw_payload.update({
+            "available_quantity": item.get("available_quantity"),
+            "sold_quantity": item.get("sold_quantity"),
+            "last_updated": item.get("last_updated"),
+        })
+    sku = str(base.get("sku"))
+    return {
+        "sku": sku,
+        "meli_id": str(item.get("id") or sku),
+        "status_meli": str(item.get("status") or ""),
+        "hash_conteudo": compute_meli_item_hash(base, item),
+        "produto": base,
+        "raw_payload": raw_payload,
+    }
+
+
+def registro_mudou(snap, registro: Dict, mode: str) -> bool:
+    if snap.hash_conteudo != registro["hash_conteudo"]:
+        return True
+    if mode not in MODOS_ESTENDIDOS:
+        return False
+    if snap.status_meli != registro["status_meli"]:
+        return True
+    # Venda/reabastecimento não entram no hash: compara com as quantidades do último snapshot
+    anterior = snap.raw_payload or {}
+    atual = registro["raw_payload"]
+    return any(anterior.get(k) != atual.get(k) for k in ("available_quantity", "sold_quantity"))
+
+
+def persistir_lote(session: Session, registros: List[Dict], mode: str, commit: bool = True) -> Dict[str, int]:
+    """
+    Diff de snapshot + upsert dos produtos novos/alterados do lote, numa única transação
+    (commit=False deixa o commit para quem chamou, ex.: junto com o checkpoint).
+    """
+    # Modo NOVOS: ignora qualquer item que já exista no snapshot (mesmo se mudou)
+    diff = apply_snapshot_batch(
+        session,
+        registros,
+        mudou=lambda snap, r: registro_mudou(snap, r, mode),
+        ignorar_existentes=mode == "NOVOS",
+        commit=False,
+    )
+    produtos = [r["produto"] for r in diff["novos"]] + [r["produto"] for _, r in diff["alterados"]]
+    if produtos:
+        bulk_upsert_produtos(session, produtos, commit=False)
+    if commit:
+        session.commit()
+    return {
+        "novos": len(diff["novos"]),
+        "atualizados": len(diff["alterados"]),
+        "ignorados_sem_mudanca": len(diff["inalterados"]) + len(diff["ignorados"]),
+    }
+
+
+def _persistir_lote_db(registros: List[Dict], mode: str) -> Dict[str, int]:
+    with Session(engine) as session:
+        return persistir_lote(session, registros, mode)
+
+
+async def executar_pipeline(
+    client: MeliClient,
+    id_pages: AsyncIterator[List[str]],
+    mode: str = "FULL",
+    limit: Optional[int] = None,
+    item_filter: Optional[Callable[[Dict], bool]] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    persist: Optional[Callable[[List[Dict], str], Dict[str, int]]] = None,
+    write_batch: Optional[int] = None,
+    fetch_workers: Optional[int] = None,
+    checkpoint=None,
+) -> Dict:
+    """
+    Executa a importação em fluxo contínuo e devolve apenas os contadores.
+
+    `persist` e `on_progress` rodam numa thread (código síncrono de banco); `on_progress`
+    recebe uma cópia das estatísticas depois de cada lote commitado. Com `checkpoint`
+    (CheckpointSync), IDs já gravados são pulados, os contadores partem dos salvos e cada
+    lote é gravado por checkpoint.gravar_lote (que substitui `persist`).
+    """
+    if checkpoint is not None and persist is not None:
+        raise ValueError("checkpoint não combina com persist próprio (o lote e o checkpoint vão na mesma transação)")
+    settings = get_settings()
+    write_batch = max(1, int(write_batch or getattr(settings, "ML_IMPORT_WRITE_BATCH", 200)))
+    fetch_workers = max(1, int(fetch_workers or getattr(settings, "ML_MAX_IN_FLIGHT", 16)))
+    queue_size = max(1, int(getattr(settings, "ML_PIPELINE_QUEUE_SIZE", 4)))
+    persist = persist or _persistir_lote_db
+
+    # Filas limitadas = backpressure; itens brutos (os maiores) têm a fila mais curta
+    ids_q: asyncio.Queue = asyncio.Queue(maxsize=fetch_workers * 2)
+    itens_q: asyncio.Queue = asyncio.Queue(maxsize=fetch_workers)
+    lotes_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    stats = {"listados": 0, "fetched": 0, "novos": 0, "atualizados": 0, "ignorados_sem_mudanca": 0, "lotes": 0, "modo": mode}
+    if checkpoint is not None:
+        stats.update(checkpoint.stats)
+
+    async def listar() -> None:
+        # O break do limit abandona o gerador: aclosing fecha a listagem (e o que ela segura) na hora
+        async with aclosing(id_pages) as paginas:
+            async for page in paginas:
+                if checkpoint is not None:
+                    page = checkpoint.pendentes(page)
+                chunks = []
+                for chunk in _chunk_ids(page, MELI_MULTIGET_MAX_IDS):
+                    if limit:
+                        chunk = chunk[: max(0, limit - stats["listados"])]
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    stats["listados"] += len(chunk)
+                # A página é registrada antes de os chunks entrarem na fila (fronteira em ordem)
+                seq = checkpoint.pagina_listada(len(chunks)) if checkpoint is not None else None
+                for chunk in chunks:
+                    await ids_q.put((seq, chunk))
+                if limit and stats["listados"] >= limit:
+                    break
+            else:
+                if checkpoint is not None:
+                    # Listagem completa: a fronteira final (concluida) entra com o último lote
+                    checkpoint.pagina_listada(0)
+        for _ in range(fetch_workers):
+            await ids_q.put(_FIM)
+
+    async def buscar() -> None:
+        while True:
+            marca = await ids_q.get()
+            if marca is _FIM:
+                break
+            seq, chunk = marca
+            itens = await fetch_items_multiget(chunk, client=client)
+            stats["fetched"] += len(itens)
+            buscados = len(itens)
+            if item_filter:
+                itens = [i for i in itens if item_filter(i)]
+            # Com checkpoint, até um chunk sem itens aproveitáveis precisa chegar à gravação
+            if itens or checkpoint is not None:
+                await itens_q.put(((seq, chunk, buscados), itens))
+        await itens_q.put(_FIM)
+
+    async def normalizar() -> None:
+        lote: List[Dict] = []
+        chunks: List = []
+        encerrados = 0
+        while encerrados < fetch_workers:
+            marca = await itens_q.get()
+            if marca is _FIM:
+                encerrados += 1
+                continue
+            chunk, itens = marca
+            for it in itens:
+                if isinstance(it, dict):
+                    lote.append(montar_registro(it, mode))
+            if checkpoint is not None:
+                chunks.append(chunk)
+            if len(lote) >= write_batch:
+                await lotes_q.put((lote, chunks))
+                lote, chunks = [], []
+        if lote or chunks:
+            await lotes_q.put((lote, chunks))
+        await lotes_q.put(_FIM)
+
+    async def gravar() -> None:
+        while True:
+            marca = await lotes_q.get()
+            if marca is _FIM:
+                break
+            lote, chunks = marca
+            if checkpoint is not None:
+                contadores = await asyncio.to_thread(checkpoint.gravar_lote, lote, mode, chunks)
+            else:
+                contadores = await asyncio.to_thread(persist, lote, mode)
+            for k, v in contadores.items():
+                stats[k] += int(v)
+            stats["lotes"] += 1
+            logger.info({"event": "ML_IMPORT_BATCH_COMMITTED", "modo": mode, "lote": stats["lotes"], "itens": len(lote), "fetched": stats["fetched"], "novos": stats["novos"], "atualizados": stats["atualizados"]})
+            if on_progress:
+                await asyncio.to_thread(on_progress, dict(stats))
+
+    tasks = [asyncio.create_task(listar()), asyncio.create_task(normalizar()), asyncio.create_task(gravar())]
+    tasks += [asyncio.create_task(buscar()) for _ in range(fetch_workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Uma falha em qualquer estágio derruba os demais (senão ficariam presos nas filas)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return stats
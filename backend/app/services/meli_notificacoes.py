@@ -0,0 +1,161 @@
+"""
+Sync por eventos: notificações do Mercado Livre (tópicos items e orders_v2).
+
+    POST /meli/notificacoes: valida e grava o recurso num stream do Redis (XADD) e responde na hora
+    meli.notificacoes (beat a cada ML_NOTIFICACOES_INTERVALO s): lê o stream num consumer group,
+        junta os IDs repetidos, troca pedidos pelos itens vendidos e roda multiget + diff de
+        snapshot num lote só
+
+Um item alterado custa uma fração de um multiget em vez de uma nova varredura das últimas
+horas. As entradas só recebem XACK depois de gravadas; as de um consumidor que morreu no meio
+voltam depois de ML_NOTIFICACOES_REIVINDICAR segundos (XAUTOCLAIM).
+"""
+import asyncio
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.services.meli_client import MeliClient
+
+
+STREAM = "meli:notificacoes"
+GRUPO = "sync"
+CONSUMIDOR = "worker"
+
+# Tópico -> recurso aceito (o ID vem no grupo 1)
+TOPICOS = {
+    "items": re.compile(r"^/items/([A-Z]{3}\d+)$"),
+    "orders_v2": re.compile(r"^/orders/(\d+)$"),
+}
+
+
+class NotificacaoInvalida(ValueError):
+    """Payload fora do formato do ML (400)."""
+
+
+class NotificacaoAlheia(ValueError):
+    """Notificação de outro vendedor ou aplicação (403)."""
+
+
+def validar(payload: Dict) -> Optional[Tuple[str, str]]:
+    """
+    (tópico, id do recurso) de uma notificação válida; None para tópicos que não sincronizamos
+    (o ML só precisa do 200). user_id e application_id são conferidos quando configurados.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("resource"), str) or not payload.get("topic"):
+        raise NotificacaoInvalida("notificação sem topic/resource")
+    settings = get_settings()
+    seller_id = str(getattr(settings, "ML_SELLER_ID", "") or "")
+    if seller_id and str(payload.get("user_id", "")) != seller_id:
+        raise NotificacaoAlheia(f"user_id {payload.get('user_id')!r} não é o vendedor configurado")
+    client_id = str(getattr(settings, "ML_CLIENT_ID", "") or "")
+    if client_id and payload.get("application_id") is not None and str(payload["application_id"]) != client_id:
+        raise NotificacaoAlheia(f"application_id {payload.get('application_id')!r} não é o desta aplicação")
+    padrao = TOPICOS.get(payload["topic"])
+    if padrao is None:
+        return None
+    casou = padrao.match(payload["resource"].split("?")[0])
+    if casou is None:
+        raise NotificacaoInvalida(f"resource {payload['resource']!r} inválido para o tópico {payload['topic']}")
+    return payload["topic"], casou.group(1)
+
+
+def enfileirar(r, topico: str, recurso_id: str) -> str:
+    """XADD no stream (limite aproximado de ML_NOTIFICACOES_STREAM_MAX entradas)."""
+    maximo = int(getattr(get_settings(), "ML_NOTIFICACOES_STREAM_MAX", 100000))
+    return r.xadd(STREAM, {"topic": topico, "id": recurso_id}, maxlen=maximo, approximate=True)
+
+
+def _garantir_grupo(r) -> None:
+    try:
+        r.xgroup_create(STREAM, GRUPO, id="0", mkstream=True)
+    except Exception as e:
+        # BUSYGROUP: o grupo já existe
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def ler_lote(r, limite: Optional[int] = None) -> List[Tuple[str, Dict]]:
+    """Entradas pendentes de um consumidor que morreu (XAUTOCLAIM) e, no espaço que sobrar, as novas."""
+    settings = get_settings()
+    limite = limite or int(getattr(settings, "ML_NOTIFICACOES_LOTE", 1000))
+    ocioso_ms = int(getattr(settings, "ML_NOTIFICACOES_REIVINDICAR", 300)) * 1000
+    _garantir_grupo(r)
+    entradas = list(r.xautoclaim(STREAM, GRUPO, CONSUMIDOR, ocioso_ms, start_id="0-0", count=limite)[1])
+    if len(entradas) < limite:
+        for _, novas in r.xreadgroup(GRUPO, CONSUMIDOR, {STREAM: ">"}, count=limite - len(entradas)) or []:
+            entradas.extend(novas)
+    return entradas
+
+
+def coalescer(entradas: Iterable[Tuple[str, Dict]]) -> Tuple[List[str], List[str]]:
+    """IDs únicos de itens e de pedidos, na ordem da primeira notificação."""
+    itens: Dict[str, None] = {}
+    pedidos: Dict[str, None] = {}
+    for _, campos in entradas:
+        if not campos:
+            continue
+        destino = pedidos if campos.get("topic") == "orders_v2" else itens
+        destino[campos.get("id")] = None
+    return [i for i in itens if i], [p for p in pedidos if p]
+
+
+async def itens_dos_pedidos(pedidos: List[str], client: MeliClient) -> Set[str]:
+    """Itens vendidos em cada pedido (o estoque deles mudou); pedido ilegível só gera aviso."""
+    from app.services.mercadolivre_service import meli_request
+
+    async def _itens(pedido_id: str) -> List[str]:
+        try:
+            pedido = await meli_request("GET", f"/orders/{pedido_id}", client=client)
+        except Exception as e:
+            logger.warning({"event": "ML_NOTIFICACAO_ORDER_ERROR", "order_id": pedido_id, "error": str(e)})
+            return []
+        return [str(oi.get("item", {}).get("id")) for oi in pedido.get("order_items") or [] if oi.get("item", {}).get("id")]
+
+    resultados = await asyncio.gather(*(_itens(p) for p in pedidos))
+    return {i for itens in resultados for i in itens}
+
+
+async def sincronizar_ids(ids: List[str], client: Optional[MeliClient] = None) -> Dict:
+    """Multiget + diff de snapshot dos IDs (todos os status: pausado/encerrado também muda o estoque)."""
+    if client is None:
+        async with MeliClient() as client:
+            return await sincronizar_ids(ids, client=client)
+    from app.services.meli_import_pipeline import executar_pipeline
+
+    async def _pages():
+        yield list(ids)
+
+    return await executar_pipeline(client, _pages(), mode="INCREMENTAL")
+
+
+async def _processar(entradas: List[Tuple[str, Dict]], client: Optional[MeliClient] = None) -> Dict:
+    if client is None:
+        async with MeliClient() as client:
+            return await _processar(entradas, client=client)
+    itens, pedidos = coalescer(entradas)
+    if pedidos:
+        vendidos = await itens_dos_pedidos(pedidos, client)
+        itens = list(dict.fromkeys(itens + sorted(vendidos)))
+    stats = await sincronizar_ids(itens, client=client) if itens else {}
+    return {"notificacoes": len(entradas), "itens": len(itens), "pedidos": len(pedidos), **stats}
+
+
+def processar_notificacoes(r=None, limite: Optional[int] = None, client: Optional[MeliClient] = None) -> Dict:
+    """Um lote do stream: coalesce, sincroniza e só então confirma (XACK + XDEL) as entradas."""
+    if r is None:
+        from app.core.redis_client import get_redis
+        r = get_redis()
+    entradas = ler_lote(r, limite)
+    if not entradas:
+        return {"notificacoes": 0}
+    resultado = asyncio.run(_processar(entradas, client))
+    ids = [entry_id for entry_id, _ in entradas]
+    r.xack(STREAM, GRUPO, *ids)
+    r.xdel(STREAM, *ids)
+    if resultado.get("itens"):
+        from app.core import response_cache
+        response_cache.invalidar("meli_items")
+    logger.info({"event": "ML_NOTIFICACOES_PROCESSADAS", **resultado})
+    return resultado
@@ -3,261 +3,273 @@ Módulo de correção da paginação do Mercado Livre
 Resolve o problema do limite de offset 1000
 """
 
-import asyncio
-import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Any, AsyncIterator, List, Dict, Optional, Set, Tuple
 from app.core.logger import logger
 from app.services.mercadolivre_service import meli_request
+from app.services.meli_client import MeliClient
 from app.core.config import get_settings
 
 
+ML_OFFSET_LIMIT = 1000
+ML_SEARCH_PAGE = 50
+ML_SCAN_PAGE = 100
+# Janela mínima da bissecção: abaixo disso não adianta dividir (itens criados no mesmo instante)
+MIN_WINDOW = timedelta(seconds=1)
+
+
+class ScanIndisponivel(Exception):
+    pass
+
+
+class CursorListagem:
+    """
+    Fronteira da listagem de IDs, atualizada pelos iteradores antes de cada página entregue:
+    o estado descreve onde continuar depois da última página. Serializável (checkpoint).
+    """
+
+    def __init__(self, fonte: Optional[str] = None, scroll_id: Optional[str] = None, scroll_em: Optional[str] = None,
+                 janelas: Optional[List[List[Any]]] = None, concluida: bool = False):
+        self.fonte = fonte  # "scan" | "janelas"
+        self.scroll_id = scroll_id
+        self.scroll_em = scroll_em
+        # Pilha de janelas pendentes [inicio, fim, offset] (topo = próxima a listar)
+        self.janelas = janelas or []
+        self.concluida = concluida
+
+    def to_dict(self) -> Dict:
+        return {
+            "fonte": self.fonte,
+            "scroll_id": self.scroll_id,
+            "scroll_em": self.scroll_em,
+            "janelas": [list(j) for j in self.janelas],
+            "concluida": self.concluida,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "CursorListagem":
+        data = data or {}
+        return cls(data.get("fonte"), data.get("scroll_id"), data.get("scroll_em"), data.get("janelas"), bool(data.get("concluida")))
+
+    def marcar_scroll(self, scroll_id: str) -> None:
+        self.fonte = "scan"
+        self.scroll_id = scroll_id
+        self.scroll_em = datetime.utcnow().isoformat()
+
+    def marcar_janelas(self, pendentes: List[Tuple[datetime, datetime, int]]) -> None:
+        self.fonte = "janelas"
+        self.scroll_id = self.scroll_em = None
+        self.janelas = [[a.isoformat(), b.isoformat(), off] for a, b, off in pendentes]
+
+    def janelas_pendentes(self) -> List[Tuple[datetime, datetime, int]]:
+        return [(datetime.fromisoformat(a), datetime.fromisoformat(b), int(off)) for a, b, off in self.janelas]
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+async def iter_ids_scan(
+    client: MeliClient,
+    seller_id: str,
+    status: Optional[str] = None,
+    page_size: int = ML_SCAN_PAGE,
+    cursor: Optional[CursorListagem] = None,
+) -> AsyncIterator[List[str]]:
+    """
+    Enumera os IDs do vendedor com search_type=scan (scroll), sem limite de offset.
+    A primeira chamada vai sem scroll_id; as seguintes repetem o scroll_id devolvido.
+
+    O scan nunca é retomado de um scroll_id salvo: a posição do scroll fica no servidor e
+    já passou das páginas listadas e não gravadas (a listagem corre à frente da gravação).
+    Uma retomada recomeça o scan e o checkpoint pula os IDs já gravados.
+    """
+    cursor = cursor if cursor is not None else CursorListagem()
+    endpoint = f"/users/{seller_id}/items/search"
+    params: Dict = {"search_type": "scan", "limit": page_size}
+    if status:
+        params["status"] = status
+    try:
+        payload = await meli_request("GET", endpoint, params=params, client=client)
+    except RuntimeError as e:
+        raise ScanIndisponivel(str(e))
+    scroll_id = payload.get("scroll_id") if isinstance(payload, dict) else None
+    if not scroll_id:
+        raise ScanIndisponivel("resposta sem scroll_id")
+    pagina = 1
+    while True:
+        results = payload.get("results") or []
+        if not results:
+            return
+        logger.info({"event": "ML_SCAN_PAGE", "page": pagina, "count": len(results)})
+        cursor.marcar_scroll(scroll_id)
+        yield results
+        pagina += 1
+        params = {"search_type": "scan", "scroll_id": scroll_id, "limit": page_size}
+        if status:
+            params["status"] = status
+        payload = await meli_request("GET", endpoint, params=params, client=client)
+        scroll_id = payload.get("scroll_id") or scroll_id
+
+
+async def iter_ids_por_janelas(
+    client: MeliClient,
+    seller_id: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    status: Optional[str] = None,
+    cursor: Optional[CursorListagem] = None,
+) -> AsyncIterator[List[str]]:
+    """
+    Enumera os IDs dividindo o período [since, until) ao meio, recursivamente, sempre
+    que paging.total da janela passar de 1000 (limite de offset da API). Com um cursor
+    de janelas, retoma da pilha salva (since/until são ignorados).
+    """
+    cursor = cursor if cursor is not None else CursorListagem()
+    endpoint = f"/users/{seller_id}/items/search"
+
+    def _params(start: datetime, end: datetime, offset: int) -> Dict:
+        params = {
+            "since": _iso(start),
+            "until": _iso(end),
+            "limit": ML_SEARCH_PAGE,
+            "offset": offset,
+            "sort": "date_created_desc",
+        }
+        if status:
+            params["status"] = status
+        return params
+
+    # Pilha em vez de recursão: processa as janelas mais antigas primeiro
+    if cursor.fonte == "janelas":
+        pendentes: List[Tuple[datetime, datetime, int]] = cursor.janelas_pendentes()
+    else:
+        pendentes = [(since, until, 0)]
+        cursor.marcar_janelas(pendentes)
+    while pendentes:
+        start, end, offset = pendentes.pop()
+        payload = await meli_request("GET", endpoint, params=_params(start, end, offset), client=client)
+        total = int((payload.get("paging") or {}).get("total", 0))
+        if offset == 0 and total > ML_OFFSET_LIMIT and end - start > MIN_WINDOW:
+            meio = start + (end - start) / 2
+            pendentes.append((meio, end, 0))
+            pendentes.append((start, meio, 0))
+            cursor.marcar_janelas(pendentes)
+            logger.info({"event": "ML_WINDOW_SPLIT", "since": _iso(start), "until": _iso(end), "total": total})
+            continue
+        if total > ML_OFFSET_LIMIT:
+            logger.warning({"event": "ML_WINDOW_TRUNCATED", "since": _iso(start), "until": _iso(end), "total": total})
+        results = payload.get("results") or []
+        while results:
+            offset += len(results)
+            # Fronteira depois desta página: a janela atual (se faltar algo) volta ao topo da pilha
+            resta = offset < min(total, ML_OFFSET_LIMIT)
+            cursor.marcar_janelas(pendentes + [(start, end, offset)] if resta else pendentes)
+            yield results
+            if not resta:
+                break
+            payload = await meli_request("GET", endpoint, params=_params(start, end, offset), client=client)
+            results = payload.get("results") or []
+        cursor.marcar_janelas(pendentes)
+
+
+async def iter_item_id_pages(
+    client: MeliClient,
+    seller_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    cursor: Optional[CursorListagem] = None,
+) -> AsyncIterator[List[str]]:
+    """
+    Lista completa de IDs do vendedor, em páginas sem duplicados.
+    Usa scan; se não estiver disponível (ou o scroll expirar), cai na bissecção por data.
+    `cursor` recebe a fronteira a cada página; vindo de um checkpoint, a bissecção retoma da
+    pilha de janelas salva e o scan recomeça do início.
+    """
+    seller_id = seller_id or get_settings().ML_SELLER_ID
+    cursor = cursor if cursor is not None else CursorListagem()
+    if cursor.concluida:
+        return
+    vistos: Set[str] = set()
+
+    def _novos(page: List[str]) -> List[str]:
+        out = [i for i in page if i not in vistos]
+        vistos.update(out)
+        return out
+
+    if cursor.fonte != "janelas":
+        try:
+            async for page in iter_ids_scan(client, seller_id, status=status, cursor=cursor):
+                novos = _novos(page)
+                if novos:
+                    yield novos
+            cursor.concluida = True
+            logger.info({"event": "ML_SCAN_DONE", "total_ids": len(vistos)})
+            return
+        except ScanIndisponivel as e:
+            logger.warning({"event": "ML_SCAN_SEARCH_NOT_AVAILABLE", "error": str(e), "message": "search_type=scan não disponível, usando bissecção por data"})
+        except RuntimeError as e:
+            logger.warning({"event": "ML_SCAN_INTERRUPTED", "error": str(e), "ids_ate_agora": len(vistos)})
+        inicio = since or await _data_inicio_vendedor(client, seller_id)
+        cursor.marcar_janelas([(inicio, datetime.utcnow() + timedelta(minutes=1), 0)])
+
+    async for page in iter_ids_por_janelas(client, seller_id, None, None, status=status, cursor=cursor):
+        novos = _novos(page)
+        if novos:
+            yield novos
+    cursor.concluida = True
+    logger.info({"event": "ML_WINDOWS_DONE", "total_ids": len(vistos)})
+
+
+async def _data_inicio_vendedor(client: MeliClient, seller_id: str) -> datetime:
+    try:
+        user = await meli_request("GET", f"/users/{seller_id}", client=client)
+        registro = user.get("registration_date")
+        if registro:
+            return datetime.fromisoformat(registro.replace("Z", "+00:00")).replace(tzinfo=None)
+    except Exception as e:
+        logger.warning({"event": "ML_SELLER_REGISTRATION_DATE_ERROR", "error": str(e)})
+    return datetime(2000, 1, 1)
+
+
 class MeliPaginacaoCorrigida:
     """
     Corrige a paginação do Mercado Livre para buscar todos os 17k+ produtos
-    Usa múltiplas estratégias para contornar o limite de offset 1000
+    Enumera por scan (scroll) e, sem scan, por bissecção de janelas de data
     """
-    
-    def __init__(self):
+
+    def __init__(self, client: Optional[MeliClient] = None):
+        self.client = client
         self.settings = get_settings()
         self.seller_id = self.settings.ML_SELLER_ID
-        self.batch_size = 50  # Máximo permitido pela API
-        
+
     async def buscar_todos_produtos(self, limit: Optional[int] = None) -> Tuple[List[str], int]:
         """
-        Busca TODOS os produtos do vendedor usando múltiplas estratégias
+        Busca TODOS os produtos do vendedor (IDs únicos, na ordem em que foram listados)
         """
+        if self.client is None:
+            async with MeliClient() as client:
+                self.client = client
+                try:
+                    return await self.buscar_todos_produtos(limit)
+                finally:
+                    self.client = None
         max_limit = limit or 50000  # Default alto para cobrir 17k+ produtos
-        collected_ids = set()  # Usar set para evitar duplicados
-        
+        all_ids: List[str] = []
+
         print(f"🎯 Buscando todos os produtos do seller {self.seller_id}")
-        
-        # Estratégia 1: Busca por status (ativa + inativa)
-        print("📋 Estratégia 1: Buscando por status...")
-        for status in ["active", "paused", "closed", "sold", "under_review", "payment_required"]:
-            ids = await self._buscar_por_status(status, max_limit)
-            collected_ids.update(ids)
-            print(f"✅ Status '{status}': {len(ids)} produtos encontrados")
-            if len(collected_ids) >= max_limit:
+        async for page in iter_item_id_pages(self.client, self.seller_id):
+            all_ids.extend(page[:max_limit - len(all_ids)])
+            if len(all_ids) >= max_limit:
                 break
-        
-        # Estratégia 2: Busca por períodos de data (últimos 2 anos)
-        print("📅 Estratégia 2: Buscando por períodos de data...")
-        ids_data = await self._buscar_por_periodos(max_limit)
-        collected_ids.update(ids_data)
-        print(f"✅ Períodos de data: {len(ids_data)} produtos adicionais")
-        
-        # Estratégia 3: Busca por categorias principais
-        print("🏷️ Estratégia 3: Buscando por categorias...")
-        ids_categorias = await self._buscar_por_categorias(max_limit)
-        collected_ids.update(ids_categorias)
-        print(f"✅ Categorias: {len(ids_categorias)} produtos adicionais")
-        
-        # Estratégia 4: Busca com search_type=scan (se disponível)
-        print("🔍 Estratégia 4: Buscando com search_type=scan...")
-        ids_scan = await self._buscar_com_scan(max_limit)
-        collected_ids.update(ids_scan)
-        print(f"✅ Search scan: {len(ids_scan)} produtos adicionais")
-        
-        # Converter para lista e limitar
-        all_ids = list(collected_ids)[:max_limit]
-        
+
         print(f"🎯 Total de produtos únicos encontrados: {len(all_ids)}")
         return all_ids, len(all_ids)
-    
-    async def _buscar_por_status(self, status: str, max_limit: int) -> List[str]:
-        """Busca produtos por status específico"""
-        ids = []
-        offset = 0
-        
-        while len(ids) < 2000:  # Limite por status para evitar excesso
-            try:
-                params = {
-                    "status": status,
-                    "limit": self.batch_size,
-                    "offset": offset,
-                    "sort": "date_created_desc"
-                }
-                
-                payload = await meli_request("GET", f"/users/{self.seller_id}/items/search", params=params)
-                if not payload:
-                    break
-                    
-                results = payload.get("results", [])
-                if not results:
-                    break
-                
-                ids.extend(results)
-                offset += self.batch_size
-                
-                # Parar se atingir offset 1000 ou limite
-                if offset >= 1000 or len(ids) >= 2000:
-                    break
-                    
-                # Pequena pausa para respeitar rate limit
-                await asyncio.sleep(0.2)
-                
-            except Exception as e:
-                logger.error({"event": "ML_STATUS_SEARCH_ERROR", "status": status, "error": str(e)})
-                break
-        
-        return ids
-    
-    async def _buscar_por_periodos(self, max_limit: int) -> List[str]:
-        """Busca produtos dividindo em períodos de tempo"""
-        ids = []
-        
-        # Dividir últimos 2 anos em períodos de 30 dias
-        dias_por_periodo = 30
-        total_dias = 730  # 2 anos
-        
-        for dias_atras in range(0, total_dias, dias_por_periodo):
-            if len(ids) >= max_limit:
-                break
-                
-            try:
-                data_fim = datetime.utcnow() - timedelta(days=dias_atras)
-                data_inicio = data_fim - timedelta(days=dias_por_periodo)
-                
-                params = {
-                    "limit": self.batch_size,
-                    "offset": 0,
-                    "since": data_inicio.isoformat(),
-                    "until": data_fim.isoformat(),
-                    "sort": "date_created_desc"
-                }
-                
-                payload = await meli_request("GET", f"/users/{self.seller_id}/items/search", params=params)
-                if payload:
-                    results = payload.get("results", [])
-                    novos_ids = [id for id in results if id not in ids]
-                    ids.extend(novos_ids)
-                    
-                    logger.info({"event": "ML_PERIOD_SEARCH", "periodo": f"{data_inicio.date()} até {data_fim.date()}", "novos_ids": len(novos_ids), "total": len(ids)})
-                
-                # Pausa entre períodos
-                await asyncio.sleep(0.3)
-                
-            except Exception as e:
-                logger.error({"event": "ML_PERIOD_SEARCH_ERROR", "dias_atras": dias_atras, "error": str(e)})
-                continue
-        
-        return ids
-    
-    async def _buscar_por_categorias(self, max_limit: int) -> List[str]:
-        """Busca produtos pelas categorias principais do vendedor"""
-        ids = []
-        
-        # Buscar categorias mais comuns do vendedor
-        try:
-            # Primeiro, pegar alguns produtos para identificar categorias
-            params = {
-                "limit": 50,
-                "offset": 0,
-                "status": "active",
-                "sort": "relevance_desc"
-            }
-            
-            payload = await meli_request("GET", f"/users/{self.seller_id}/items/search", params=params)
-            if payload:
-                results = payload.get("results", [])
-                
-                # Buscar detalhes dos produtos para identificar categorias
-                for item_id in results[:10]:
-                    try:
-                        item_details = await meli_request("GET", f"/items/{item_id}")
-                        if item_details:
-                            category_id = item_details.get("category_id")
-                            if category_id and len(ids) < max_limit:
-                                # Buscar mais produtos desta categoria
-                                category_ids = await self._buscar_por_categoria(category_id, max_limit - len(ids))
-                                ids.extend([id for id in category_ids if id not in ids])
-                    except Exception:
-                        continue
-        
-        except Exception as e:
-            logger.error({"event": "ML_CATEGORY_SEARCH_ERROR", "error": str(e)})
-        
-        return ids
-    
-    async def _buscar_por_categoria(self, category_id: str, limit: int) -> List[str]:
-        """Busca produtos de uma categoria específica"""
-        ids = []
-        offset = 0
-        
-        while len(ids) < limit and offset < 1000:
-            try:
-                params = {
-                    "category": category_id,
-                    "seller_id": self.seller_id,
-                    "limit": self.batch_size,
-                    "offset": offset,
-                    "sort": "relevance_desc"
-                }
-                
-                payload = await meli_request("GET", f"/sites/MLB/search", params=params)
-                if payload:
-                    results = payload.get("results", [])
-                    novos_ids = [item.get("id") for item in results if item.get("id") and item.get("id") not in ids]
-                    ids.extend(novos_ids)
-                    offset += self.batch_size
-                else:
-                    break
-                    
-                await asyncio.sleep(0.2)
-                
-            except Exception as e:
-                logger.error({"event": "ML_CATEGORY_DETAIL_SEARCH_ERROR", "category": category_id, "error": str(e)})
-                break
-        
-        return ids
-    
-    async def _buscar_com_scan(self, max_limit: int) -> List[str]:
-        """Tenta usar search_type=scan se disponível"""
-        ids = []
-        
-        try:
-            # Tentar usar search_type=scan para buscar todos os resultados
-            params = {
-                "search_type": "scan",
-                "limit": self.batch_size,
-                "scroll_id": "initial",  # ID inicial para scan
-                "sort": "none"  # Ordem não é garantida em scan
-            }
-            
-            payload = await meli_request("GET", f"/users/{self.seller_id}/items/search", params=params)
-            if payload:
-                results = payload.get("results", [])
-                scroll_id = payload.get("scroll_id")
-                
-                ids.extend(results)
-                
-                # Continuar buscando com scroll_id
-                while scroll_id and len(ids) < max_limit:
-                    params["scroll_id"] = scroll_id
-                    params["limit"] = self.batch_size
-                    
-                    payload = await meli_request("GET", f"/users/{self.seller_id}/items/search", params=params)
-                    if payload and payload.get("results"):
-                        results = payload.get("results", [])
-                        scroll_id = payload.get("scroll_id")
-                        ids.extend([id for id in results if id not in ids])
-                        
-                        await asyncio.sleep(0.1)
-                    else:
-                        break
-                        
-                logger.info({"event": "ML_SCAN_SEARCH_SUCCESS", "total_ids": len(ids)})
-        
-        except Exception as e:
-            logger.warning({"event": "ML_SCAN_SEARCH_NOT_AVAILABLE", "error": str(e), "message": "search_type=scan não disponível, usando outras estratégias"})
-        
-        return ids
-
-
-async def corrigir_paginacao_meli(limit: Optional[int] = None) -> Tuple[List[str], int]:
+
+
+async def corrigir_paginacao_meli(limit: Optional[int] = None, client: Optional[MeliClient] = None) -> Tuple[List[str], int]:
     """
     Função principal para corrigir a paginação e buscar todos os produtos
     """
-    paginador = MeliPaginacaoCorrigida()
-    return await paginador.buscar_todos_produtos(limit)
\ No newline at end of file
+    paginador = MeliPaginacaoCorrigida(client=client)
+    return await paginador.buscar_todos_produtos(limit)
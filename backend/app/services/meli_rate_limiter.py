@@ -0,0 +1,148 @@
+"""
+Limitador de taxa das chamadas à API do Mercado Livre.
+
+Token bucket compartilhado por todo o processo: capacidade de burst, reposição
+contínua (ML_RATE_LIMIT por minuto) e um semáforo que limita as requisições em
+voo. Com ML_RATE_LIMIT_BACKEND=redis o balde fica no Redis, e a API e os
+workers Celery dividem um único orçamento.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+
+# Reserva 1 token; devolve quantos ms esperar (0 = liberado). Usa o relógio do Redis.
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+if tokens >= 0 then return 0 end
+return math.ceil(-tokens / rate * 1000)
+"""
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate_per_minute: int, burst: int, max_in_flight: int, redis_key: Optional[str] = None):
+        self.rate = max(float(rate_per_minute), 1.0) / 60.0
+        self.capacity = float(max(burst, 1))
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.redis_key = redis_key
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        # asyncio.Semaphore fica preso ao loop em que é usado; cada loop (asyncio.run) ganha o seu
+        self._sems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._redis_script = None
+        self._redis_failed_at = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sem = self._sems.get(loop)
+            if sem is None:
+                sem = asyncio.Semaphore(self.max_in_flight)
+                self._sems[loop] = sem
+            return sem
+
+    def _reserve_local(self) -> float:
+        """Consome 1 token (pode ficar negativo = fila) e devolve quanto esperar em segundos."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate) - 1.0
+            self._updated = now
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _reserve_redis(self) -> Optional[float]:
+        # Após uma falha, usa o balde local por 30s antes de tentar o Redis de novo
+        if time.monotonic() - self._redis_failed_at < 30:
+            return None
+        try:
+            if self._redis_script is None:
+                from app.core.redis_client import get_redis
+                self._redis_script = get_redis().register_script(_REDIS_TOKEN_BUCKET)
+            wait_ms = self._redis_script(keys=[self.redis_key], args=[self.rate, self.capacity])
+            return float(wait_ms) / 1000.0
+        except Exception as e:
+            self._redis_failed_at = time.monotonic()
+            logger.warning({"event": "ML_RATE_LIMIT_REDIS_UNAVAILABLE", "error": str(e)})
+            return None
+
+    async def _take_token(self) -> None:
+        wait = None
+        if self.redis_key:
+            wait = await asyncio.to_thread(self._reserve_redis)
+        if wait is None:
+            wait = self._reserve_local()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def acquire(self) -> None:
+        sem = self._semaphore()
+        await sem.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            sem.release()
+            raise
+
+    def release(self) -> None:
+        self._semaphore().release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Ocupa uma vaga em voo + 1 token; a vaga é sempre devolvida ao sair."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+REDIS_KEY = "meli:rate_limit"
+
+_limiter: Optional[TokenBucketLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_meli_rate_limiter() -> TokenBucketLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                settings = get_settings()
+                backend = str(getattr(settings, "ML_RATE_LIMIT_BACKEND", "local")).lower()
+                _limiter = TokenBucketLimiter(
+                    rate_per_minute=int(getattr(settings, "ML_RATE_LIMIT", 250)),
+                    burst=int(getattr(settings, "ML_RATE_BURST", 20)),
+                    max_in_flight=int(getattr(settings, "ML_MAX_IN_FLIGHT", 8)),
+                    redis_key=REDIS_KEY if backend == "redis" else None,
+                )
+    return _limiter
+
+
+def usar_orcamento_compartilhado() -> TokenBucketLimiter:
+    """
+    Passa o balde deste processo para o Redis, qualquer que seja ML_RATE_LIMIT_BACKEND.
+    Usado pelos shards da sync distribuída: N workers dividem os mesmos ML_RATE_LIMIT/min
+    em vez de cada um gastar o seu (o que multiplicaria a carga na API por N).
+    """
+    limiter = get_meli_rate_limiter()
+    if limiter.redis_key is None:
+        limiter.redis_key = REDIS_KEY
+        logger.info({"event": "ML_RATE_LIMIT_SHARED_BUDGET", "key": REDIS_KEY})
+    return limiter
@@ -0,0 +1,123 @@
+"""
+Checkpoint da sincronização completa do Mercado Livre.
+
+Cada lote gravado pelo pipeline é commitado na MESMA transação que:
+    - os chunks de IDs (um multiget cada) que o lote fecha (melisyncchunk);
+    - a fronteira segura da listagem (scroll_id ou pilha de janelas de data) e os contadores.
+
+A listagem corre à frente da gravação (filas do pipeline), então a fronteira gravada é a da
+última página cujos chunks, e os de todas as páginas anteriores, já estão no banco. Ao
+retomar, a bissecção por data recomeça dessa fronteira (janelas podem ser relidas); o scan
+recomeça do início, porque o scroll do servidor já passou de páginas não gravadas. Em ambos
+os casos os IDs de chunks já gravados são pulados: nada é buscado nem gravado duas vezes.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session
+
+from app.core.logger import logger
+from app.repositories.meli_sync_checkpoint_repo import (
+    atualizar_checkpoint,
+    concluir_checkpoint,
+    ids_concluidos,
+    registrar_chunks,
+)
+from app.services.meli_paginacao_fix import CursorListagem
+
+
+CONTADORES = ("listados", "fetched", "novos", "atualizados", "ignorados_sem_mudanca", "lotes")
+
+# Chunk em trânsito no pipeline: (página de origem, IDs, itens devolvidos pelo multiget)
+Chunk = Tuple[int, List[str], int]
+
+
+def _sessao_padrao() -> Session:
+    from app.core.database import engine
+    return Session(engine)
+
+
+class CheckpointSync:
+    def __init__(
+        self,
+        checkpoint_id: int,
+        cursor: Optional[Dict] = None,
+        stats: Optional[Dict] = None,
+        concluidos: Optional[Set[str]] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
+        self.id = checkpoint_id
+        # Objeto vivo, atualizado pelos iteradores de IDs a cada página
+        self.cursor = CursorListagem.from_dict(cursor)
+        self.stats = {k: int((stats or {}).get(k, 0)) for k in CONTADORES}
+        self.ids_concluidos: Set[str] = set(concluidos or ())
+        self._session_factory = session_factory or _sessao_padrao
+        self._fronteira = self.cursor.to_dict()
+        # seq da página -> [chunks pendentes, cursor depois da página], em ordem de listagem
+        self._paginas: "OrderedDict[int, list]" = OrderedDict()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def carregar(cls, session: Session, registro, session_factory: Optional[Callable[[], Session]] = None) -> "CheckpointSync":
+        concluidos = ids_concluidos(session, registro.id)
+        if concluidos or registro.stats:
+            logger.info({"event": "ML_SYNC_CHECKPOINT_RESUME", "checkpoint_id": registro.id, "ids_concluidos": len(concluidos), "fonte": (registro.cursor or {}).get("fonte")})
+        return cls(registro.id, registro.cursor, registro.stats, concluidos, session_factory)
+
+    def pendentes(self, page: List[str]) -> List[str]:
+        """IDs da página que ainda não foram gravados."""
+        return [i for i in page if i not in self.ids_concluidos]
+
+    def pagina_listada(self, chunks: int) -> int:
+        """Registra uma página (já dividida em `chunks`) com a fronteira logo depois dela."""
+        with self._lock:
+            self._seq += 1
+            self._paginas[self._seq] = [chunks, self.cursor.to_dict()]
+            return self._seq
+
+    def _avancar(self, chunks: List[Chunk]) -> Dict:
+        with self._lock:
+            for seq, _, _ in chunks:
+                self._paginas[seq][0] -= 1
+            # Só avança enquanto as páginas mais antigas estiverem completas
+            while self._paginas:
+                seq, (faltam, cursor) = next(iter(self._paginas.items()))
+                if faltam > 0:
+                    break
+                self._fronteira = cursor
+                self._paginas.popitem(last=False)
+            return self._fronteira
+
+    def gravar_lote(self, registros: List[Dict], mode: str, chunks: List[Chunk]) -> Dict[str, int]:
+        """Lote + chunks + fronteira + contadores numa única transação."""
+        from app.services.meli_import_pipeline import persistir_lote
+
+        fronteira = self._avancar(chunks)
+        with self._session_factory() as session:
+            contadores = persistir_lote(session, registros, mode, commit=False) if registros else {}
+            registrar_chunks(session, self.id, [ids for _, ids, _ in chunks])
+            stats = dict(self.stats)
+            for k, v in contadores.items():
+                stats[k] = stats.get(k, 0) + int(v)
+            stats["listados"] += sum(len(ids) for _, ids, _ in chunks)
+            stats["fetched"] += sum(n for _, _, n in chunks)
+            stats["lotes"] += 1
+            atualizar_checkpoint(session, self.id, fronteira, stats)
+            session.commit()
+        self.stats = stats
+        for _, ids, _ in chunks:
+            self.ids_concluidos.update(ids)
+        return contadores
+
+    def tocar(self) -> None:
+        """Só renova atualizado_em (carga em massa: nada é commitado até o merge final)."""
+        with self._session_factory() as session:
+            atualizar_checkpoint(session, self.id, self._fronteira, self.stats)
+            session.commit()
+
+    def concluir(self) -> None:
+        with self._session_factory() as session:
+            concluir_checkpoint(session, self.id)
+        logger.info({"event": "ML_SYNC_CHECKPOINT_DONE", "checkpoint_id": self.id, **self.stats})
@@ -0,0 +1,127 @@
+"""
+Sincronização completa distribuída entre workers Celery.
+
+    coordenador: lista os IDs (scan/janelas, rápido) e divide em shards de ML_FULL_SYNC_SHARD_SIZE
+    shards (chord header): multiget + diff de snapshot + gravação, cada um numa transação
+    callback do chord: soma os contadores no MeliFullSyncJob e conclui o checkpoint
+
+Cada shard tem um job filho (parent_id = job da sync) que mostra no painel quantos faltam.
+
+Cada shard grava seus IDs como um chunk do checkpoint na mesma transação dos produtos: um
+shard reentregue ou repetido encontra o chunk e não faz nada, e uma nova execução depois de
+uma falha só despacha os IDs que faltam. Todos os workers dividem o balde de taxa no Redis.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.repositories.meli_full_sync_job_repo import finalizar_filho, notificar_progresso, somar_progresso
+from app.repositories.meli_sync_checkpoint_repo import chunk_registrado, registrar_chunks, somar_stats_checkpoint
+from app.services.meli_client import MeliClient
+
+
+CONTADORES = ("listados", "fetched", "novos", "atualizados", "ignorados_sem_mudanca", "lotes")
+
+
+def _sessao_padrao() -> Session:
+    from app.core.database import engine
+    return Session(engine)
+
+
+def tamanho_shard() -> int:
+    return max(1, int(getattr(get_settings(), "ML_FULL_SYNC_SHARD_SIZE", 200)))
+
+
+async def listar_shards(
+    checkpoint,
+    status: Optional[str] = None,
+    tamanho: Optional[int] = None,
+    limit: Optional[int] = None,
+    client: Optional[MeliClient] = None,
+) -> List[List[str]]:
+    """IDs ainda não gravados no checkpoint, em shards de `tamanho` (respeitando `limit`)."""
+    if client is None:
+        async with MeliClient() as client:
+            return await listar_shards(checkpoint, status, tamanho, limit, client=client)
+    from app.services.meli_paginacao_fix import iter_item_id_pages
+
+    tamanho = tamanho or tamanho_shard()
+    ja_gravados = checkpoint.stats.get("listados", 0)
+    pendentes: List[str] = []
+    async for page in iter_item_id_pages(client, status=status, cursor=checkpoint.cursor):
+        pendentes.extend(checkpoint.pendentes(page))
+        if limit and ja_gravados + len(pendentes) >= limit:
+            pendentes = pendentes[: max(0, limit - ja_gravados)]
+            break
+    return [pendentes[i:i + tamanho] for i in range(0, len(pendentes), tamanho)]
+
+
+async def _buscar_registros(ids: List[str], mode: str) -> tuple:
+    from app.services.meli_import_pipeline import montar_registro
+    from app.services.mercadolivre_service import fetch_items_multiget
+
+    async with MeliClient() as client:
+        itens = await fetch_items_multiget(ids, client=client)
+    return [montar_registro(it, mode) for it in itens if isinstance(it, dict)], len(itens)
+
+
+def processar_shard(
+    job_id: int,
+    checkpoint_id: int,
+    ids: List[str],
+    mode: str = "FULL",
+    session_factory: Optional[Callable[[], Session]] = None,
+    buscar: Optional[Callable] = None,
+    shard_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Busca e grava um shard. Produtos, chunk do checkpoint, incrementos de contadores (job
+    e checkpoint) e o fechamento do job filho `shard_id` vão numa única transação; shard já
+    gravado devolve {"duplicado": 1}.
+    """
+    from app.services.meli_import_pipeline import persistir_lote
+
+    session_factory = session_factory or _sessao_padrao
+    with session_factory() as session:
+        if chunk_registrado(session, checkpoint_id, ids):
+            logger.info({"event": "ML_SYNC_SHARD_DUPLICATE", "checkpoint_id": checkpoint_id, "ids": len(ids)})
+            return {"duplicado": 1}
+    registros, buscados = asyncio.run((buscar or _buscar_registros)(ids, mode))
+    with session_factory() as session:
+        contadores = persistir_lote(session, registros, mode, commit=False) if registros else {}
+        # Outro worker gravou o mesmo shard enquanto este buscava: desfaz tudo
+        if not registrar_chunks(session, checkpoint_id, [ids]):
+            session.rollback()
+            logger.info({"event": "ML_SYNC_SHARD_DUPLICATE", "checkpoint_id": checkpoint_id, "ids": len(ids)})
+            return {"duplicado": 1}
+        stats = {k: int(contadores.get(k, 0)) for k in ("novos", "atualizados", "ignorados_sem_mudanca")}
+        stats.update({"listados": len(ids), "fetched": buscados, "lotes": 1})
+        somar_stats_checkpoint(session, checkpoint_id, stats)
+        somar_progresso(session, job_id, stats)
+        if shard_id is not None:
+            finalizar_filho(session, shard_id, "done", stats)
+        session.commit()
+        notificar_progresso(session, job_id)
+    logger.info({"event": "ML_SYNC_SHARD_DONE", "job_id": job_id, **stats})
+    return stats
+
+
+def somar_resultados(resultados: Iterable[Optional[Dict]], base: Optional[Dict] = None) -> Dict:
+    """Contadores finais = base (gravado antes do despacho) + soma dos shards; conta falhas."""
+    total = {k: int((base or {}).get(k, 0)) for k in CONTADORES}
+    total["shards"] = total["shards_duplicados"] = total["shards_com_erro"] = 0
+    for r in resultados:
+        # Sem resultado (não deveria acontecer) conta como falha: os IDs ficam para a retomada
+        if not r or r.get("erro"):
+            total["shards_com_erro"] += 1
+            continue
+        if r.get("duplicado"):
+            total["shards_duplicados"] += 1
+            continue
+        total["shards"] += 1
+        for k in CONTADORES:
+            total[k] += int(r.get(k, 0))
+    return total
@@ -45,4 +45,7 @@ def seed_from_mercadolivre(session: Session, limit: int = 5):
         count += 1
 
     session.commit()
+    if count:
+        from app.repositories.produto_repo import produtos_alterados
+        produtos_alterados()
     logger.info({"event": "seed_done", "inserted": count})
\ No newline at end of file
@@ -1,7 +1,9 @@
 import time
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import math
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import threading
 import random
 
@@ -13,20 +15,14 @@ from app.models.ml_log import MLLog
 from app.core.database import get_session, engine
 from sqlmodel import Session, select
 from app.models.ml_token import MlToken
-from app.services.meli_hash_utils import compute_meli_item_hash
+from app.services.meli_client import MeliClient, meli_client_scope
+from app.services.meli_rate_limiter import TokenBucketLimiter, get_meli_rate_limiter
 from app.services.ml_token_manager import (
     ml_token_manager, 
     get_ml_token, 
     check_ml_token_status,
     notify_ml_token_renewal
 )
-from app.repositories.meli_item_snapshot_repo import (
-    get_snapshot_by_meli_id,
-    get_snapshot_by_sku,
-    upsert_snapshot_new,
-    mark_snapshot_unchanged,
-    update_snapshot_changed,
-)
 
 _tg_exchange_lock = threading.Lock()
 
@@ -428,64 +424,122 @@ def _auth_params(token: str) -> Dict[str, str]:
 
 def get_meli_products(limit: Optional[int] = None) -> List[Dict]:
     """
-    Importa produtos do Mercado Livre com limite configurável e controle de taxa.
-    Respeita 429 (Retry-After) e limita a 100 por execução (configurável).
+    Importa produtos do Mercado Livre com limite configurável (padrão ML_IMPORT_LIMIT).
+    Taxa, 429 (Retry-After) e concorrência ficam com o MeliClient.
     """
-    settings = get_settings()
-    token = get_access_token("read")  # Explicitamente usar leitura com Client Credentials
-    seller_id = settings.ML_SELLER_ID
-    headers = {"Authorization": f"Bearer {token}"}
+    return asyncio.run(get_meli_products_async(limit))
 
-    max_limit = int(limit or getattr(settings, "ML_IMPORT_LIMIT", 100))
-    batch_size = 50  # limite típico por requisição
-    all_items: List[str] = []
-    offset = 0
 
-    # Paginação de IDs
-    while len(all_items) < max_limit:
-        url = f"{settings.ML_API_BASE_URL}/users/{seller_id}/items/search"
-        params = {"limit": batch_size, "offset": offset}
-        try:
-            r = requests.get(url, headers=headers, params=params, timeout=20)
-            if r.status_code == 429:
-                retry = int(r.headers.get("Retry-After", 2))
-                logger.info({"event": "ml_rate_limit", "stage": "list", "sleep": retry})
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            ids = data.get("results", [])
-            if not ids:
-                break
+async def get_meli_products_async(limit: Optional[int] = None, client: Optional[MeliClient] = None) -> List[Dict]:
+    if client is None:
+        async with MeliClient() as client:
+            return await get_meli_products_async(limit, client=client)
+    max_limit = int(limit or getattr(get_settings(), "ML_IMPORT_LIMIT", 100))
+    all_items: List[str] = []
+    try:
+        async for ids in _iter_ids_busca(client, {}, limit=max_limit):
             all_items.extend(ids)
-            offset += batch_size
-            # Segurança anti-bloqueio
-            time.sleep(0.3)
-            if len(all_items) >= max_limit:
-                all_items = all_items[:max_limit]
-                break
-        except requests.RequestException as e:
-            logger.error({"event": "ml_list_items_error", "error": str(e)})
-            break
+    except MeliAuthError:
+        raise
+    except Exception as e:
+        logger.error({"event": "ml_list_items_error", "error": str(e)})
+    # Detalhes em lotes via multiget (até 20 IDs por requisição), na mesma sessão da listagem
+    return await fetch_items_multiget(all_items[:max_limit], include_attributes=None, client=client)
 
-    # Busca detalhes de cada item com controle de taxa
-    detailed: List[Dict] = []
-    for item_id in all_items:
-        item_url = f"{settings.ML_API_BASE_URL}/items/{item_id}"
-        try:
-            ir = requests.get(item_url, headers=headers, timeout=15)
-            if ir.status_code == 429:
-                retry = int(ir.headers.get("Retry-After", 3))
-                logger.info({"event": "ml_rate_limit", "stage": "item", "sleep": retry, "item_id": item_id})
-                time.sleep(retry)
-                continue
-            ir.raise_for_status()
-            detailed.append(ir.json())
-            time.sleep(0.25)
-        except requests.RequestException as e:
-            logger.error({"event": "ml_item_fetch_error", "item_id": item_id, "error": str(e)})
+
+MELI_MULTIGET_MAX_IDS = 20
+_MULTIGET_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+def _chunk_ids(ids: List[str], size: int) -> List[List[str]]:
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def _unpack_multiget(payload, requested: List[str]) -> Tuple[List[Dict], List[str], List[str]]:
+    """
+    Desempacota a resposta de /items?ids= ([{"code": 200, "body": {...}}, ...]).
+    Retorna (itens, ids_para_retentar, ids_descartados).
+    """
+    if not isinstance(payload, list):
+        return [], list(requested), []
+    items: List[Dict] = []
+    ok_ids = set()
+    failed: Dict[str, int] = {}
+    # O ML devolve os envelopes na mesma ordem dos IDs pedidos; corpos de erro não trazem o id
+    positional = len(payload) == len(requested)
+    for idx, envelope in enumerate(payload):
+        if not isinstance(envelope, dict):
+            continue
+        code = int(envelope.get("code") or 0)
+        body = envelope.get("body")
+        if code == 200 and isinstance(body, dict) and body.get("id"):
+            items.append(body)
+            ok_ids.add(str(body.get("id")))
+        elif positional:
+            failed[requested[idx]] = code
+    retry: List[str] = []
+    dropped: List[str] = []
+    for item_id in requested:
+        if item_id in ok_ids:
             continue
-    return detailed
+        code = failed.get(item_id)
+        if code is not None and code not in _MULTIGET_RETRYABLE_CODES:
+            dropped.append(item_id)
+        else:
+            retry.append(item_id)
+    return items, retry, dropped
+
+
+async def fetch_items_multiget(
+    item_ids: List[str],
+    include_attributes: Optional[str] = "all",
+    max_retries: Optional[int] = None,
+    client: Optional[MeliClient] = None,
+) -> List[Dict]:
+    """
+    Busca detalhes de itens em lotes de até 20 IDs via /items?ids= (multiget).
+    Apenas os IDs que falharam com erro transitório (429/5xx/rede) são retentados.
+    """
+    if client is None:
+        async with MeliClient() as client:
+            return await fetch_items_multiget(item_ids, include_attributes, max_retries, client=client)
+    settings = get_settings()
+    size = max(1, min(int(getattr(settings, "ML_MULTIGET_SIZE", MELI_MULTIGET_MAX_IDS)), MELI_MULTIGET_MAX_IDS))
+    retries = int(max_retries if max_retries is not None else getattr(settings, "ML_MULTIGET_RETRIES", 2))
+    pending = [str(i) for i in dict.fromkeys(item_ids) if i]
+    items: List[Dict] = []
+
+    async def fetch_chunk(chunk: List[str]) -> Tuple[List[Dict], List[str], List[str]]:
+        params = {"ids": ",".join(chunk)}
+        if include_attributes:
+            params["include_attributes"] = include_attributes
+        # A concorrência é limitada pela janela adaptativa do client
+        try:
+            payload = await meli_request("GET", "/items", params=params, client=client)
+        except MeliAuthError:
+            raise
+        except Exception as e:
+            logger.error({"event": "ML_MULTIGET_ERROR", "ids": len(chunk), "error": str(e)})
+            return [], list(chunk), []
+        return _unpack_multiget(payload, chunk)
+
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            delay = min(2 ** attempt, 10)
+            logger.info({"event": "ML_MULTIGET_RETRY", "attempt": attempt, "ids": len(pending), "sleep": delay})
+            await asyncio.sleep(delay)
+        results = await asyncio.gather(*[fetch_chunk(c) for c in _chunk_ids(pending, size)])
+        pending = []
+        for ok, retry, dropped in results:
+            items.extend(ok)
+            pending.extend(retry)
+            if dropped:
+                logger.warning({"event": "ML_MULTIGET_ITEM_SKIPPED", "item_ids": dropped})
+    if pending:
+        logger.error({"event": "ML_MULTIGET_GAVE_UP", "ids": len(pending), "sample": pending[:20]})
+    return items
 
 
 def normalize_meli_product(item: Dict) -> Dict:
@@ -501,27 +555,6 @@ def normalize_meli_product(item: Dict) -> Dict:
     }
 
 
-class RateLimiter:
-    def __init__(self, rate_per_minute: int, concurrency: int):
-        self.interval = max(60.0 / float(rate_per_minute), 0.01)
-        self._last = 0.0
-        self._lock = asyncio.Lock()
-        self._sem = asyncio.Semaphore(concurrency)
-
-    async def acquire(self):
-        await self._sem.acquire()
-        async with self._lock:
-            now = asyncio.get_running_loop().time()
-            elapsed = now - self._last
-            sleep_for = self.interval - elapsed
-            if sleep_for > 0:
-                await asyncio.sleep(sleep_for)
-            self._last = asyncio.get_running_loop().time()
-
-    def release(self):
-        self._sem.release()
-
-
 def _truncate_body(data: Dict | str, max_len: int = 500) -> str:
     try:
         if isinstance(data, str):
@@ -545,696 +578,290 @@ def refresh_if_needed() -> None:
         return
 
 
-async def _fetch_json(session: aiohttp.ClientSession, url: str, headers: Dict[str, str], rl: RateLimiter, max_retries: int = 2) -> Optional[Dict]:
+def _retry_after_segundos(valor: Optional[str], padrao: float = 2.0) -> float:
+    """Retry-After em segundos: número (inteiro ou decimal) ou HTTP-date; ausente ou inválido = `padrao`."""
+    if not valor:
+        return padrao
+    try:
+        segundos = float(valor)
+        return max(0.0, segundos) if math.isfinite(segundos) else padrao
+    except ValueError:
+        pass
+    try:
+        quando = parsedate_to_datetime(valor)
+    except (TypeError, ValueError, IndexError):
+        return padrao
+    if quando.tzinfo is None:
+        quando = quando.replace(tzinfo=timezone.utc)
+    return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+
+
+async def _fetch_once(client: MeliClient, url: str, token: str, rl: TokenBucketLimiter) -> Tuple[int, Dict[str, str], Optional[Dict]]:
+    # As vagas (janela AIMD + limitador) cobrem apenas a ida à rede; esperas (Retry-After, refresh) acontecem fora delas
+    async with client.concurrency.slot():
+        async with rl.slot():
+            started = time.monotonic()
+            try:
+                async with client.session.get(url, headers={"Authorization": f"Bearer {token}"}) as resp:
+                    retry_after = _retry_after_segundos(resp.headers.get("Retry-After")) if resp.status == 429 else None
+                    data = None if resp.status == 429 else await resp.json(content_type=None)
+                    client.concurrency.record(time.monotonic() - started, resp.status, retry_after=retry_after)
+                    return resp.status, dict(resp.headers), data
+            except asyncio.TimeoutError:
+                client.concurrency.record(time.monotonic() - started, 0)
+                raise
+
+
+async def _fetch_json(client: MeliClient, url: str, rl: TokenBucketLimiter, max_retries: int = 2) -> Optional[Dict]:
+    token = await client.get_token()
     for attempt in range(max_retries + 1):
-        await rl.acquire()
         try:
-            # Ensure friendly User-Agent for ML
-            headers = dict(headers)
-            headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=20)) as resp:
-                if resp.status == 429:
-                    retry_after = int(resp.headers.get("Retry-After", "2"))
-                    logger.info({"event": "ml_rate_limit", "url": url, "sleep": retry_after})
-                    rl.release()
-                    await asyncio.sleep(retry_after)
-                    continue
-                if resp.status == 401 and attempt == 0:
-                    new_access, _ = refresh_access_token()
-                    if new_access:
-                        headers["Authorization"] = f"Bearer {new_access}"
-                        logger.info({"event": "ML_API_REFRESH_OK", "url": url})
-                        rl.release()
-                        continue
-                    logger.error({"event": "ML_API_REFRESH_FAIL", "url": url})
-                data = await resp.json()
-                rl.release()
-                if resp.status in (401, 403):
-                    body_excerpt = _truncate_body(data)
-                    logger.error({"event": "IMPORT_MELI_FAIL", "status": resp.status, "endpoint": url, "body_excerpt": body_excerpt})
-                    raise MeliAuthError(resp.status, url, body_excerpt)
-                if resp.status >= 400:
-                    logger.error({"event": "ml_fetch_error", "status": resp.status, "url": url, "body": data})
-                    continue
-                return data
+            status, headers, data = await _fetch_once(client, url, token, rl)
         except asyncio.TimeoutError:
-            rl.release()
             logger.error({"event": "ml_timeout", "url": url})
             continue
-        except aiohttp.ClientError as e:
-            rl.release()
+        except (aiohttp.ClientError, ValueError) as e:
             logger.error({"event": "ml_client_error", "url": url, "error": str(e)})
             continue
+        if status == 429:
+            # A janela AIMD já pausou por este valor em _fetch_once; aqui a própria requisição espera
+            retry_after = _retry_after_segundos(headers.get("Retry-After"))
+            logger.info({"event": "ml_rate_limit", "url": url, "sleep": retry_after})
+            await asyncio.sleep(retry_after)
+            continue
+        if status == 401 and attempt == 0:
+            new_access = await client.refresh_token(stale_token=token)
+            if new_access:
+                token = new_access
+                logger.info({"event": "ML_API_REFRESH_OK", "url": url})
+                continue
+            logger.error({"event": "ML_API_REFRESH_FAIL", "url": url})
+        if status in (401, 403):
+            body_excerpt = _truncate_body(data)
+            logger.error({"event": "IMPORT_MELI_FAIL", "status": status, "endpoint": url, "body_excerpt": body_excerpt})
+            raise MeliAuthError(status, url, body_excerpt)
+        if status >= 400:
+            logger.error({"event": "ml_fetch_error", "status": status, "url": url, "body": data})
+            continue
+        return data
     return None
 
 
-async def meli_request(method: str, endpoint: str, params: Optional[Dict] = None, session: Optional[aiohttp.ClientSession] = None, rl: Optional[RateLimiter] = None) -> Dict:
-    settings = get_settings()
-    base = getattr(settings, "ML_API_BASE_URL", "https://api.mercadolibre.com")
-    token = get_access_token("read")  # Explicitamente usar leitura com Client Credentials
-    headers = {"Authorization": f"Bearer {token}"}
+async def meli_request(method: str, endpoint: str, params: Optional[Dict] = None, client: Optional[MeliClient] = None, rl: Optional[TokenBucketLimiter] = None) -> Dict:
+    """
+    Executa uma requisição de leitura na API do ML. Passe o `client` da importação para
+    reaproveitar a sessão (pool de conexões) e o token; sem ele, um cliente temporário é aberto.
+    """
     logger.info({"event": "ML_API_REQUEST", "method": method, "endpoint": endpoint, "params": params})
-    if endpoint.startswith("http"):
-        url = endpoint
-    else:
-        url = f"{base}{endpoint}"
-    if params:
-        from urllib.parse import urlencode
-        qs = urlencode(params)
-        sep = '&' if '?' in url else '?'
-        url = f"{url}{sep}{qs}"
-    owns_session = False
-    if session is None:
-        session = aiohttp.ClientSession()
-        owns_session = True
-    try:
-        if rl is None:
-            rl = RateLimiter(int(getattr(settings, "ML_RATE_LIMIT", 250)), 1)
-        data = await _fetch_json(session, url, headers, rl)
+    async with meli_client_scope(client) as client:
+        url = client.url_for(endpoint)
+        if params:
+            from urllib.parse import urlencode
+            qs = urlencode(params)
+            sep = '&' if '?' in url else '?'
+            url = f"{url}{sep}{qs}"
+        data = await _fetch_json(client, url, rl or get_meli_rate_limiter())
         if data is None:
             raise RuntimeError("Falha ao obter dados do Mercado Livre")
         return data
-    finally:
-        if owns_session:
-            await session.close()
 
 
-async def importar_meli_async(limit: int = 100, dias: Optional[int] = None, novos: bool = False) -> Tuple[List[Dict], int]:
-    settings = get_settings()
-    logger.info({"event": "IMPORT_MELI_START", "limit": limit, "dias": dias, "novos": novos})
-    seller_id = settings.ML_SELLER_ID
-
-    max_limit = int(limit or getattr(settings, "ML_IMPORT_LIMIT", 100))
-    batch_size = int(getattr(settings, "ML_IMPORT_BATCH", 100))
-    collected_ids: List[str] = []
+async def _iter_ids_busca(client: MeliClient, params: Dict, limit: Optional[int] = None, page_size: int = 50) -> AsyncIterator[List[str]]:
+    """Páginas de IDs de /items/search por offset (a API não passa do offset 1000)."""
+    seller_id = get_settings().ML_SELLER_ID
     offset = 0
-    me_payload = await meli_request("GET", "/users/me")
-    if not me_payload or not isinstance(me_payload, dict) or me_payload.get("id") is None:
-        body_excerpt = _truncate_body(me_payload or {})
-        logger.error({"event": "IMPORT_MELI_FAIL", "status": 0, "endpoint": f"{settings.ML_API_BASE_URL}/users/me", "body_excerpt": body_excerpt})
-        raise MeliAuthError(0, f"{settings.ML_API_BASE_URL}/users/me", body_excerpt)
     page_num = 1
-    while len(collected_ids) < max_limit:
-        payload = await meli_request("GET", f"/users/{seller_id}/items/search", params={"status": "active", "limit": batch_size, "offset": offset})
-        if not payload:
-            break
-        ids = payload.get("results", [])
+    while not limit or offset < limit:
+        # Validar limite de offset do Mercado Livre (máximo 1000)
+        if offset >= 1000:
+            logger.warning({"event": "ML_OFFSET_LIMIT_REACHED", "offset": offset, "message": "Atingido limite máximo de offset (1000) da API do Mercado Livre. Considere usar search_type=scan para mais resultados."})
+            return
+        payload = await meli_request("GET", f"/users/{seller_id}/items/search", params={**params, "limit": page_size, "offset": offset}, client=client)
+        ids = (payload or {}).get("results", [])
         if not ids:
-            break
-        collected_ids.extend(ids)
-        offset += batch_size
-        logger.info({"event": "IMPORT_MELI_PAGE", "page": page_num, "count": len(ids)})
+            return
+        logger.info({"event": "IMPORT_MELI_PAGE", "page": page_num, "count": len(ids), "offset": offset})
+        yield ids
+        offset += len(ids)
         page_num += 1
-        if len(collected_ids) >= max_limit:
-            collected_ids = collected_ids[:max_limit]
-            break
-
-    async def fetch_item(item_id: str) -> Optional[Dict]:
-        return await meli_request("GET", f"/items/{item_id}", params={"include_attributes": "all"})
-
-    tasks = [fetch_item(i) for i in collected_ids]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    items: List[Dict] = []
-    for r in results:
-        if isinstance(r, dict):
-            status = r.get("status")
-            if status != "active":
-                continue
-            if dias:
-                last_updated = r.get("last_updated") or r.get("stop_time")
-                try:
-                    if last_updated:
-                        dt = datetime.fromisoformat(last_updated.replace("Z", "+00:00")).replace(tzinfo=None)
-                        if dt < datetime.utcnow() - timedelta(days=int(dias)):
-                            continue
-                except Exception:
-                    pass
-            items.append(r)
-    return items, len(items)
-
-
-def importar_meli(limit: int = 100, dias: Optional[int] = None, novos: bool = False) -> Dict:
-    start = datetime.utcnow()
-    # Determina modo
-    mode = "FULL"
-    if dias and int(dias) > 0:
-        mode = "ULTIMOS_DIAS"
-    elif novos:
-        mode = "NOVOS"
-
-    logger.info({"event": "IMPORT_MELI_MODE", "modo": mode, "limit": limit, "dias": dias, "novos": novos})
-
-    items, fetched_count = asyncio.run(importar_meli_async(limit=limit, dias=dias, novos=novos))
-    normalized: List[Dict] = []
-
-    # Integração de snapshots e deduplicação
-    novos_count = 0
-    atualizados_count = 0
-    ignorados_count = 0
-
-    with next(get_session()) as session:
-        for it in items:
-            pictures = it.get("pictures") or []
-            imagens = [p.get("secure_url") or p.get("url") for p in pictures if isinstance(p, dict)]
-            base = normalize_meli_product(it)
-            base["imagens"] = [u for u in imagens if u]
-
-            sku = str(base.get("sku"))
-            meli_id = str(it.get("id") or sku)
-            status_meli = str(it.get("status") or "")
-            item_hash = compute_meli_item_hash(base, it)
-
-            snap = get_snapshot_by_meli_id(session, meli_id) or get_snapshot_by_sku(session, sku)
-            if not snap:
-                upsert_snapshot_new(session, sku, meli_id, item_hash, status_meli, {"id": it.get("id"), "title": it.get("title"), "price": it.get("price"), "status": it.get("status")})
-                novos_count += 1
-                logger.info({"event": "ML_ITEM_NEW", "sku": sku, "meli_id": meli_id})
-                normalized.append(base)
-                continue
-
-            # Modo NOVOS: ignora qualquer item que já exista no snapshot (mesmo se mudou)
-            if mode == "NOVOS":
-                ignorados_count += 1
-                logger.info({"event": "ML_ITEM_EXISTENTE_IGNORADO", "sku": sku, "meli_id": meli_id})
-                continue
-
-            if snap.hash_conteudo == item_hash:
-                mark_snapshot_unchanged(session, snap)
-                ignorados_count += 1
-                logger.info({"event": "ML_ITEM_UNCHANGED", "sku": sku, "meli_id": meli_id})
-                # Não adiciona para evitar reprocessamento
-                continue
+        # Se pegou menos que page_size, é a última página
+        if len(ids) < page_size:
+            return
 
-            update_snapshot_changed(session, snap, item_hash, status_meli, {"id": it.get("id"), "title": it.get("title"), "price": it.get("price"), "status": it.get("status")})
-            atualizados_count += 1
-            logger.info({"event": "ML_ITEM_CHANGED", "sku": sku, "meli_id": meli_id})
-            normalized.append(base)
 
+def _resultado_importacao(stats: Dict, start: datetime, origem_log: str, origem: str, evento: str) -> Dict:
     tempo_exec = (datetime.utcnow() - start).total_seconds()
     try:
         # persiste log (mantém contrato existente)
         with next(get_session()) as session:
-            log = MLLog(origem="MERCADO_LIVRE", total_importado=fetched_count, duracao_segundos=tempo_exec, status="sucesso")
+            log = MLLog(origem=origem_log, total_importado=stats.get("fetched", 0), duracao_segundos=tempo_exec, status="sucesso")
             session.add(log)
             session.commit()
     except Exception as e:
-        logger.error({"event": "ml_log_persist_error", "error": str(e)})
+        logger.error({"event": "ml_log_persist_error", "origem": origem_log, "error": str(e)})
+    from app.core import response_cache
+    response_cache.invalidar("meli_items")
 
     logger.info({
-        "event": "IMPORT_MELI_STATS",
-        "fetched": fetched_count,
-        "novos": novos_count,
-        "atualizados": atualizados_count,
-        "ignorados_sem_mudanca": ignorados_count,
-        "modo": mode,
+        "event": f"{evento}_STATS",
+        "fetched": stats.get("fetched", 0),
+        "novos": stats.get("novos", 0),
+        "atualizados": stats.get("atualizados", 0),
+        "ignorados_sem_mudanca": stats.get("ignorados_sem_mudanca", 0),
+        "modo": stats.get("modo"),
     })
-
+    importados = int(stats.get("novos", 0)) + int(stats.get("atualizados", 0))
     result = {
         "status": "sucesso",
-        "importados": len(normalized),
-        "origem": "Mercado Livre",
-        "tempo_execucao": f"{round(tempo_exec,2)}s",
-        "items": normalized,
+        "importados": importados,
+        "origem": origem,
+        "tempo_execucao": f"{round(tempo_exec, 2)}s",
+        "stats": stats,
     }
-    logger.info({"event": "IMPORT_MELI_DONE", "importados": len(normalized), "duracao": result["tempo_execucao"]})
+    logger.info({"event": f"{evento}_DONE", "importados": importados, "duracao": result["tempo_execucao"]})
     return result
 
 
-def importar_meli_todos_status(limit: Optional[int] = None, dias: Optional[int] = None) -> Dict:
+async def importar_meli_stream(
+    limit: int = 100,
+    dias: Optional[int] = None,
+    novos: bool = False,
+    client: Optional[MeliClient] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """Importa anúncios ativos em fluxo contínuo (pipeline), gravando lote a lote."""
+    if client is None:
+        async with MeliClient() as client:
+            return await importar_meli_stream(limit=limit, dias=dias, novos=novos, client=client, on_progress=on_progress)
+    from app.services.meli_import_pipeline import executar_pipeline, filtro_itens
+
+    settings = get_settings()
+    mode = "FULL"
+    if dias and int(dias) > 0:
+        mode = "ULTIMOS_DIAS"
+    elif novos:
+        mode = "NOVOS"
+    logger.info({"event": "IMPORT_MELI_MODE", "modo": mode, "limit": limit, "dias": dias, "novos": novos})
+
+    me_payload = await meli_request("GET", "/users/me", client=client)
+    if not me_payload or not isinstance(me_payload, dict) or me_payload.get("id") is None:
+        body_excerpt = _truncate_body(me_payload or {})
+        logger.error({"event": "IMPORT_MELI_FAIL", "status": 0, "endpoint": f"{settings.ML_API_BASE_URL}/users/me", "body_excerpt": body_excerpt})
+        raise MeliAuthError(0, f"{settings.ML_API_BASE_URL}/users/me", body_excerpt)
+
+    max_limit = int(limit or getattr(settings, "ML_IMPORT_LIMIT", 100))
+    return await executar_pipeline(
+        client,
+        _iter_ids_busca(client, {"status": "active"}, limit=max_limit),
+        mode=mode,
+        limit=max_limit,
+        item_filter=filtro_itens(dias, somente_ativos=True),
+        on_progress=on_progress,
+    )
+
+
+def importar_meli(limit: int = 100, dias: Optional[int] = None, novos: bool = False) -> Dict:
+    start = datetime.utcnow()
+    stats = asyncio.run(importar_meli_stream(limit=limit, dias=dias, novos=novos))
+    return _resultado_importacao(stats, start, "MERCADO_LIVRE", "Mercado Livre", "IMPORT_MELI")
+
+
+async def importar_meli_catalogo_stream(
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    dias: Optional[int] = None,
+    mode: str = "TODOS_STATUS",
+    client: Optional[MeliClient] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    persist: Optional[Callable[[List[Dict], str], Dict[str, int]]] = None,
+    checkpoint=None,
+) -> Dict:
+    """
+    Percorre o catálogo inteiro do vendedor (scan, com fallback de bissecção por data,
+    sem o limite de offset 1000) e importa em fluxo contínuo. `persist` troca o gravador
+    de lotes (ex.: CopyBulkLoader.persistir na carga inicial); `checkpoint` (CheckpointSync)
+    retoma a listagem da fronteira salva e grava o ponto de retomada a cada lote.
+    """
+    if client is None:
+        async with MeliClient() as client:
+            return await importar_meli_catalogo_stream(status=status, limit=limit, dias=dias, mode=mode, client=client, on_progress=on_progress, persist=persist, checkpoint=checkpoint)
+    from app.services.meli_paginacao_fix import iter_item_id_pages
+    from app.services.meli_import_pipeline import executar_pipeline, filtro_itens
+
+    logger.info({"event": "IMPORT_MELI_CATALOGO_START", "modo": mode, "status": status, "limit": limit, "dias": dias})
+    return await executar_pipeline(
+        client,
+        iter_item_id_pages(client, status=status, cursor=checkpoint.cursor if checkpoint is not None else None),
+        mode=mode,
+        limit=limit,
+        item_filter=filtro_itens(dias),
+        on_progress=on_progress,
+        persist=persist,
+        checkpoint=checkpoint,
+    )
+
+
+def importar_meli_todos_status(limit: Optional[int] = None, dias: Optional[int] = None, on_progress: Optional[Callable[[Dict], None]] = None, checkpoint=None) -> Dict:
     """
     Importa TODOS os produtos do Mercado Livre (ativos, vendidos, pausados, encerrados).
     Ideal para sincronização completa de grandes inventários (17k+ produtos).
     """
     start = datetime.utcnow()
-    mode = "TODOS_STATUS"
-    
-    logger.info({"event": "IMPORT_MELI_TODOS_STATUS_MODE", "modo": mode, "limit": limit, "dias": dias})
-    
-    items, fetched_count = asyncio.run(importar_meli_todos_status_async(limit=limit, dias=dias))
-    normalized: List[Dict] = []
-    
-    # Integração de snapshots e deduplicação
-    novos_count = 0
-    atualizados_count = 0
-    ignorados_count = 0
-    
-    with next(get_session()) as session:
-        for it in items:
-            pictures = it.get("pictures") or []
-            imagens = [p.get("secure_url") or p.get("url") for p in pictures if isinstance(p, dict)]
-            base = normalize_meli_product(it)
-            base["imagens"] = [u for u in imagens if u]
-            
-            # Adiciona informações de status do ML para sincronização em tempo real
-            base["ml_status"] = it.get("status", "")
-            base["ml_available_quantity"] = it.get("available_quantity", 0)
-            base["ml_sold_quantity"] = it.get("sold_quantity", 0)
-            base["ml_last_updated"] = it.get("last_updated", "")
-            base["ml_stop_time"] = it.get("stop_time", "")
-            
-            sku = str(base.get("sku"))
-            meli_id = str(it.get("id") or sku)
-            status_meli = str(it.get("status") or "")
-            item_hash = compute_meli_item_hash(base, it)
-            
-            snap = get_snapshot_by_meli_id(session, meli_id) or get_snapshot_by_sku(session, sku)
-            if not snap:
-                upsert_snapshot_new(session, sku, meli_id, item_hash, status_meli, {
-                    "id": it.get("id"), 
-                    "title": it.get("title"), 
-                    "price": it.get("price"), 
-                    "status": it.get("status"),
-                    "available_quantity": it.get("available_quantity"),
-                    "sold_quantity": it.get("sold_quantity"),
-                    "last_updated": it.get("last_updated")
-                })
-                novos_count += 1
-                logger.info({"event": "ML_ITEM_NEW_TODOS_STATUS", "sku": sku, "meli_id": meli_id, "status": status_meli})
-                normalized.append(base)
-                continue
-            
-            # Verifica se houve mudança no status ou quantidade (venda/reabastecimento)
-            if (snap.hash_conteudo != item_hash or 
-                snap.status_meli != status_meli or
-                (it.get("sold_quantity") and it.get("sold_quantity") != getattr(snap, "sold_quantity", None))):
-                
-                update_snapshot_changed(session, snap, item_hash, status_meli, {
-                    "id": it.get("id"), 
-                    "title": it.get("title"), 
-                    "price": it.get("price"), 
-                    "status": it.get("status"),
-                    "available_quantity": it.get("available_quantity"),
-                    "sold_quantity": it.get("sold_quantity"),
-                    "last_updated": it.get("last_updated")
-                })
-                atualizados_count += 1
-                logger.info({"event": "ML_ITEM_CHANGED_TODOS_STATUS", "sku": sku, "meli_id": meli_id, "status": status_meli})
-                normalized.append(base)
-                continue
-            
-            mark_snapshot_unchanged(session, snap)
-            ignorados_count += 1
-            logger.info({"event": "ML_ITEM_UNCHANGED_TODOS_STATUS", "sku": sku, "meli_id": meli_id, "status": status_meli})
-    
-    tempo_exec = (datetime.utcnow() - start).total_seconds()
-    try:
-        with next(get_session()) as session:
-            log = MLLog(origem="MERCADO_LIVRE_TODOS_STATUS", total_importado=fetched_count, duracao_segundos=tempo_exec, status="sucesso")
-            session.add(log)
-            session.commit()
-    except Exception as e:
-        logger.error({"event": "ml_log_persist_error_todos_status", "error": str(e)})
-    
-    logger.info({
-        "event": "IMPORT_MELI_TODOS_STATUS_STATS",
-        "fetched": fetched_count,
-        "novos": novos_count,
-        "atualizados": atualizados_count,
-        "ignorados_sem_mudanca": ignorados_count,
-        "modo": mode,
-    })
-    
-    result = {
-        "status": "sucesso",
-        "importados": len(normalized),
-        "origem": "Mercado Livre - Todos Status",
-        "tempo_execucao": f"{round(tempo_exec, 2)}s",
-        "items": normalized,
-    }
-    logger.info({"event": "IMPORT_MELI_TODOS_STATUS_DONE", "importados": len(normalized), "duracao": result["tempo_execucao"]})
-    return result
+    logger.info({"event": "IMPORT_MELI_TODOS_STATUS_MODE", "modo": "TODOS_STATUS", "limit": limit, "dias": dias})
+    stats = asyncio.run(importar_meli_catalogo_stream(limit=limit or 50000, dias=dias, mode="TODOS_STATUS", on_progress=on_progress, checkpoint=checkpoint))
+    return _resultado_importacao(stats, start, "MERCADO_LIVRE_TODOS_STATUS", "Mercado Livre - Todos Status", "IMPORT_MELI_TODOS_STATUS")
+
+
+async def importar_meli_incremental_stream(
+    since_date: str,
+    client: Optional[MeliClient] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """Importa em fluxo contínuo os produtos modificados após `since_date`."""
+    if client is None:
+        async with MeliClient() as client:
+            return await importar_meli_incremental_stream(since_date, client=client, on_progress=on_progress)
+    from app.services.meli_import_pipeline import executar_pipeline
 
+    # Produtos atualizados recentemente (ativos e inativos), mais recentes primeiro
+    id_pages = _iter_ids_busca(client, {"since": since_date, "sort": "last_updated_desc"})
+    return await executar_pipeline(client, id_pages, mode="INCREMENTAL", on_progress=on_progress)
 
-def importar_meli_incremental(hours: int = 24) -> Dict:
+
+def importar_meli_incremental(hours: int = 24, on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
     """
     Importa apenas produtos que foram modificados nas últimas horas.
     Ideal para sincronização incremental frequente (ex: a cada 15-30 minutos).
     """
     start = datetime.utcnow()
-    mode = "INCREMENTAL"
-    
-    logger.info({"event": "IMPORT_MELI_INCREMENTAL_MODE", "modo": mode, "hours": hours})
-    
-    # Calcula data limite (ex: últimas 24 horas)
-    since_date = start - timedelta(hours=hours)
-    since_iso = since_date.isoformat() + "Z"
-    
-    items, fetched_count = asyncio.run(importar_meli_incremental_async(since_date=since_iso, hours=hours))
-    normalized: List[Dict] = []
-    
-    # Integração de snapshots e deduplicação
-    novos_count = 0
-    atualizados_count = 0
-    ignorados_count = 0
-    
-    with next(get_session()) as session:
-        for it in items:
-            pictures = it.get("pictures") or []
-            imagens = [p.get("secure_url") or p.get("url") for p in pictures if isinstance(p, dict)]
-            base = normalize_meli_product(it)
-            base["imagens"] = [u for u in imagens if u]
-            
-            # Adiciona informações de status do ML para sincronização em tempo real
-            base["ml_status"] = it.get("status", "")
-            base["ml_available_quantity"] = it.get("available_quantity", 0)
-            base["ml_sold_quantity"] = it.get("sold_quantity", 0)
-            base["ml_last_updated"] = it.get("last_updated", "")
-            base["ml_stop_time"] = it.get("stop_time", "")
-            
-            sku = str(base.get("sku"))
-            meli_id = str(it.get("id") or sku)
-            status_meli = str(it.get("status") or "")
-            item_hash = compute_meli_item_hash(base, it)
-            
-            snap = get_snapshot_by_meli_id(session, meli_id) or get_snapshot_by_sku(session, sku)
-            if not snap:
-                upsert_snapshot_new(session, sku, meli_id, item_hash, status_meli, {
-                    "id": it.get("id"), 
-                    "title": it.get("title"), 
-                    "price": it.get("price"), 
-                    "status": it.get("status"),
-                    "available_quantity": it.get("available_quantity"),
-                    "sold_quantity": it.get("sold_quantity"),
-                    "last_updated": it.get("last_updated")
-                })
-                novos_count += 1
-                logger.info({"event": "ML_ITEM_NEW_INCREMENTAL", "sku": sku, "meli_id": meli_id, "status": status_meli})
-                normalized.append(base)
-                continue
-            
-            # Verifica se houve mudança no status ou quantidade (venda/reabastecimento)
-            if (snap.hash_conteudo != item_hash or 
-                snap.status_meli != status_meli or
-                (it.get("sold_quantity") and it.get("sold_quantity") != getattr(snap, "sold_quantity", None))):
-                
-                update_snapshot_changed(session, snap, item_hash, status_meli, {
-                    "id": it.get("id"), 
-                    "title": it.get("title"), 
-                    "price": it.get("price"), 
-                    "status": it.get("status"),
-                    "available_quantity": it.get("available_quantity"),
-                    "sold_quantity": it.get("sold_quantity"),
-                    "last_updated": it.get("last_updated")
-                })
-                atualizados_count += 1
-                logger.info({"event": "ML_ITEM_CHANGED_INCREMENTAL", "sku": sku, "meli_id": meli_id, "status": status_meli})
-                normalized.append(base)
-                continue
-            
-            mark_snapshot_unchanged(session, snap)
-            ignorados_count += 1
-            logger.info({"event": "ML_ITEM_UNCHANGED_INCREMENTAL", "sku": sku, "meli_id": meli_id, "status": status_meli})
-    
-    tempo_exec = (datetime.utcnow() - start).total_seconds()
-    try:
-        with next(get_session()) as session:
-            log = MLLog(origem="MERCADO_LIVRE_INCREMENTAL", total_importado=fetched_count, duracao_segundos=tempo_exec, status="sucesso")
-            session.add(log)
-            session.commit()
-    except Exception as e:
-        logger.error({"event": "ml_log_persist_error_incremental", "error": str(e)})
-    
-    logger.info({
-        "event": "IMPORT_MELI_INCREMENTAL_STATS",
-        "fetched": fetched_count,
-        "novos": novos_count,
-        "atualizados": atualizados_count,
-        "ignorados_sem_mudanca": ignorados_count,
-        "modo": mode,
-        "hours": hours
-    })
-    
-    result = {
-        "status": "sucesso",
-        "importados": len(normalized),
-        "origem": "Mercado Livre - Incremental",
-        "tempo_execucao": f"{round(tempo_exec, 2)}s",
-        "items": normalized,
-    }
-    logger.info({"event": "IMPORT_MELI_INCREMENTAL_DONE", "importados": len(normalized), "duracao": result["tempo_execucao"]})
-    return result
-
-
-async def importar_meli_incremental_async(since_date: str, hours: int = 24) -> Tuple[List[Dict], int]:
-    """
-    Busca produtos do Mercado Livre que foram modificados após a data especificada.
-    """
-    settings = get_settings()
-    seller_id = settings.ML_SELLER_ID
-    batch_size = 50  # Limite do ML para items/search
-    collected_ids = []
-    offset = 0
-    page_num = 1
-
-    # Busca IDs com filtro de data (last_updated)
-    while True:
-        # Validar limite de offset do Mercado Livre (máximo 1000)
-        if offset >= 1000:
-            logger.warning({"event": "ML_OFFSET_LIMIT_REACHED", "offset": offset, "message": "Atingido limite máximo de offset (1000) da API do Mercado Livre. Considere usar search_type=scan para mais resultados."})
-            break
-            
-        # Busca produtos atualizados recentemente (ativos e inativos)
-        payload = await meli_request("GET", f"/users/{seller_id}/items/search", 
-                                   params={
-                                       "limit": batch_size, 
-                                       "offset": offset,
-                                       "since": since_date,  # Filtro por data de atualização
-                                       "sort": "last_updated_desc"  # Ordena por mais recentes
-                                   })
-        
-        if not payload:
-            break
-            
-        ids = payload.get("results", [])
-        if not ids:
-            break
-            
-        collected_ids.extend(ids)
-        offset += batch_size
-        logger.info({"event": "IMPORT_MELI_INCREMENTAL_PAGE", "page": page_num, "count": len(ids), "total_coletado": len(collected_ids), "offset": offset})
-        page_num += 1
-        
-        # Se pegou menos que batch_size, é a última página
-        if len(ids) < batch_size:
-            break
+    logger.info({"event": "IMPORT_MELI_INCREMENTAL_MODE", "modo": "INCREMENTAL", "hours": hours})
+    since_iso = (start - timedelta(hours=hours)).isoformat() + "Z"
+    stats = asyncio.run(importar_meli_incremental_stream(since_iso, on_progress=on_progress))
+    return _resultado_importacao(stats, start, "MERCADO_LIVRE_INCREMENTAL", "Mercado Livre - Incremental", "IMPORT_MELI_INCREMENTAL")
 
-    # Busca detalhes de cada item com controle de taxa
-    async def fetch_item(item_id: str) -> Optional[Dict]:
-        return await meli_request("GET", f"/items/{item_id}", params={"include_attributes": "all"})
 
-    tasks = [fetch_item(i) for i in collected_ids]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    items: List[Dict] = []
-    
-    for r in results:
-        if isinstance(r, dict):
-            items.append(r)
-    
-    return items, len(items)
+async def importar_meli_ids_stream(
+    ids: List[str],
+    dias: Optional[int] = None,
+    mode: str = "FULL",
+    client: Optional[MeliClient] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    if client is None:
+        async with MeliClient() as client:
+            return await importar_meli_ids_stream(ids, dias=dias, mode=mode, client=client, on_progress=on_progress)
+    from app.services.meli_import_pipeline import executar_pipeline, filtro_itens
 
+    async def _pages() -> AsyncIterator[List[str]]:
+        yield list(ids)
 
-async def importar_meli_todos_status_async(limit: Optional[int] = None, dias: Optional[int] = None) -> Tuple[List[Dict], int]:
-    """
-    Busca TODOS os produtos do Mercado Livre independente do status (ativo, vendido, pausado, etc).
-    Ideal para sincronização completa de inventários grandes (17k+ produtos).
-    
-    🚨 CORRIGIDO: Agora usa múltiplas estratégias para contornar o limite de offset 1000
-    """
-    from app.services.meli_paginacao_fix import corrigir_paginacao_meli
-    
-    settings = get_settings()
-    seller_id = settings.ML_SELLER_ID
-    max_limit = limit or 50000  # Default 50k para cobrir 17k+ produtos
-    
-    print(f"🚀 Iniciando busca corrigida para {max_limit} produtos do seller {seller_id}")
-    
-    # 🎯 NOVA ESTRATÉGIA: Usar paginação corrigida que contorna o limite 1000
-    collected_ids, total_encontrado = await corrigir_paginacao_meli(max_limit)
-    
-    print(f"📊 Total de IDs únicos encontrados: {len(collected_ids)}")
-    
-    # Se não encontrou muitos produtos, tentar estratégia alternativa
-    if len(collected_ids) < 1000:
-        print("⚠️ Poucos produtos encontrados, tentando estratégia de categorias...")
-        # Buscar por categorias de auto peças principais
-        categorias_auto = [
-            "MLA5725",   # Acessórios para Veículos
-            "MLA1744",   # Autos, Motos y Otros  
-            "MLA11830",  # Repuestos y Accesorios
-            "MLA119440", # Accesorios de Auto y Camioneta
-            "MLA119441", # Accesorios para Motos
-            "MLA119442", # Herramientas para Vehículos
-            "MLA119443", # Lubricantes y Fluidos
-            "MLA119444", # Performance
-            "MLA119445", # Repuestos Carrocería
-            "MLA119446", # Repuestos Motor
-            "MLA119447", # Repuestos Suspensión y Dirección
-            "MLA119448", # Repuestos Transmisión
-            "MLA119449", # Rodados y Cubiertas
-            "MLA119450", # Seguridad Vehicular
-            "MLA119451", # Servicios para Vehículos
-            "MLA119452", # Tuning y Modificación
-        ]
-        
-        for categoria in categorias_auto[:8]:  # Limitar a 8 categorias principais
-            if len(collected_ids) >= max_limit:
-                break
-                
-            print(f"🔍 Buscando categoria {categoria}...")
-            try:
-                # Buscar produtos desta categoria deste vendedor
-                params = {
-                    "category": categoria,
-                    "seller_id": seller_id,
-                    "limit": 200,  # Limite por categoria
-                    "offset": 0,
-                    "sort": "relevance_desc"
-                }
-                
-                payload = await meli_request("GET", f"/sites/MLB/search", params=params)
-                if payload:
-                    results = payload.get("results", [])
-                    novos_ids = [item.get("id") for item in results if item.get("id") and item.get("id") not in collected_ids]
-                    collected_ids.extend(novos_ids)
-                    print(f"✅ Categoria {categoria}: {len(novos_ids)} produtos novos")
-                    
-                    # Pequena pausa entre categorias
-                    await asyncio.sleep(0.5)
-                    
-            except Exception as e:
-                print(f"⚠️ Erro na categoria {categoria}: {e}")
-                continue
-    
-    # Buscar detalhes dos produtos encontrados
-    print(f"📦 Buscando detalhes de {len(collected_ids)} produtos...")
-    
-    async def fetch_item(item_id: str) -> Optional[Dict]:
-        try:
-            return await meli_request("GET", f"/items/{item_id}", params={"include_attributes": "all"})
-        except Exception as e:
-            logger.error({"event": "ML_ITEM_FETCH_ERROR", "item_id": item_id, "error": str(e)})
-            return None
-    
-    # Processar em lotes para não sobrecarregar a API
-    items = []
-    batch_size = 20  # Processar 20 por vez
-    
-    for i in range(0, len(collected_ids), batch_size):
-        batch_ids = collected_ids[i:i+batch_size]
-        tasks = [fetch_item(item_id) for item_id in batch_ids]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for result in results:
-            if isinstance(result, dict) and result:
-                items.append(result)
-        
-        # Progresso
-        if (i + batch_size) % 100 == 0:
-            print(f"📊 Processados {len(items)} produtos...")
-        
-        # Pequena pausa entre lotes
-        if i + batch_size < len(collected_ids):
-            await asyncio.sleep(0.1)
-    
-    print(f"✅ Finalizado: {len(items)} produtos detalhados obtidos")
-    
-    # Aplicar filtro de dias se necessário
-    if dias:
-        items_filtrados = []
-        for item in items:
-            last_updated = item.get("last_updated") or item.get("stop_time")
-            try:
-                if last_updated:
-                    dt = datetime.fromisoformat(last_updated.replace("Z", "+00:00")).replace(tzinfo=None)
-                    if dt >= datetime.utcnow() - timedelta(days=int(dias)):
-                        items_filtrados.append(item)
-            except Exception:
-                # Se não conseguir parsear a data, incluir o item
-                items_filtrados.append(item)
-        
-        items = items_filtrados
-        print(f"📅 Após filtro de {dias} dias: {len(items)} produtos")
-    
-    return items, len(items)
+    return await executar_pipeline(client, _pages(), mode=mode, item_filter=filtro_itens(dias, somente_ativos=True), on_progress=on_progress)
 
 
 def importar_meli_from_ids(ids: List[str], dias: Optional[int] = None, mode: str = "FULL") -> Dict:
-    items: List[Dict] = []
-    async def _fetch(ids: List[str]) -> List[Dict]:
-        async def fetch_item(item_id: str) -> Optional[Dict]:
-            return await meli_request("GET", f"/items/{item_id}", params={"include_attributes": "all"})
-        tasks = [fetch_item(i) for i in ids]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        out: List[Dict] = []
-        for r in results:
-            if isinstance(r, dict):
-                status = r.get("status")
-                if status != "active":
-                    continue
-                if dias:
-                    last_updated = r.get("last_updated") or r.get("stop_time")
-                    try:
-                        if last_updated:
-                            dt = datetime.fromisoformat(last_updated.replace("Z", "+00:00")).replace(tzinfo=None)
-                            if dt < datetime.utcnow() - timedelta(days=int(dias)):
-                                continue
-                    except Exception:
-                        pass
-                out.append(r)
-        return out
-    items = asyncio.run(_fetch(ids))
-
-    normalized: List[Dict] = []
-    novos_count = 0
-    atualizados_count = 0
-    ignorados_count = 0
-
-    with next(get_session()) as session:
-        for it in items:
-            pictures = it.get("pictures") or []
-            imagens = [p.get("secure_url") or p.get("url") for p in pictures if isinstance(p, dict)]
-            base = normalize_meli_product(it)
-            base["imagens"] = [u for u in imagens if u]
-
-            sku = str(base.get("sku"))
-            meli_id = str(it.get("id") or sku)
-            status_meli = str(it.get("status") or "")
-            item_hash = compute_meli_item_hash(base, it)
-
-
-            snap = get_snapshot_by_meli_id(session, meli_id) or get_snapshot_by_sku(session, sku)
-            if not snap:
-                upsert_snapshot_new(session, sku, meli_id, item_hash, status_meli, {"id": it.get("id"), "title": it.get("title"), "price": it.get("price"), "status": it.get("status")})
-                novos_count += 1
-                logger.info({"event": "ML_ITEM_NEW", "sku": sku, "meli_id": meli_id})
-                normalized.append(base)
-                continue
-
-            if mode == "NOVOS":
-                ignorados_count += 1
-                logger.info({"event": "ML_ITEM_EXISTENTE_IGNORADO", "sku": sku, "meli_id": meli_id})
-                continue
-
-            if snap.hash_conteudo == item_hash:
-                mark_snapshot_unchanged(session, snap)
-                ignorados_count += 1
-                logger.info({"event": "ML_ITEM_UNCHANGED", "sku": sku, "meli_id": meli_id})
-                continue
-
-            update_snapshot_changed(session, snap, item_hash, status_meli, {"id": it.get("id"), "title": it.get("title"), "price": it.get("price"), "status": it.get("status")})
-            atualizados_count += 1
-            logger.info({"event": "ML_ITEM_CHANGED", "sku": sku, "meli_id": meli_id})
-            normalized.append(base)
-
-    stats = {
-        "fetched": len(items),
-        "novos": novos_count,
-        "atualizados": atualizados_count,
-        "ignorados_sem_mudanca": ignorados_count,
-        "modo": mode,
-    }
+    stats = asyncio.run(importar_meli_ids_stream(ids, dias=dias, mode=mode))
     logger.info({"event": "IMPORT_MELI_STATS", "fetched": stats["fetched"], "novos": stats["novos"], "atualizados": stats["atualizados"], "ignorados_sem_mudanca": stats["ignorados_sem_mudanca"], "modo": stats["modo"]})
-    return {"items": normalized, "stats": stats}
+    return {"stats": stats}
 
 def import_user_items(limit: int = 1000, since_hours: int = 24) -> Dict:
     """
@@ -1245,164 +872,8 @@ def import_user_items(limit: int = 1000, since_hours: int = 24) -> Dict:
         "limit": limit,
         "since_hours": since_hours
     })
-    
     try:
-        # Obter token para leitura (usa Client Credentials se possível)
-        access_token = get_access_token("read")
-        
-        if not access_token:
-            raise Exception("Não foi possível obter token válido para importação")
-        
-        # Obter ID do vendedor
-        settings = get_settings()
-        headers = {"Authorization": f"Bearer {access_token}"}
-        
-        # Buscar informações do usuário
-        me_url = f"{settings.ML_API_BASE_URL}/users/me"
-        me_response = requests.get(me_url, headers=headers, timeout=20)
-        
-        if me_response.status_code != 200:
-            logger.error({
-                "event": "IMPORT_MELI_AUTH_ERROR",
-                "status": me_response.status_code,
-                "url": me_url
-            })
-            raise Exception("Erro de autenticação ao buscar dados do usuário")
-        
-        user_data = me_response.json()
-        seller_id = user_data.get("id")
-        
-        if not seller_id:
-            raise Exception("Não foi possível obter ID do vendedor")
-        
-        logger.info({
-            "event": "IMPORT_MELI_USER_FOUND",
-            "seller_id": seller_id,
-            "nickname": user_data.get("nickname")
-        })
-        
-        # Calcular data de corte
-        since_date = None
-        if since_hours > 0:
-            since_date = (datetime.utcnow() - timedelta(hours=since_hours)).isoformat()
-        
-        # Buscar itens do vendedor
-        all_items = []
-        offset = 0
-        batch_size = 50
-        
-        while offset < limit:
-            current_batch_size = min(batch_size, limit - offset)
-            
-            logger.info({
-                "event": "IMPORT_MELI_BATCH",
-                "offset": offset,
-                "limit": current_batch_size,
-                "seller_id": seller_id
-            })
-            
-            try:
-                # Buscar IDs dos itens
-                url = f"{settings.ML_API_BASE_URL}/users/{seller_id}/items/search"
-                params = {
-                    "limit": current_batch_size, 
-                    "offset": offset,
-                    "sort": "date_created_desc"
-                }
-                
-                if since_date:
-                    params["since"] = since_date
-                
-                response = requests.get(url, headers=headers, params=params, timeout=20)
-                
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 2))
-                    logger.info({
-                        "event": "IMPORT_MELI_RATE_LIMIT",
-                        "sleep": retry_after
-                    })
-                    time.sleep(retry_after)
-                    continue
-                
-                response.raise_for_status()
-                data = response.json()
-                items_ids = data.get("results", [])
-                
-                if not items_ids:
-                    logger.info({
-                        "event": "IMPORT_MELI_NO_MORE_ITEMS",
-                        "offset": offset
-                    })
-                    break
-                
-                # Buscar detalhes de cada item
-                for item_id in items_ids:
-                    try:
-                        # Buscar detalhes do item
-                        item_url = f"{settings.ML_API_BASE_URL}/items/{item_id}"
-                        item_response = requests.get(item_url, headers=headers, params={"include_attributes": "all"}, timeout=20)
-                        
-                        if item_response.status_code == 429:
-                            retry_after = int(item_response.headers.get("Retry-After", 1))
-                            time.sleep(retry_after)
-                            continue
-                        
-                        if item_response.status_code != 200:
-                            logger.warning({
-                                "event": "IMPORT_MELI_ITEM_SKIPPED",
-                                "item_id": item_id,
-                                "status": item_response.status_code
-                            })
-                            continue
-                        
-                        item_details = item_response.json()
-                        
-                        # Aqui você processaria o item (salvar no banco, etc.)
-                        all_items.append(item_details)
-                        
-                        logger.info({
-                            "event": "IMPORT_MELI_ITEM_SUCCESS",
-                            "item_id": item_id,
-                            "title": item_details.get("title", "")[:50],
-                            "price": item_details.get("price"),
-                            "status": item_details.get("status")
-                        })
-                        
-                        # Pequena pausa entre itens
-                        time.sleep(0.2)
-                        
-                    except Exception as e:
-                        logger.error({
-                            "event": "IMPORT_MELI_ITEM_ERROR",
-                            "item_id": item_id,
-                            "error": str(e)
-                        })
-                
-                offset += current_batch_size
-                
-                # Pausa entre lotes
-                time.sleep(0.5)
-                
-            except Exception as e:
-                logger.error({
-                    "event": "IMPORT_MELI_BATCH_ERROR",
-                    "offset": offset,
-                    "error": str(e)
-                })
-                break
-        
-        logger.info({
-            "event": "IMPORT_MELI_COMPLETE",
-            "total_items": len(all_items),
-            "limit": limit
-        })
-        
-        return {
-            "success": True,
-            "items_imported": len(all_items),
-            "items": all_items
-        }
-        
+        return asyncio.run(import_user_items_async(limit=limit, since_hours=since_hours))
     except Exception as e:
         logger.error({
             "event": "IMPORT_MELI_ERROR",
@@ -1416,5 +887,88 @@ def import_user_items(limit: int = 1000, since_hours: int = 24) -> Dict:
         }
 
 
+async def import_user_items_async(limit: int = 1000, since_hours: int = 24, client: Optional[MeliClient] = None) -> Dict:
+    """Versão assíncrona de import_user_items: listagem e multiget na mesma sessão do MeliClient."""
+    if client is None:
+        async with MeliClient() as client:
+            return await import_user_items_async(limit=limit, since_hours=since_hours, client=client)
+
+    # Buscar informações do usuário (o token de leitura vem do client)
+    user_data = await meli_request("GET", "/users/me", client=client)
+    seller_id = (user_data or {}).get("id")
+    if not seller_id:
+        raise Exception("Não foi possível obter ID do vendedor")
+
+    logger.info({
+        "event": "IMPORT_MELI_USER_FOUND",
+        "seller_id": seller_id,
+        "nickname": user_data.get("nickname")
+    })
+
+    # Calcular data de corte
+    since_date = None
+    if since_hours > 0:
+        since_date = (datetime.utcnow() - timedelta(hours=since_hours)).isoformat()
+
+    all_items: List[Dict] = []
+    offset = 0
+    batch_size = 50
+    while offset < limit:
+        current_batch_size = min(batch_size, limit - offset)
+        logger.info({
+            "event": "IMPORT_MELI_BATCH",
+            "offset": offset,
+            "limit": current_batch_size,
+            "seller_id": seller_id
+        })
+        params = {
+            "limit": current_batch_size,
+            "offset": offset,
+            "sort": "date_created_desc"
+        }
+        if since_date:
+            params["since"] = since_date
+        try:
+            data = await meli_request("GET", f"/users/{seller_id}/items/search", params=params, client=client)
+            items_ids = data.get("results", [])
+            if not items_ids:
+                logger.info({
+                    "event": "IMPORT_MELI_NO_MORE_ITEMS",
+                    "offset": offset
+                })
+                break
+
+            # Buscar detalhes dos itens da página via multiget
+            page_items = await fetch_items_multiget(items_ids, include_attributes="all", client=client)
+            all_items.extend(page_items)
+            logger.info({
+                "event": "IMPORT_MELI_PAGE_SUCCESS",
+                "offset": offset,
+                "requested": len(items_ids),
+                "fetched": len(page_items)
+            })
+            offset += current_batch_size
+        except MeliAuthError:
+            raise
+        except Exception as e:
+            logger.error({
+                "event": "IMPORT_MELI_BATCH_ERROR",
+                "offset": offset,
+                "error": str(e)
+            })
+            break
+
+    logger.info({
+        "event": "IMPORT_MELI_COMPLETE",
+        "total_items": len(all_items),
+        "limit": limit
+    })
+    return {
+        "success": True,
+        "items_imported": len(all_items),
+        "items": all_items
+    }
+
+
 if __name__ == "__main__":
     print(refresh_access_token())
@@ -0,0 +1,260 @@
+"""
+Lease e deduplicação das syncs com o Mercado Livre no Redis.
+
+- Lease por job (classe:job_id): SET NX PX com um token por execução. Impede só duas
+  execuções do mesmo job (mensagem reentregue, job dado como parado que ainda roda); quantos
+  jobs de uma classe rodam juntos é o scheduler quem decide (limite_classe). O worker renova o prazo numa thread (heartbeat, a cada TTL/3) enquanto a sync
+  roda e libera no fim só se ainda for o dono; se o worker morrer, o lease vence em
+  ML_SYNC_LEASE_TTL segundos e a mensagem reentregue assume. Na sync distribuída o lease
+  passa ao chord com ML_SYNC_FANOUT_LEASE_TTL, e cada shard mantém o heartbeat enquanto roda.
+- Dedup de pedidos: tipo + params -> job_id. Pedidos iguais (beat, cliques repetidos)
+  enquanto o job está na fila ou rodando caem no mesmo job; finalizar() libera a chave.
+
+Sem Redis, vale só o que o banco garante (lock do scheduler e prazo do checkpoint); após
+uma falha o Redis fica 30s sem ser consultado, como no cache e no rate limiter.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import orjson
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+
+PREFIXO = "meli:sync"
+# Reserva de um pedido enquanto o job ainda está sendo criado
+_RESERVADO = "reservado"
+_RESERVA_TTL = 10
+_ESPERA_INTERVALO = 0.05
+# reservar_pedido: outro processo continua com a reserva depois da espera
+EM_CRIACAO = object()
+
+# Renova/libera só se o lease (ou a chave de dedup) ainda for nosso
+_RENOVAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_LIBERAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_redis_failed_at = 0.0
+
+
+class LeasePerdido(Exception):
+    """O lease venceu e outra execução pode ter assumido: esta para sem mexer no job."""
+
+
+def _redis():
+    if time.monotonic() - _redis_failed_at < 30:
+        return None
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+def _falhou(evento: str, e: Exception) -> None:
+    global _redis_failed_at
+    _redis_failed_at = time.monotonic()
+    logger.warning({"event": evento, "error": str(e)})
+
+
+def lease_ttl() -> int:
+    return max(3, int(getattr(get_settings(), "ML_SYNC_LEASE_TTL", 120)))
+
+
+def fanout_ttl() -> int:
+    return max(lease_ttl(), int(getattr(get_settings(), "ML_SYNC_FANOUT_LEASE_TTL", 900)))
+
+
+class Lease:
+    """Lease de `nome` (um job de sync, o consumidor de notificações); `with lease:` mantém o heartbeat e libera na saída."""
+
+    def __init__(self, nome: str, token: Optional[str] = None, ttl: Optional[int] = None):
+        self.chave = f"{PREFIXO}:lease:{nome}"
+        self.token = token or uuid.uuid4().hex
+        self.ttl = ttl or lease_ttl()
+        # ativo: o lease está no Redis (sem Redis a execução segue sem ele)
+        self.ativo = False
+        self.perdido = False
+        self.transferido = False
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def adquirir(self) -> bool:
+        """False só quando outra execução detém o lease."""
+        r = _redis()
+        if r is None:
+            return True
+        try:
+            if not r.set(self.chave, self.token, nx=True, px=self.ttl * 1000):
+                return False
+        except Exception as e:
+            _falhou("ML_SYNC_LEASE_REDIS_UNAVAILABLE", e)
+            return True
+        self.ativo = True
+        return True
+
+    def renovar(self) -> bool:
+        """Estende o prazo; False (e perdido=True) se o lease já não é nosso."""
+        r = _redis()
+        if not self.ativo or r is None:
+            return True
+        try:
+            if r.eval(_RENOVAR, 1, self.chave, self.token, self.ttl * 1000):
+                return True
+        except Exception as e:
+            # Sem como saber: o prazo ainda corre e a próxima batida tenta de novo
+            _falhou("ML_SYNC_LEASE_REDIS_UNAVAILABLE", e)
+            return True
+        self.perdido = True
+        logger.error({"event": "ML_SYNC_LEASE_LOST", "chave": self.chave})
+        return False
+
+    def verificar(self) -> None:
+        if self.perdido:
+            raise LeasePerdido(self.chave)
+
+    def liberar(self) -> None:
+        r = _redis()
+        if not self.ativo or r is None:
+            return
+        try:
+            r.eval(_LIBERAR, 1, self.chave, self.token)
+        except Exception as e:
+            _falhou("ML_SYNC_LEASE_REDIS_UNAVAILABLE", e)
+        self.ativo = False
+
+    def transferir(self, ttl: Optional[int] = None) -> str:
+        """
+        Sai do `with` sem liberar: quem recebe o token (chord de shards) renova e libera. `ttl`
+        estende o prazo para a espera na fila até o primeiro shard começar a renovar.
+        """
+        if ttl:
+            self.ttl = ttl
+            self.renovar()
+        self.transferido = True
+        return self.token
+
+    def _bater(self) -> None:
+        while not self._parar.wait(max(1.0, self.ttl / 3)):
+            if not self.renovar():
+                return
+
+    def __enter__(self) -> "Lease":
+        if self.ativo:
+            if self.transferido:
+                # Recebido de outra execução: o prazo pode estar no fim
+                self.renovar()
+            self._thread = threading.Thread(target=self._bater, name=f"lease-{self.chave}", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if not self.transferido:
+            self.liberar()
+        return False
+
+
+def lease_do_job(classe: str, job_id: int, token: Optional[str] = None, ttl: Optional[int] = None) -> Lease:
+    return Lease(f"{classe}:{job_id}", token, ttl=ttl)
+
+
+def lease_ocupado(classe: str, job_id: int) -> bool:
+    """Alguma execução do job renova o lease agora (False sem Redis)."""
+    r = _redis()
+    if r is None:
+        return False
+    try:
+        return bool(r.exists(lease_do_job(classe, job_id).chave))
+    except Exception as e:
+        _falhou("ML_SYNC_LEASE_REDIS_UNAVAILABLE", e)
+        return False
+
+
+def lease_recebido(classe: str, job_id: int, token: Optional[str]) -> Lease:
+    """
+    Lease transferido para um shard do chord: `with` renova na entrada e em heartbeat enquanto
+    o shard roda, e não libera na saída (quem libera é o callback do chord).
+    """
+    lease = lease_do_job(classe, job_id, token, ttl=fanout_ttl())
+    lease.ativo = bool(token)
+    lease.transferido = True
+    return lease
+
+
+def liberar_token(classe: str, job_id: int, token: Optional[str]) -> None:
+    if token:
+        lease = lease_do_job(classe, job_id, token)
+        lease.ativo = True
+        lease.liberar()
+
+
+def _dedup_ttl() -> int:
+    return int(getattr(get_settings(), "ML_SYNC_DEDUP_TTL", 3600))
+
+
+def chave_pedido(tipo: str, params: Optional[Dict]) -> str:
+    bruto = orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS)
+    return f"{PREFIXO}:dedup:{tipo}:{hashlib.sha1(bruto).hexdigest()}"
+
+
+def reservar_pedido(tipo: str, params: Optional[Dict]):
+    """
+    job_id de um pedido igual ainda aberto, ou None: quem chamou ficou com a reserva, cria o
+    job e chama registrar_pedido (ou liberar_pedido se desistir). Espera alguns segundos se
+    outro processo está criando o mesmo pedido e devolve EM_CRIACAO se ele não terminar a
+    tempo (a reserva continua dele); sem Redis devolve None.
+    """
+    r = _redis()
+    if r is None:
+        return None
+    chave = chave_pedido(tipo, params)
+    fim = time.monotonic() + _RESERVA_TTL
+    try:
+        while True:
+            if r.set(chave, _RESERVADO, nx=True, ex=_RESERVA_TTL):
+                return None
+            valor = r.get(chave)
+            if valor is not None and valor != _RESERVADO:
+                return int(valor)
+            if valor is None:
+                continue
+            if time.monotonic() >= fim:
+                return EM_CRIACAO
+            time.sleep(_ESPERA_INTERVALO)
+    except Exception as e:
+        _falhou("ML_SYNC_DEDUP_REDIS_UNAVAILABLE", e)
+        return None
+
+
+def registrar_pedido(tipo: str, params: Optional[Dict], job_id: int) -> None:
+    r = _redis()
+    if r is None:
+        return
+    try:
+        r.set(chave_pedido(tipo, params), str(job_id), ex=_dedup_ttl())
+    except Exception as e:
+        _falhou("ML_SYNC_DEDUP_REDIS_UNAVAILABLE", e)
+
+
+def liberar_pedido(tipo: str, params: Optional[Dict], job_id: Optional[int] = None) -> None:
+    """Apaga a chave se ainda apontar para `job_id` (None = a reserva deste processo)."""
+    r = _redis()
+    if r is None:
+        return
+    try:
+        r.eval(_LIBERAR, 1, chave_pedido(tipo, params), _RESERVADO if job_id is None else str(job_id))
+    except Exception as e:
+        _falhou("ML_SYNC_DEDUP_REDIS_UNAVAILABLE", e)
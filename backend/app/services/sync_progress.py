@@ -0,0 +1,133 @@
+"""
+Eventos de progresso do MeliFullSyncJob via Redis pub/sub.
+
+O worker publica o estado do job a cada save() (canal meli:sync:progress) e guarda o último
+estado em meli:sync:progress:last; o endpoint SSE assina o canal e repassa cada evento,
+começando pelo último estado conhecido. Sem Redis, o stream cai para leitura periódica do job.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import orjson
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+
+CANAL = "meli:sync:progress"
+ULTIMO = f"{CANAL}:last"
+_ULTIMO_TTL = 86400
+
+_redis_failed_at = 0.0
+
+
+def job_status(job) -> Dict[str, Any]:
+    """Representação pública do job (mesmos campos de GET /meli/sync/status)."""
+    if job is None:
+        return {"status": "idle"}
+    return {
+        "job_id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "total_previsto": job.total_previsto,
+        "processados": job.processados,
+        "novos": job.novos,
+        "atualizados": job.atualizados,
+        "ignorados": job.ignorados,
+        "offset_atual": job.offset_atual,
+        "batch_tamanho": job.batch_tamanho,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error_message": job.error_message,
+    }
+
+
+def publicar_progresso(job) -> None:
+    """Publica o estado do job; falha do Redis só gera aviso (e 30s sem tentar de novo)."""
+    global _redis_failed_at
+    if time.monotonic() - _redis_failed_at < 30:
+        return
+    try:
+        from app.core.redis_client import get_redis
+        data = orjson.dumps(job_status(job)).decode("utf-8")
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.set(ULTIMO, data, ex=_ULTIMO_TTL)
+            pipe.publish(CANAL, data)
+            pipe.execute()
+    except Exception as e:
+        _redis_failed_at = time.monotonic()
+        logger.warning({"event": "SYNC_PROGRESS_PUBLISH_ERROR", "error": str(e)})
+
+
+def _sse(data: str, event: str = "progresso") -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _snapshot_db() -> str:
+    """Estado atual lido do banco (o job exibido no painel)."""
+    from sqlmodel import Session
+    from app.core.database import engine
+    from app.repositories.meli_full_sync_job_repo import job_atual
+    with Session(engine) as session:
+        return orjson.dumps(job_status(job_atual(session))).decode("utf-8")
+
+
+def _abrir_redis():
+    import redis.asyncio as aioredis
+    return aioredis.Redis.from_url(get_settings().REDIS_URL, socket_connect_timeout=2, decode_responses=True)
+
+
+async def _por_polling(desconectado: Callable[[], Awaitable[bool]], snapshot: Callable[[], str], intervalo: float) -> AsyncIterator[str]:
+    """Fallback sem Redis: lê o job a cada `intervalo` e emite só quando muda."""
+    anterior: Optional[str] = None
+    while not await desconectado():
+        atual = await asyncio.to_thread(snapshot)
+        if atual != anterior:
+            anterior = atual
+            yield _sse(atual)
+        else:
+            yield ": ping\n\n"
+        await asyncio.sleep(intervalo)
+
+
+async def eventos_progresso(
+    desconectado: Callable[[], Awaitable[bool]],
+    heartbeat: Optional[float] = None,
+    abrir_redis: Callable[[], Any] = _abrir_redis,
+    snapshot: Callable[[], str] = _snapshot_db,
+) -> AsyncIterator[str]:
+    """
+    Stream SSE: último estado conhecido, depois um evento por publicação do worker e um
+    comentário de heartbeat a cada `heartbeat` segundos (mantém proxies com a conexão aberta).
+    """
+    settings = get_settings()
+    heartbeat = float(heartbeat if heartbeat is not None else getattr(settings, "ML_SYNC_EVENTS_HEARTBEAT", 15))
+    yield "retry: 5000\n\n"
+    r = abrir_redis()
+    pubsub = r.pubsub()
+    try:
+        try:
+            await pubsub.subscribe(CANAL)
+            ultimo = await r.get(ULTIMO)
+        except Exception as e:
+            logger.warning({"event": "SYNC_PROGRESS_SUBSCRIBE_ERROR", "error": str(e)})
+            async for evento in _por_polling(desconectado, snapshot, heartbeat):
+                yield evento
+            return
+        yield _sse(ultimo if ultimo is not None else await asyncio.to_thread(snapshot))
+        ultimo_envio = time.monotonic()
+        while not await desconectado():
+            msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if msg is not None and msg.get("type") == "message":
+                yield _sse(msg["data"])
+                ultimo_envio = time.monotonic()
+            elif time.monotonic() - ultimo_envio >= heartbeat:
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+    finally:
+        try:
+            await pubsub.aclose()
+            await r.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,187 @@
+"""
+Fila de jobs de sincronização com o Mercado Livre.
+
+Cada pedido (rota, beat, chamada direta da task) vira uma linha queued em melifullsyncjob;
+despachar() promove os próximos da fila (prioridade, depois ordem de chegada) enquanto a
+classe do tipo tiver vaga e envia a task Celery com o job_id. Tipos de catálogo (full e
+todos_status) dividem uma classe: com o limite padrão (1), nunca rodam dois ao mesmo tempo. Incrementais têm classe
+própria e prioridade maior, então intercalam com uma sync completa longa em vez de esperar
+por ela. Cada job que termina chama finalizar(), que despacha o próximo.
+"""
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, text
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.models.meli_full_sync_job import MeliFullSyncJob
+from app.repositories.meli_full_sync_job_repo import FINAIS, save
+from app.services import sync_lock
+
+
+TIPOS: Dict[str, Dict] = {
+    "full": {"task": "meli.full_sync", "classe": "catalogo", "prioridade": 0},
+    "todos_status": {"task": "meli.full_sync_todos_status", "classe": "catalogo", "prioridade": 0},
+    "incremental": {"task": "meli.incremental_sync", "classe": "incremental", "prioridade": 10},
+}
+
+# Chave do pg_advisory_xact_lock que serializa os despachos (API e workers)
+_LOCK_DESPACHO = 7_241_001
+
+
+def classe_do_tipo(tipo: str) -> str:
+    return TIPOS.get(tipo, {}).get("classe", tipo)
+
+
+def limite_classe(classe: str) -> int:
+    """Jobs simultâneos por classe (ML_SYNC_LIMITE_CATALOGO, ML_SYNC_LIMITE_INCREMENTAL)."""
+    return max(1, int(getattr(get_settings(), f"ML_SYNC_LIMITE_{classe.upper()}", 1)))
+
+
+def _enviar_celery(job: MeliFullSyncJob) -> None:
+    # send_task pelo nome: a API não precisa importar o módulo das tasks
+    from app.workers.celery_app import celery_app
+    celery_app.send_task(TIPOS[job.tipo]["task"], kwargs={"job_id": job.id, **(job.params or {})}, task_id=job.task_id)
+
+
+def enfileirar(
+    session: Session,
+    tipo: str,
+    params: Optional[Dict] = None,
+    prioridade: Optional[int] = None,
+    enviar: Optional[Callable[[MeliFullSyncJob], None]] = None,
+) -> MeliFullSyncJob:
+    """Cria o job (queued) e já tenta despachá-lo; devolve o job com o status atualizado."""
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo de sync inválido: {tipo!r} (use {', '.join(TIPOS)})")
+    job = MeliFullSyncJob(
+        tipo=tipo,
+        params=params or {},
+        status="queued",
+        prioridade=TIPOS[tipo]["prioridade"] if prioridade is None else int(prioridade),
+        criado_em=datetime.utcnow(),
+    )
+    job = save(session, job)
+    logger.info({"event": "ML_SYNC_JOB_QUEUED", "job_id": job.id, "tipo": tipo, "prioridade": job.prioridade})
+    despachar(session, enviar)
+    session.refresh(job)
+    return job
+
+
+def solicitar(
+    session: Session,
+    tipo: str,
+    params: Optional[Dict] = None,
+    enviar: Optional[Callable[[MeliFullSyncJob], None]] = None,
+) -> MeliFullSyncJob:
+    """
+    Job de um pedido igual (tipo + params) ainda na fila ou rodando, ou um novo; usado pelas
+    rotas e pelo beat. A chave de dedup no Redis (SET NX) fecha a corrida entre dois pedidos
+    simultâneos; sem Redis, só um job igual na fila é reaproveitado.
+    """
+    params = params or {}
+    reserva = sync_lock.reservar_pedido(tipo, params)
+    if reserva is not None and reserva is not sync_lock.EM_CRIACAO:
+        job = session.get(MeliFullSyncJob, reserva)
+        if job is not None and job.status not in FINAIS:
+            logger.info({"event": "ML_SYNC_JOB_DEDUP", "job_id": job.id, "tipo": tipo})
+            return job
+        # Chave órfã (job encerrado sem passar por finalizar): descarta e segue sem reserva
+        sync_lock.liberar_pedido(tipo, params, reserva)
+    # Outro processo não terminou de criar o mesmo pedido: o job dele pode já ter saído da fila
+    em_criacao = reserva is sync_lock.EM_CRIACAO
+    abertos = ("queued", "running") if em_criacao else ("queued",)
+    fila = session.exec(
+        select(MeliFullSyncJob)
+        .where(MeliFullSyncJob.parent_id.is_(None), MeliFullSyncJob.tipo == tipo, MeliFullSyncJob.status.in_(abertos))
+        .order_by(MeliFullSyncJob.id)
+    ).all()
+    job = next((j for j in fila if (j.params or {}) == params), None)
+    if job is not None and em_criacao:
+        logger.info({"event": "ML_SYNC_JOB_DEDUP", "job_id": job.id, "tipo": tipo})
+        return job
+    reservado = reserva is None
+    try:
+        job = job or enfileirar(session, tipo, params, enviar=enviar)
+    except Exception:
+        if reservado:
+            sync_lock.liberar_pedido(tipo, params)
+        raise
+    if reservado and job.status not in FINAIS:
+        sync_lock.registrar_pedido(tipo, params, job.id)
+    return job
+
+
+def _selecionar(session: Session) -> List[MeliFullSyncJob]:
+    """Promove a running os jobs que cabem nas vagas de cada classe (chamar sob o lock)."""
+    em_execucao: Dict[str, int] = {}
+    rows = session.execute(
+        select(MeliFullSyncJob.tipo, func.count())
+        .where(MeliFullSyncJob.parent_id.is_(None), MeliFullSyncJob.status == "running")
+        .group_by(MeliFullSyncJob.tipo)
+    ).all()
+    for tipo, n in rows:
+        classe = classe_do_tipo(tipo)
+        em_execucao[classe] = em_execucao.get(classe, 0) + int(n)
+    fila = session.exec(
+        select(MeliFullSyncJob)
+        .where(MeliFullSyncJob.parent_id.is_(None), MeliFullSyncJob.status == "queued")
+        .order_by(MeliFullSyncJob.prioridade.desc(), MeliFullSyncJob.criado_em, MeliFullSyncJob.id)
+    ).all()
+    escolhidos = []
+    for job in fila:
+        classe = TIPOS.get(job.tipo, {}).get("classe")
+        if classe is None or em_execucao.get(classe, 0) >= limite_classe(classe):
+            continue
+        em_execucao[classe] = em_execucao.get(classe, 0) + 1
+        job.status = "running"
+        job.task_id = uuid.uuid4().hex
+        session.add(job)
+        escolhidos.append(job)
+    return escolhidos
+
+
+def despachar(session: Session, enviar: Optional[Callable[[MeliFullSyncJob], None]] = None) -> List[MeliFullSyncJob]:
+    """
+    Envia os próximos jobs da fila que cabem nos limites. O lock transacional impede que dois
+    processos vejam a mesma vaga livre; o envio acontece só depois do commit.
+    """
+    session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_DESPACHO})
+    escolhidos = _selecionar(session)
+    session.commit()
+    for job in escolhidos:
+        try:
+            (enviar or _enviar_celery)(job)
+            logger.info({"event": "ML_SYNC_JOB_DISPATCHED", "job_id": job.id, "tipo": job.tipo, "task_id": job.task_id})
+        except Exception as e:
+            # Sem broker: o job não pode ficar ocupando a vaga
+            job.status = "error"
+            job.error_message = f"falha ao enviar a task: {e}"
+            job.finished_at = datetime.utcnow()
+            save(session, job)
+            logger.error({"event": "ML_SYNC_JOB_DISPATCH_ERROR", "job_id": job.id, "error": str(e)})
+    return escolhidos
+
+
+def finalizar(session: Session, job: MeliFullSyncJob, status: str, erro: Optional[str] = None, enviar: Optional[Callable[[MeliFullSyncJob], None]] = None) -> MeliFullSyncJob:
+    """Encerra o job (done/error/cancelled) e libera a vaga para o próximo da fila."""
+    job.status = status
+    job.finished_at = datetime.utcnow()
+    if erro is not None:
+        job.error_message = erro
+    job = save(session, job)
+    sync_lock.liberar_pedido(job.tipo, job.params, job.id)
+    despachar(session, enviar)
+    return job
+
+
+def cancelar(session: Session, job: MeliFullSyncJob) -> bool:
+    """Cancela um job ainda na fila; jobs em execução não são interrompidos."""
+    if job.status != "queued":
+        return False
+    finalizar(session, job, "cancelled")
+    return True
+
@@ -13,8 +13,8 @@ from app.core.logger import logger
 from app.core.config import get_settings
 from app.models.webhook_log import WebhookLog
 from app.services.mercadolivre_service import (
-    importar_meli_todos_status_async,
-    importar_meli_incremental_async
+    importar_meli_catalogo_stream,
+    importar_meli_incremental_stream
 )
 
 class WebhookService:
@@ -103,12 +103,12 @@ class WebhookService:
             since_date = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')[:-3]
             
             # Executar importação incremental
-            result = await importar_meli_incremental_async(since_date=since_date, hours=dias*24)
+            result = await importar_meli_incremental_stream(since_date)
             
             # Registrar resultado
             logger.info({
                 "event": "DAILY_IMPORT_COMPLETED",
-                "importados": len(result[0]),
+                "importados": result["fetched"],
                 "dias": dias,
                 "limit": limit
             })
@@ -116,9 +116,9 @@ class WebhookService:
             return {
                 "status": "success",
                 "event": "daily_import",
-                "importados": len(result[0]),
+                "importados": result["fetched"],
                 "dias": dias,
-                "message": f"Importação diária concluída: {len(result[0])} produtos"
+                "message": f"Importação diária concluída: {result['fetched']} produtos"
             }
             
         except Exception as e:
@@ -137,18 +137,18 @@ class WebhookService:
             from datetime import datetime, timedelta
             since_date = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')[:-3]
             
-            result = await importar_meli_incremental_async(since_date=since_date, hours=dias*24)
+            result = await importar_meli_incremental_stream(since_date)
             
             logger.info({
                 "event": "INCREMENTAL_IMPORT_COMPLETED",
-                "importados": len(result[0])
+                "importados": result["fetched"]
             })
             
             return {
                 "status": "success",
                 "event": "incremental_import",
-                "importados": len(result[0]),
-                "message": f"Importação incremental concluída: {len(result[0])} produtos"
+                "importados": result["fetched"],
+                "message": f"Importação incremental concluída: {result['fetched']} produtos"
             }
             
         except Exception as e:
@@ -163,18 +163,18 @@ class WebhookService:
             limit = payload.get('limit', 20000)  # Alto limite para sincronização completa
             
             # Usar a função com paginação corrigida
-            result = await importar_meli_todos_status_async(limit=limit)
+            result = await importar_meli_catalogo_stream(limit=limit, mode="TODOS_STATUS")
             
             logger.info({
                 "event": "FULL_SYNC_COMPLETED",
-                "importados": len(result[0])
+                "importados": result["fetched"]
             })
             
             return {
                 "status": "success",
                 "event": "full_sync",
-                "importados": len(result[0]),
-                "message": f"Sincronização completa concluída: {len(result[0])} produtos"
+                "importados": result["fetched"],
+                "message": f"Sincronização completa concluída: {result['fetched']} produtos"
             }
             
         except Exception as e:
@@ -192,29 +192,32 @@ class WebhookService:
     
     def generate_schedule_config(self) -> Dict:
         """Gera configuração de agendamento para o webhook"""
+        schedules = [
+            {
+                "name": "Importação Diária",
+                "cron": "0 2 * * *",  # 2h da manhã
+                "event_type": "daily_import",
+                "payload": {"dias": 7, "limit": 5000}
+            },
+            {
+                "name": "Sincronização Completa Semanal",
+                "cron": "0 3 * * 0",  # Domingo 3h da manhã
+                "event_type": "full_sync",
+                "payload": {"limit": 25000}
+            }
+        ]
+        # Com as notificações do ML ligadas, o incremental de 6 em 6 horas não é mais necessário
+        if not getattr(self.settings, "ML_NOTIFICACOES_ENABLED", False):
+            schedules.insert(1, {
+                "name": "Importação Incremental",
+                "cron": "0 */6 * * *",  # A cada 6 horas
+                "event_type": "incremental_import",
+                "payload": {"dias": 1, "limit": 2000}
+            })
         return {
             "webhook_url": f"{self.settings.BACKEND_URL}/api/webhooks/importacao",
             "secret": self.webhook_secret,
-            "schedules": [
-                {
-                    "name": "Importação Diária",
-                    "cron": "0 2 * * *",  # 2h da manhã
-                    "event_type": "daily_import",
-                    "payload": {"dias": 7, "limit": 5000}
-                },
-                {
-                    "name": "Importação Incremental",
-                    "cron": "0 */6 * * *",  # A cada 6 horas
-                    "event_type": "incremental_import", 
-                    "payload": {"dias": 1, "limit": 2000}
-                },
-                {
-                    "name": "Sincronização Completa Semanal",
-                    "cron": "0 3 * * 0",  # Domingo 3h da manhã
-                    "event_type": "full_sync",
-                    "payload": {"limit": 25000}
-                }
-            ]
+            "schedules": schedules,
         }
 
 # Instância global
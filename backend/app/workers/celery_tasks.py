@@ -1,4 +1,7 @@
+import uuid
 from datetime import timedelta
+from typing import Optional, Tuple
+from celery import chord, group
 from sqlmodel import Session
 
 from app.workers.celery_app import celery_app as _celery_app
@@ -9,9 +12,13 @@ from app.services.mercadolivre_service import get_access_token
 from app.services.shopify_service import get_product_by_sku, update_inventory
 from app.core.config import get_settings
 from app.models.meli_full_sync_job import MeliFullSyncJob
-from app.repositories.meli_full_sync_job_repo import get_or_create_singleton, save
-from app.repositories.produto_repo import save_product
-from app.services.mercadolivre_service import meli_request, importar_meli_from_ids
+from app.repositories.meli_full_sync_job_repo import FINAIS, criar_filhos, finalizar_filho, get_job, save, update_progress
+from app.repositories.bulk_load_repo import CopyBulkLoader, tabelas_vazias
+from app.repositories.meli_sync_checkpoint_repo import abrir_checkpoint, checkpoint_aberto, checkpoint_da_task, checkpoint_parado
+from app.services.meli_sync_checkpoint import CheckpointSync
+from app.services.meli_rate_limiter import usar_orcamento_compartilhado
+from app.services import sync_lock, sync_scheduler
+from app.services.mercadolivre_service import meli_request, importar_meli_catalogo_stream
 import asyncio
 from datetime import datetime
 from app.core.database import init_db
@@ -59,171 +66,387 @@ celery.conf.beat_schedule = {
         "task": "estoque.sync",
         "schedule": timedelta(minutes=10),
     },
-    "meli-incremental-sync-every-30-min": {
+}
+
+if getattr(get_settings(), "ML_NOTIFICACOES_ENABLED", False):
+    # Itens alterados chegam pelas notificações do ML; o incremental vira só reconciliação
+    # (notificação perdida), com uma hora de sobreposição entre as janelas
+    _horas_reconciliacao = int(getattr(get_settings(), "ML_NOTIFICACOES_RECONCILIACAO", 6))
+    _intervalo_notificacoes = int(getattr(get_settings(), "ML_NOTIFICACOES_INTERVALO", 5))
+    celery.conf.beat_schedule.update({
+        "meli-notificacoes": {
+            "task": "meli.notificacoes",
+            "schedule": timedelta(seconds=_intervalo_notificacoes),
+            # Tick que esperou demais na fila é descartado: o próximo lê o mesmo stream
+            "options": {"expires": _intervalo_notificacoes * 2},
+        },
+        "meli-incremental-sync-reconciliacao": {
+            "task": "meli.incremental_sync",
+            "schedule": timedelta(hours=_horas_reconciliacao),
+            "args": [_horas_reconciliacao + 1],
+        },
+    })
+else:
+    celery.conf.beat_schedule["meli-incremental-sync-every-30-min"] = {
         "task": "meli.incremental_sync",
         "schedule": timedelta(minutes=30),
         "args": [6],  # Últimas 6 horas
-    },
-}
+    }
+
+
+def _job_progress(job_id: int, lease: Optional[sync_lock.Lease] = None):
+    """
+    Callback do pipeline: grava o progresso do job numa sessão própria (roda em outra thread).
+    Com o lease perdido, interrompe o pipeline antes de gravar.
+    """
+    def _update(stats: dict) -> None:
+        if lease is not None:
+            lease.verificar()
+        with Session(engine) as s:
+            update_progress(s, job_id, stats)
+    return _update
+
+
+def _usar_bulk_load(session: Session, bulk_load: Optional[bool]) -> bool:
+    if bulk_load is not None:
+        return bulk_load
+    modo = str(getattr(get_settings(), "ML_FULL_SYNC_BULK_LOAD", "auto")).lower()
+    if modo in ("always", "never"):
+        return modo == "always"
+    return tabelas_vazias(session)
+
+
+def _obter_lease(task, job: MeliFullSyncJob, evento: str) -> sync_lock.Lease:
+    """
+    Lease do job no Redis. Ocupado = outra execução deste job viva (a original de uma mensagem
+    reentregue, ou o job dado como parado que ainda roda): tenta de novo quando ele vencer.
+    Jobs diferentes da classe não disputam o lease; as vagas são do scheduler (limite_classe).
+    """
+    lease = sync_lock.lease_do_job(sync_scheduler.classe_do_tipo(job.tipo), job.id)
+    if not lease.adquirir():
+        logger.info({"event": f"{evento}_LEASE_BUSY", "job_id": job.id})
+        raise task.retry(countdown=lease.ttl, max_retries=None)
+    return lease
+
+
+def _abrir_execucao(task, session: Session, job: MeliFullSyncJob, modo: str, evento: str, lease: Optional[sync_lock.Lease] = None) -> Tuple[Optional[CheckpointSync], Optional[bool]]:
+    """
+    (checkpoint, None) quando a mensagem deve executar o job (do zero ou retomando); (None, retorno)
+    quando não: job já encerrado ou reentrega de uma execução concluída (True se concluído) ou
+    outro job ativo no mesmo modo (False). Com o `lease` deste job no Redis, um checkpoint
+    aberto deste job, ou de um job cujo lease ninguém renova, é de uma execução morta e é
+    retomado na hora; sem lease (Redis fora), vale o prazo do checkpoint.
+    """
+    task_id = getattr(task.request, "id", None) or job.task_id or uuid.uuid4().hex
+    if job.status in FINAIS:
+        logger.info({"event": f"{evento}_DUPLICATE_MESSAGE", "job_id": job.id, "status": job.status})
+        return None, job.status == "done"
+    anterior = checkpoint_da_task(session, task_id)
+    if anterior is not None and anterior.status == "concluido":
+        # O worker morreu entre concluir o checkpoint e fechar o job
+        logger.info({"event": f"{evento}_DUPLICATE_MESSAGE", "job_id": job.id, "task_id": task_id})
+        sync_scheduler.finalizar(session, job, "done")
+        return None, True
+    aberto = checkpoint_aberto(session, modo)
+    exclusivo = aberto is not None and lease is not None and lease.ativo and (
+        aberto.job_id == job.id or not sync_lock.lease_ocupado(sync_scheduler.classe_do_tipo(job.tipo), aberto.job_id)
+    )
+    if aberto is not None and not exclusivo and not checkpoint_parado(aberto):
+        if task_id in (aberto.task_ids or []):
+            # Reentrega (acks_late) enquanto a execução original ainda pode estar viva:
+            # volta depois do prazo; aí ou ela concluiu (no-op) ou parou (retoma)
+            raise task.retry(countdown=int(getattr(get_settings(), "ML_SYNC_CHECKPOINT_STALE", 900)), max_retries=None)
+        dono = get_job(session, aberto.job_id) if aberto.job_id != job.id else None
+        if dono is not None and dono.status == "running":
+            # Com ML_SYNC_LIMITE_CATALOGO > 1, dois jobs no mesmo modo dividiriam o checkpoint: o segundo encerra
+            logger.info({"event": f"{evento}_ALREADY_RUNNING", "job_id": job.id, "job_ativo": dono.id})
+            sync_scheduler.finalizar(session, job, "error", f"job {dono.id} já executa esta sincronização")
+            return None, False
+    if aberto is not None:
+        logger.info({"event": f"{evento}_RESUMING", "job_id": job.id, "checkpoint_id": aberto.id, "stats": aberto.stats})
+    return CheckpointSync.carregar(session, abrir_checkpoint(session, job.id, modo, task_id)), None
+
+
+def _iniciar_job(session: Session, job: MeliFullSyncJob, batch_size: int) -> MeliFullSyncJob:
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    job.error_message = None
+    job.batch_tamanho = batch_size
+    return save(session, job)
+
+
+def _usar_fanout() -> bool:
+    return bool(getattr(get_settings(), "ML_FULL_SYNC_FANOUT", False))
 
 
-@celery.task(name="meli.full_sync")
-def meli_full_sync():
+# Só as syncs de catálogo se dividem em shards
+_CLASSE_FANOUT = sync_scheduler.classe_do_tipo("full")
+
+
+def _despachar_fanout(session: Session, job: MeliFullSyncJob, checkpoint: CheckpointSync, mode: str, status: Optional[str], limite: Optional[int], lease: sync_lock.Lease) -> bool:
+    """
+    Lista os IDs pendentes e despacha um chord de shards, cada um com seu job filho; o job
+    continua "running" até o callback (meli.sync_shards_done) somar os contadores. O lease
+    passa para o chord com o prazo longo do fan-out: cada shard renova enquanto roda e o
+    callback libera.
+    """
+    from app.services.meli_sync_fanout import listar_shards
+
+    usar_orcamento_compartilhado()
+    shards = asyncio.run(listar_shards(checkpoint, status=status, limit=limite))
+    base = dict(checkpoint.stats)
+    # Progresso ao vivo parte do que já estava gravado; os shards incrementam daqui
+    update_progress(session, job.id, base)
+    logger.info({"event": "ML_FULL_SYNC_FANOUT_DISPATCHED", "job_id": job.id, "modo": mode, "shards": len(shards), "ids": sum(len(s) for s in shards), "retomado": bool(checkpoint.ids_concluidos)})
+    token = lease.transferir(ttl=sync_lock.fanout_ttl())
+    callback = meli_sync_shards_done.s(job.id, checkpoint.id, base, token)
+    if not shards:
+        callback.apply(args=([],))
+        return True
+    filhos = criar_filhos(session, job, [len(s) for s in shards])
+    session.commit()
+    chord(group(meli_sync_shard.s(job.id, checkpoint.id, ids, mode, shard_id, token) for ids, shard_id in zip(shards, filhos)))(callback)
+    return True
+
+
+# acks_late + reject_on_worker_lost: se o worker morrer, a mensagem volta à fila e a
+# nova execução retoma do checkpoint. Sem job_id (chamada direta), a task só entra na fila
+# do sync_scheduler, que a despacha de novo com o job_id quando houver vaga.
+@celery.task(name="meli.full_sync", bind=True, acks_late=True, reject_on_worker_lost=True)
+def meli_full_sync(self, job_id: Optional[int] = None, bulk_load: Optional[bool] = None):
     settings = get_settings()
     batch_size = int(getattr(settings, "ML_FULL_SYNC_BATCH", 300))
     max_total = getattr(settings, "ML_FULL_SYNC_MAX", None)
     init_db()
     with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        if job.status == "running":
-            logger.info({"event": "ML_FULL_SYNC_ALREADY_RUNNING"})
-            return False
-        job.status = "running"
-        job.started_at = datetime.utcnow()
-        job.error_message = None
-        job.batch_tamanho = batch_size
-        logger.info({"event": "ML_FULL_SYNC_STARTED"})
-        job = save(session, job)
-        try:
-            seller_id = settings.ML_SELLER_ID
-            payload = asyncio.run(meli_request("GET", f"/users/{seller_id}/items/search", params={"status": "active", "limit": 1, "offset": 0}))
-            total = int(payload.get("paging", {}).get("total", 0))
-            if not job.total_previsto:
-                job.total_previsto = total
-                job = save(session, job)
-
-            offset = int(job.offset_atual or 0)
-            processed = int(job.processados or 0)
-            while offset < total:
-                if isinstance(max_total, int) and max_total > 0 and processed >= max_total:
-                    break
-                page = asyncio.run(meli_request("GET", f"/users/{seller_id}/items/search", params={"status": "active", "limit": batch_size, "offset": offset}))
-                ids = page.get("results", [])
-                if not ids:
-                    break
-                result = importar_meli_from_ids(ids, dias=None, mode="FULL")
-                items = result.get("items", [])
-                stats = result.get("stats", {})
-                for normalized in items:
-                    save_product(session, normalized)
-                fetched = int(stats.get("fetched", len(ids)))
-                job.processados = processed + fetched
-                job.novos += int(stats.get("novos", 0))
-                job.atualizados += int(stats.get("atualizados", 0))
-                job.ignorados += int(stats.get("ignorados_sem_mudanca", 0))
-                job.offset_atual = offset + fetched
-                job.batch_tamanho = batch_size
-                job = save(session, job)
-                offset = job.offset_atual
-                processed = job.processados
-
-            job.status = "done"
-            job.finished_at = datetime.utcnow()
-            save(session, job)
-            logger.info({"event": "ML_FULL_SYNC_DONE", "total_previsto": job.total_previsto, "processados": job.processados})
-            return True
-        except Exception as e:
-            job.status = "error"
-            job.error_message = str(e)
-            job.finished_at = datetime.utcnow()
-            save(session, job)
-            logger.error({"event": "ML_FULL_SYNC_ERROR", "error": str(e)})
+        if job_id is None:
+            return sync_scheduler.solicitar(session, "full", {"bulk_load": bulk_load} if bulk_load is not None else {}).id
+        job = get_job(session, job_id)
+        if job is None:
+            logger.error({"event": "ML_FULL_SYNC_JOB_NOT_FOUND", "job_id": job_id})
             return False
+        lease = _obter_lease(self, job, "ML_FULL_SYNC")
+        with lease:
+            checkpoint, retorno = _abrir_execucao(self, session, job, "FULL", "ML_FULL_SYNC", lease=lease)
+            if checkpoint is None:
+                return retorno
+            job = _iniciar_job(session, job, batch_size)
+            logger.info({"event": "ML_FULL_SYNC_STARTED", "job_id": job.id})
+            try:
+                seller_id = settings.ML_SELLER_ID
+                payload = asyncio.run(meli_request("GET", f"/users/{seller_id}/items/search", params={"status": "active", "limit": 1, "offset": 0}))
+                total = int(payload.get("paging", {}).get("total", 0))
+                if not job.total_previsto:
+                    job.total_previsto = total
+                    job = save(session, job)
+
+                limite = max_total if isinstance(max_total, int) and max_total > 0 else None
+                if not checkpoint.ids_concluidos and _usar_bulk_load(session, bulk_load):
+                    # Carga inicial: lotes via COPY para o staging e um único merge/commit no final
+                    # (tudo ou nada: não há lote intermediário para retomar)
+                    logger.info({"event": "ML_FULL_SYNC_BULK_LOAD"})
+                    progresso = _job_progress(job.id, lease)
+
+                    def _progresso_bulk(stats: dict) -> None:
+                        progresso(stats)
+                        checkpoint.tocar()
 
+                    with CopyBulkLoader() as loader:
+                        asyncio.run(importar_meli_catalogo_stream(status="active", limit=limite, mode="FULL", on_progress=_progresso_bulk, persist=loader.persistir))
+                        lease.verificar()
+                        loader.merge()
+                elif _usar_fanout():
+                    # Shards em paralelo nos workers; o callback do chord finaliza o job
+                    return _despachar_fanout(session, job, checkpoint, "FULL", "active", limite, lease)
+                else:
+                    # Pipeline em fluxo: cada lote é commitado junto com o checkpoint e o job é atualizado
+                    asyncio.run(importar_meli_catalogo_stream(status="active", limit=limite, mode="FULL", on_progress=_job_progress(job.id, lease), checkpoint=checkpoint))
+                checkpoint.concluir()
+                session.refresh(job)
+
+                sync_scheduler.finalizar(session, job, "done")
+                logger.info({"event": "ML_FULL_SYNC_DONE", "job_id": job.id, "total_previsto": job.total_previsto, "processados": job.processados})
+                return True
+            except sync_lock.LeasePerdido:
+                # Outra execução assumiu o job: ela o encerra
+                logger.error({"event": "ML_FULL_SYNC_LEASE_LOST", "job_id": job.id})
+                return False
+            except Exception as e:
+                sync_scheduler.finalizar(session, job, "error", str(e))
+                logger.error({"event": "ML_FULL_SYNC_ERROR", "job_id": job.id, "error": str(e)})
+                return False
 
-@celery.task(name="meli.full_sync_todos_status")
-def meli_full_sync_todos_status():
+
+@celery.task(name="meli.full_sync_todos_status", bind=True, acks_late=True, reject_on_worker_lost=True)
+def meli_full_sync_todos_status(self, job_id: Optional[int] = None):
     """
     Sincronização completa de TODOS os produtos do Mercado Livre (ativos, vendidos, pausados, encerrados).
-    Ideal para inventários grandes (17k+ produtos).
+    Ideal para inventários grandes (17k+ produtos). Retoma do checkpoint se uma execução anterior parou.
     """
     from app.services.mercadolivre_service import importar_meli_todos_status
     
     init_db()
     with Session(engine) as session:
-        job = get_or_create_singleton(session)
-        if job.status == "running":
-            logger.info({"event": "ML_FULL_SYNC_TODOS_STATUS_ALREADY_RUNNING"})
+        if job_id is None:
+            return sync_scheduler.solicitar(session, "todos_status").id
+        job = get_job(session, job_id)
+        if job is None:
+            logger.error({"event": "ML_FULL_SYNC_TODOS_STATUS_JOB_NOT_FOUND", "job_id": job_id})
             return False
-        
-        job.status = "running"
-        job.started_at = datetime.utcnow()
-        job.error_message = None
-        job.batch_tamanho = 50  # Batch menor para respeitar rate limit
-        logger.info({"event": "ML_FULL_SYNC_TODOS_STATUS_STARTED"})
-        job = save(session, job)
-        
-        try:
-            # Importa todos os produtos com todos os status
-            result = importar_meli_todos_status(limit=50000, dias=None)  # Limite alto para 17k+ produtos
-            
-            # Salva todos os produtos no banco
-            items = result.get("items", [])
-            stats = result.get("stats", {})
-            
-            for normalized in items:
-                save_product(session, normalized)
+        lease = _obter_lease(self, job, "ML_FULL_SYNC_TODOS_STATUS")
+        with lease:
+            checkpoint, retorno = _abrir_execucao(self, session, job, "TODOS_STATUS", "ML_FULL_SYNC_TODOS_STATUS", lease=lease)
+            if checkpoint is None:
+                return retorno
             
-            job.status = "done"
-            job.finished_at = datetime.utcnow()
-            job.processados = stats.get("fetched", 0)
-            job.novos = stats.get("novos", 0)
-            job.atualizados = stats.get("atualizados", 0)
-            job.ignorados = stats.get("ignorados_sem_mudanca", 0)
-            job.total_previsto = stats.get("fetched", 0)
-            save(session, job)
-            
-            logger.info({
-                "event": "ML_FULL_SYNC_TODOS_STATUS_DONE", 
-                "total": stats.get("fetched", 0),
-                "novos": stats.get("novos", 0),
-                "atualizados": stats.get("atualizados", 0),
-                "ignorados": stats.get("ignorados_sem_mudanca", 0)
-            })
-            return True
+            job = _iniciar_job(session, job, 50)  # Batch menor para respeitar rate limit
+            logger.info({"event": "ML_FULL_SYNC_TODOS_STATUS_STARTED", "job_id": job.id})
             
+            try:
+                if _usar_fanout():
+                    return _despachar_fanout(session, job, checkpoint, "TODOS_STATUS", None, 50000, lease)
+                # Importa todos os produtos com todos os status; o progresso é gravado a cada lote
+                result = importar_meli_todos_status(limit=50000, dias=None, on_progress=_job_progress(job.id, lease), checkpoint=checkpoint)  # Limite alto para 17k+ produtos
+                checkpoint.concluir()
+                stats = result.get("stats", {})
+                session.refresh(job)
+
+                job.processados = stats.get("fetched", 0)
+                job.novos = stats.get("novos", 0)
+                job.atualizados = stats.get("atualizados", 0)
+                job.ignorados = stats.get("ignorados_sem_mudanca", 0)
+                job.total_previsto = stats.get("fetched", 0)
+                sync_scheduler.finalizar(session, job, "done")
+                
+                logger.info({
+                    "event": "ML_FULL_SYNC_TODOS_STATUS_DONE", 
+                    "job_id": job.id,
+                    "total": stats.get("fetched", 0),
+                    "novos": stats.get("novos", 0),
+                    "atualizados": stats.get("atualizados", 0),
+                    "ignorados": stats.get("ignorados_sem_mudanca", 0)
+                })
+                return True
+                
+            except sync_lock.LeasePerdido:
+                logger.error({"event": "ML_FULL_SYNC_TODOS_STATUS_LEASE_LOST", "job_id": job.id})
+                return False
+            except Exception as e:
+                sync_scheduler.finalizar(session, job, "error", str(e))
+                logger.error({"event": "ML_FULL_SYNC_TODOS_STATUS_ERROR", "job_id": job.id, "error": str(e)})
+                return False
+
+
+@celery.task(name="meli.sync_shard", bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=3)
+def meli_sync_shard(self, job_id: int, checkpoint_id: int, ids: list, mode: str = "FULL", shard_id: Optional[int] = None, lease_token: Optional[str] = None):
+    """Shard da sync distribuída: multiget + diff + gravação de `ids` (idempotente)."""
+    from app.services.meli_sync_fanout import processar_shard
+
+    usar_orcamento_compartilhado()
+    # Heartbeat do lease da sync durante todo o shard (não só no início e no fim)
+    with sync_lock.lease_recebido(_CLASSE_FANOUT, job_id, lease_token) as lease:
+        try:
+            return processar_shard(job_id, checkpoint_id, ids, mode, shard_id=shard_id)
         except Exception as e:
-            job.status = "error"
-            job.error_message = str(e)
-            job.finished_at = datetime.utcnow()
-            save(session, job)
-            logger.error({"event": "ML_FULL_SYNC_TODOS_STATUS_ERROR", "error": str(e)})
-            return False
+            if self.request.retries < self.max_retries:
+                raise self.retry(exc=e, countdown=min(60, 5 * 2 ** self.request.retries))
+            # Devolve o erro em vez de falhar: um shard perdido não pode impedir o callback do chord
+            logger.error({"event": "ML_SYNC_SHARD_ERROR", "job_id": job_id, "shard_id": shard_id, "ids": len(ids), "error": str(e)})
+            if shard_id is not None:
+                with Session(engine) as session:
+                    finalizar_filho(session, shard_id, "error", erro=str(e))
+                    session.commit()
+            return {"erro": str(e), "ids": len(ids)}
+        finally:
+            # O próximo shard (ou o callback) ainda pode demorar a sair da fila
+            lease.renovar()
+
 
+@celery.task(name="meli.sync_shards_done")
+def meli_sync_shards_done(resultados: list, job_id: int, checkpoint_id: int, base: dict, lease_token: Optional[str] = None):
+    """Callback do chord: soma os contadores dos shards no job, conclui o checkpoint e libera a vaga e o lease."""
+    from app.core import response_cache
+    from app.repositories.meli_sync_checkpoint_repo import concluir_checkpoint
+    from app.services.meli_sync_fanout import somar_resultados
+
+    total = somar_resultados(resultados, base)
+    with Session(engine) as session:
+        job = update_progress(session, job_id, total)
+        if total["shards_com_erro"]:
+            # Checkpoint fica aberto: a próxima execução só refaz os IDs desses shards
+            sync_scheduler.finalizar(session, job, "error", f"{total['shards_com_erro']} shard(s) falharam; execute de novo para retomar")
+        else:
+            concluir_checkpoint(session, checkpoint_id)
+            sync_scheduler.finalizar(session, job, "done")
+    sync_lock.liberar_token(_CLASSE_FANOUT, job_id, lease_token)
+    response_cache.invalidar("meli_items")
+    logger.info({"event": "ML_FULL_SYNC_FANOUT_DONE", "job_id": job_id, **total})
+    return total
 
-@celery.task(name="meli.incremental_sync")
-def meli_incremental_sync(hours: int = 24):
+
+@celery.task(name="meli.incremental_sync", bind=True)
+def meli_incremental_sync(self, hours: int = 24, job_id: Optional[int] = None):
     """
     Sincronização incremental de produtos do Mercado Livre que foram modificados nas últimas horas.
-    Ideal para atualizações frequentes (ex: a cada 15-30 minutos).
+    Ideal para atualizações frequentes (ex: a cada 15-30 minutos). O beat chama sem job_id:
+    o pedido entra na fila (ou cai no incremental igual ainda aberto) e roda ao lado de uma
+    sync completa, sem esperar por ela.
     """
     from app.services.mercadolivre_service import importar_meli_incremental
     
     init_db()
     with Session(engine) as session:
-        logger.info({"event": "ML_INCREMENTAL_SYNC_STARTED", "hours": hours})
-        
-        try:
-            # Importa apenas produtos modificados recentemente
-            result = importar_meli_incremental(hours=hours)
-            
-            # Salva produtos atualizados no banco
-            items = result.get("items", [])
-            stats = result.get("stats", {})
-            
-            for normalized in items:
-                save_product(session, normalized)
-            
-            logger.info({
-                "event": "ML_INCREMENTAL_SYNC_DONE", 
-                "fetched": stats.get("fetched", 0),
-                "novos": stats.get("novos", 0),
-                "atualizados": stats.get("atualizados", 0),
-                "ignorados": stats.get("ignorados_sem_mudanca", 0),
-                "hours": hours
-            })
-            return True
+        if job_id is None:
+            return sync_scheduler.solicitar(session, "incremental", {"hours": hours}).id
+        job = get_job(session, job_id)
+        if job is None or job.status in FINAIS:
+            logger.info({"event": "ML_INCREMENTAL_SYNC_DUPLICATE_MESSAGE", "job_id": job_id})
+            return job is not None and job.status == "done"
+        lease = _obter_lease(self, job, "ML_INCREMENTAL_SYNC")
+        with lease:
+            job = _iniciar_job(session, job, job.batch_tamanho)
+            logger.info({"event": "ML_INCREMENTAL_SYNC_STARTED", "job_id": job.id, "hours": hours})
             
+            try:
+                # Importa apenas produtos modificados recentemente (gravados lote a lote)
+                result = importar_meli_incremental(hours=hours, on_progress=_job_progress(job.id, lease))
+                stats = result.get("stats", {})
+                job = update_progress(session, job.id, stats)
+                sync_scheduler.finalizar(session, job, "done")
+                
+                logger.info({
+                    "event": "ML_INCREMENTAL_SYNC_DONE", 
+                    "job_id": job.id,
+                    "fetched": stats.get("fetched", 0),
+                    "novos": stats.get("novos", 0),
+                    "atualizados": stats.get("atualizados", 0),
+                    "ignorados": stats.get("ignorados_sem_mudanca", 0),
+                    "hours": hours
+                })
+                return True
+                
+            except sync_lock.LeasePerdido:
+                logger.error({"event": "ML_INCREMENTAL_SYNC_LEASE_LOST", "job_id": job.id})
+                return False
+            except Exception as e:
+                sync_scheduler.finalizar(session, job, "error", str(e))
+                logger.error({"event": "ML_INCREMENTAL_SYNC_ERROR", "job_id": job.id, "error": str(e), "hours": hours})
+                return False
+
+
+@celery.task(name="meli.notificacoes", ignore_result=True)
+def meli_notificacoes():
+    """Consumidor do stream de notificações do ML: um lote coalescido por tick do beat."""
+    from app.services.meli_notificacoes import processar_notificacoes
+
+    lease = sync_lock.Lease("notificacoes")
+    if not lease.adquirir():
+        # Lote anterior ainda rodando: o que chegou entra no próximo tick
+        return None
+    with lease:
+        try:
+            return processar_notificacoes()
         except Exception as e:
-            logger.error({"event": "ML_INCREMENTAL_SYNC_ERROR", "error": str(e), "hours": hours})
-            return False
\ No newline at end of file
+            # Entradas sem XACK ficam pendentes e são reprocessadas (XAUTOCLAIM)
+            logger.error({"event": "ML_NOTIFICACOES_ERROR", "error": str(e)})
+            return None
@@ -0,0 +1,49 @@
+"""
+Checkpoint da sincronização completa do ML: fronteira da listagem e chunks de IDs gravados.
+
+Revision ID: 20261017_meli_sync_checkpoint
+Revises: 20261017_tabela_versao
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_meli_sync_checkpoint"
+down_revision = "20261017_tabela_versao"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "melisynccheckpoint",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("modo", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("task_ids", postgresql.JSONB(), nullable=True),
+        sa.Column("cursor", postgresql.JSONB(), nullable=True),
+        sa.Column("stats", postgresql.JSONB(), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_melisynccheckpoint_job_id", "melisynccheckpoint", ["job_id"])
+    op.create_index("ix_melisynccheckpoint_status", "melisynccheckpoint", ["status"])
+    op.create_table(
+        "melisyncchunk",
+        sa.Column("checkpoint_id", sa.Integer(), primary_key=True),
+        sa.Column("chave", sa.String(), primary_key=True),
+        sa.Column("ids", postgresql.JSONB(), nullable=False),
+        sa.Column("concluido_em", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("melisyncchunk")
+    op.drop_index("ix_melisynccheckpoint_status", table_name="melisynccheckpoint")
+    op.drop_index("ix_melisynccheckpoint_job_id", table_name="melisynccheckpoint")
+    op.drop_table("melisynccheckpoint")
@@ -0,0 +1,52 @@
+"""
+melifullsyncjob vira uma fila de jobs (tipo, params, prioridade, parent_id) em vez do singleton id=1.
+
+Revision ID: 20261017_meli_sync_jobs
+Revises: 20261017_meli_sync_checkpoint
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_meli_sync_jobs"
+down_revision = "20261017_meli_sync_checkpoint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A linha legada deixa de bloquear a fila: "running" sem worker vira erro, "idle"/"queued" são encerrados
+    op.execute(
+        "UPDATE melifullsyncjob SET status = CASE status WHEN 'running' THEN 'error' WHEN 'done' THEN 'done' "
+        "WHEN 'error' THEN 'error' ELSE 'cancelled' END, "
+        "error_message = CASE WHEN status = 'running' THEN 'interrompido na migração para a fila de jobs' ELSE error_message END"
+    )
+    # O singleton foi criado com id explícito: a sequence ainda não passou dele
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('melifullsyncjob', 'id'), GREATEST(max(id), 1), max(id) IS NOT NULL) FROM melifullsyncjob"
+    )
+    op.add_column("melifullsyncjob", sa.Column("tipo", sa.String(), nullable=False, server_default="full"))
+    op.add_column("melifullsyncjob", sa.Column("params", postgresql.JSONB(), nullable=True))
+    op.add_column("melifullsyncjob", sa.Column("prioridade", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("melifullsyncjob", sa.Column("parent_id", sa.Integer(), nullable=True))
+    op.add_column("melifullsyncjob", sa.Column("task_id", sa.String(), nullable=True))
+    op.add_column("melifullsyncjob", sa.Column("criado_em", sa.DateTime(), nullable=True))
+    op.create_index("ix_melifullsyncjob_tipo", "melifullsyncjob", ["tipo"])
+    op.create_index("ix_melifullsyncjob_status", "melifullsyncjob", ["status"])
+    op.create_index("ix_melifullsyncjob_parent_id", "melifullsyncjob", ["parent_id"])
+    op.execute(
+        "CREATE INDEX ix_melifullsyncjob_fila ON melifullsyncjob (prioridade DESC, criado_em, id) WHERE status = 'queued'"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_melifullsyncjob_fila", table_name="melifullsyncjob")
+    op.drop_index("ix_melifullsyncjob_parent_id", table_name="melifullsyncjob")
+    op.drop_index("ix_melifullsyncjob_status", table_name="melifullsyncjob")
+    op.drop_index("ix_melifullsyncjob_tipo", table_name="melifullsyncjob")
+    for coluna in ("criado_em", "task_id", "parent_id", "prioridade", "params", "tipo"):
+        op.drop_column("melifullsyncjob", coluna)
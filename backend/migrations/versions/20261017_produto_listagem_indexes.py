@@ -0,0 +1,42 @@
+"""
+Índices compostos e parciais de produto para os filtros/ordenações da listagem de estoque.
+
+Revision ID: 20261017_produto_listagem
+Revises: 20261017_produto_search
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_produto_listagem"
+down_revision = "20261017_produto_search"
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    ("ix_produto_created_id", "(created_at DESC, id DESC)", None),
+    ("ix_produto_updated_id", "(updated_at DESC, id DESC)", None),
+    ("ix_produto_preco_id", "(preco DESC, id DESC)", None),
+    ("ix_produto_sku_id", "(sku, id)", None),
+    ("ix_produto_origem_created", "(origem, created_at DESC, id DESC)", None),
+    ("ix_produto_origem_status_created", "(origem, status, created_at DESC, id DESC)", None),
+    ("ix_produto_status_updated", "(status, updated_at DESC, id DESC)", None),
+    ("ix_produto_ativo_created", "(created_at DESC, id DESC)", "status = 'ATIVO'"),
+    ("ix_produto_ativo_preco", "(preco DESC, id DESC)", "status = 'ATIVO'"),
+]
+
+
+def upgrade() -> None:
+    for nome, colunas, where in INDICES:
+        ddl = f"CREATE INDEX IF NOT EXISTS {nome} ON produto {colunas}"
+        if where:
+            ddl += f" WHERE {where}"
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    for nome, _, _ in reversed(INDICES):
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
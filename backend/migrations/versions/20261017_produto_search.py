@@ -0,0 +1,39 @@
+"""
+Busca de estoque: pg_trgm, coluna tsvector (português) e índices de busca em produto.
+Também une as duas heads anteriores (imagens e ml_tokens).
+
+Revision ID: 20261017_produto_search
+Revises: 20251112_add_imagens, 20251124_create_ml_tokens
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_produto_search"
+down_revision = ("20251112_add_imagens", "20251124_create_ml_tokens")
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "ALTER TABLE produto ADD COLUMN IF NOT EXISTS busca_tsv tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'B')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_produto_busca_tsv ON produto USING gin (busca_tsv)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_produto_sku_trgm ON produto USING gin (sku gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_produto_titulo_trgm ON produto USING gin (titulo gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_produto_sku_lower_prefix ON produto (lower(sku) text_pattern_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_produto_sku_lower_prefix")
+    op.execute("DROP INDEX IF EXISTS ix_produto_titulo_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_produto_sku_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_produto_busca_tsv")
+    op.execute("ALTER TABLE produto DROP COLUMN IF EXISTS busca_tsv")
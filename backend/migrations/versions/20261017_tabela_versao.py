@@ -0,0 +1,31 @@
+"""
+Tabela tabelaversao: versão por tabela (ETag/Last-Modified da listagem), incrementada pela
+aplicação depois de cada commit que altera produto (http_cache.incrementar_versao).
+
+Revision ID: 20261017_tabela_versao
+Revises: 20261017_produto_listagem
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261017_tabela_versao"
+down_revision = "20261017_produto_listagem"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tabelaversao",
+        sa.Column("tabela", sa.String(), primary_key=True),
+        sa.Column("versao", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tabelaversao")
@@ -0,0 +1,281 @@
+"""
+Fakes compartilhados pelos testes de unidade e a sessão de banco real dos testes de integração.
+
+- FakeSession: registra os statements, conta commits/rollbacks e responde com `responder`.
+  Escritas agendadas com `ao_commitar` só valem no commit, como numa transação.
+- FakeRedis: o subconjunto de comandos que cache, lease, dedup, métricas e o stream de
+  notificações usam, em memória, thread-safe e sem expiração (os prazos ficam em `prazos`).
+- db_session: Session no Postgres de verdade, dentro de uma transação desfeita no fim;
+  o teste é pulado quando o banco não está disponível.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+from sqlalchemy import text
+
+
+class FakeResult:
+    """Resultado de exec/execute com as formas de leitura que o código usa."""
+
+    def __init__(self, linhas=(), rowcount: Optional[int] = None, partes: Optional[List] = None):
+        self.linhas = list(linhas)
+        self.rowcount = len(self.linhas) if rowcount is None else rowcount
+        self.partes = partes
+
+    def __iter__(self):
+        return iter(self.linhas)
+
+    def all(self):
+        return list(self.linhas)
+
+    def first(self):
+        return self.linhas[0] if self.linhas else None
+
+    def one(self):
+        return self.linhas[0]
+
+    def scalar(self):
+        linha = self.first()
+        return linha[0] if isinstance(linha, tuple) else linha
+
+    def partitions(self):
+        return iter(self.partes if self.partes is not None else [self.linhas])
+
+
+class FakeSession:
+    """
+    Session em memória. `responder(stmt, params)` devolve um FakeResult, uma lista de linhas
+    ou None (resultado vazio); `objetos` atende session.get por id.
+    """
+
+    # Para o responder montar resultados com rowcount ou partições: fake_session.resultado(...)
+    resultado = FakeResult
+
+    def __init__(self, responder: Optional[Callable[[Any, Any], Any]] = None, objetos: Optional[Dict] = None):
+        self.responder = responder
+        self.objetos = objetos if objetos is not None else {}
+        self.statements: List = []
+        self.adicionados: List = []
+        self.log: List[str] = []
+        self.info: Dict = {}
+        self.fechada = False
+        self._pendente: List[Callable[[], None]] = []
+
+    @property
+    def commits(self) -> int:
+        return self.log.count("commit")
+
+    def _responder(self, stmt, params=None) -> FakeResult:
+        self.statements.append((stmt, params))
+        resposta = self.responder(stmt, params) if self.responder else None
+        if isinstance(resposta, FakeResult):
+            return resposta
+        return FakeResult(resposta or ())
+
+    def execute(self, stmt, params=None, **kw):
+        return self._responder(stmt, params)
+
+    def exec(self, stmt):
+        return self._responder(stmt)
+
+    def connection(self):
+        return self
+
+    def exec_driver_sql(self, sql, params=None):
+        return self._responder(sql, params)
+
+    def get(self, modelo, ident):
+        return self.objetos.get(ident)
+
+    def add(self, obj):
+        self.adicionados.append(obj)
+
+    def refresh(self, obj):
+        pass
+
+    def ao_commitar(self, escrita: Callable[[], None]) -> None:
+        """Agenda uma escrita no 'banco' do teste para o próximo commit."""
+        self._pendente.append(escrita)
+
+    def commit(self):
+        self.log.append("commit")
+        pendente, self._pendente = self._pendente, []
+        for escrita in pendente:
+            escrita()
+
+    def rollback(self):
+        self.log.append("rollback")
+        self._pendente = []
+
+    def close(self):
+        self.fechada = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class _FakePipeline:
+    """Enfileira os comandos e aplica todos no execute()."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.comandos: List = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, nome):
+        return lambda *a, **kw: self.comandos.append((nome, a, kw))
+
+    def execute(self):
+        comandos, self.comandos = self.comandos, []
+        return [getattr(self.redis, nome)(*a, **kw) for nome, a, kw in comandos]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+        self.prazos: Dict[str, int] = {}
+        self.hashes: Dict[str, Dict] = {}
+        self.publicados: List = []
+        self.lock = threading.RLock()
+        # Streams: entradas, quantas o grupo já entregou e as pendentes de XACK
+        self.entradas: List = []
+        self.entregues = 0
+        self.pendentes: Dict[str, Dict] = {}
+
+    # Strings
+    def get(self, k):
+        return self.data.get(k)
+
+    def mget(self, ks):
+        return [self.data.get(k) for k in ks]
+
+    def set(self, k, v, nx=False, px=None, ex=None):
+        with self.lock:
+            if nx and k in self.data:
+                return None
+            self.data[k] = str(v)
+            self.prazos[k] = px or (ex or 0) * 1000
+            return True
+
+    def exists(self, k):
+        return int(k in self.data)
+
+    def incr(self, k):
+        with self.lock:
+            self.data[k] = str(int(self.data.get(k, 0)) + 1)
+            return int(self.data[k])
+
+    def delete(self, *ks):
+        with self.lock:
+            return sum(self.data.pop(k, None) is not None for k in ks)
+
+    def expire(self, k, ttl):
+        self.prazos[k] = int(ttl) * 1000
+
+    def eval(self, script, numkeys, key, token, *args):
+        """Os scripts "renova/libera só se o valor ainda for o nosso" do lease, dedup e cache."""
+        with self.lock:
+            if self.data.get(key) != token:
+                return 0
+            if "PEXPIRE" in script:
+                self.prazos[key] = int(args[0])
+            else:
+                del self.data[key]
+            return 1
+
+    # Hashes
+    def hset(self, h, campo, valor):
+        self.hashes.setdefault(h, {})[campo] = valor
+
+    def hincrby(self, h, campo, n):
+        with self.lock:
+            d = self.hashes.setdefault(h, {})
+            d[campo] = d.get(campo, 0) + n
+
+    def hgetall(self, h):
+        return {k: str(v) for k, v in self.hashes.get(h, {}).items()}
+
+    def hdel(self, h, *campos):
+        for campo in campos:
+            self.hashes.get(h, {}).pop(campo, None)
+
+    def publish(self, canal, valor):
+        self.publicados.append((canal, valor))
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self)
+
+    # Streams (um stream e um consumer group)
+    def xgroup_create(self, stream, grupo, id="0", mkstream=False):
+        pass
+
+    def xadd(self, stream, campos, maxlen=None, approximate=True):
+        entry_id = f"{len(self.entradas) + 1}-0"
+        self.entradas.append((entry_id, dict(campos)))
+        return entry_id
+
+    def xautoclaim(self, stream, grupo, consumidor, ocioso_ms, start_id="0-0", count=None):
+        # Como se o prazo já tivesse passado: tudo que está pendente volta
+        return ["0-0", list(self.pendentes.items())[:count], []]
+
+    def xreadgroup(self, grupo, consumidor, streams, count=None):
+        novas = self.entradas[self.entregues:self.entregues + count]
+        self.entregues += len(novas)
+        self.pendentes.update(novas)
+        return [[next(iter(streams)), novas]] if novas else []
+
+    def xack(self, stream, grupo, *ids):
+        for i in ids:
+            self.pendentes.pop(i, None)
+
+    def xdel(self, stream, *ids):
+        pass
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_session():
+    """A classe FakeSession (os testes montam uma ou várias, com o responder de cada caso)."""
+    return FakeSession
+
+
+def _db_disponivel() -> bool:
+    try:
+        from app.core.database import engine
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def db_session():
+    """Session no Postgres; commits viram savepoints e tudo é desfeito no fim do teste."""
+    if not _db_disponivel():
+        pytest.skip("Postgres indisponível")
+    from sqlmodel import Session, SQLModel
+    from app.core.database import engine
+
+    SQLModel.metadata.create_all(engine)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        with Session(bind=conn, join_transaction_mode="create_savepoint") as session:
+            try:
+                yield session
+            finally:
+                trans.rollback()
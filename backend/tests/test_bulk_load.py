@@ -0,0 +1,27 @@
+import csv
+
+from app.repositories.bulk_load_repo import CopyBulkLoader, to_csv
+
+
+def test_to_csv_distingue_null_de_vazio_e_serializa_json():
+    rows = [
+        {"sku": "MLB1", "titulo": 'Filtro "premium", 10un', "descricao": None, "imagens": ["a", "b"]},
+        {"sku": "MLB2", "titulo": "", "descricao": "linha1\nlinha2", "imagens": None},
+    ]
+    linhas = list(csv.reader(to_csv(rows, ("sku", "titulo", "descricao", "imagens"))))
+    assert linhas[0] == ["MLB1", 'Filtro "premium", 10un', r"\N", '["a", "b"]']
+    assert linhas[1] == ["MLB2", "", "linha1\nlinha2", r"\N"]
+
+
+def test_copy_loader_persistir_conta_como_novos():
+    copiados = []
+
+    class _Loader(CopyBulkLoader):
+        def _copy(self, table, cols, rows):
+            copiados.append((table, len(rows)))
+
+    loader = _Loader(engine=object())
+    registros = [{"sku": f"MLB{i}", "meli_id": f"MLB{i}", "produto": {"sku": f"MLB{i}"}} for i in range(3)]
+    assert loader.persistir(registros, "FULL") == {"novos": 3}
+    assert copiados == [("_stage_produto", 3), ("_stage_snapshot", 3)]
+    assert loader.copiados == 3
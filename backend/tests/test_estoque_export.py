@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from app.repositories.produto_repo import colunas_listagem, filtros_produto
+from app.services.estoque_export_service import iter_exportacao
+
+
+def _sessao(fake_session, partes):
+    """Entrega as linhas em partições, como Result.partitions() com yield_per."""
+    return fake_session(lambda stmt, params: fake_session.resultado(partes=partes))
+
+
+def _linhas():
+    Linha = namedtuple("Linha", ["id", "sku", "preco", "imagens", "updated_at"])
+    dt = datetime(2025, 1, 2, 3, 4, 5)
+    return [
+        [Linha(1, "MLB1", 9.9, ["https://img/1.jpg"], dt), Linha(2, "MLB2", 5.0, None, dt)],
+        [Linha(3, 'SKU "3", c/ vírgula', 1.5, [], dt)],
+    ]
+
+
+def test_ndjson_em_streaming_com_cursor_de_servidor(fake_session):
+    session = _sessao(fake_session, _linhas())
+    colunas = colunas_listagem("id,sku,preco,imagens,updated_at")
+    pedacos = list(iter_exportacao(filtros_produto(status="ATIVO"), colunas, "ndjson", session_factory=lambda: session))
+    assert len(pedacos) == 2  # um pedaço por partição do cursor
+    linhas = [json.loads(l) for l in b"".join(pedacos).splitlines()]
+    assert [l["id"] for l in linhas] == [1, 2, 3]
+    assert linhas[0] == {"id": 1, "sku": "MLB1", "preco": 9.9, "imagens": ["https://img/1.jpg"], "updated_at": "2025-01-02T03:04:05"}
+    assert session.fechada
+
+    query = session.statements[0][0]
+    assert query.get_execution_options()["yield_per"] == 1000
+    # Uma consulta só, sem paginação, na ordem do id
+    assert [str(c) for c in query._order_by_clauses] == ["produto.id"]
+    assert query._limit_clause is None and query._offset_clause is None
+
+
+def test_csv_gzip(fake_session):
+    colunas = colunas_listagem("id,sku,preco,imagens,updated_at")
+    dados = b"".join(iter_exportacao([], colunas, "csv", gzip=True, session_factory=lambda: _sessao(fake_session, _linhas())))
+    linhas = list(csv.reader(io.StringIO(gzip.decompress(dados).decode("utf-8"))))
+    assert linhas[0] == ["id", "sku", "preco", "imagens", "updated_at"]
+    assert linhas[1] == ["1", "MLB1", "9.9", '["https://img/1.jpg"]', "2025-01-02T03:04:05"]
+    assert linhas[2][3] == ""
+    assert linhas[3][1] == 'SKU "3", c/ vírgula'
+
+    vazio = b"".join(iter_exportacao([], colunas, "csv", session_factory=lambda: _sessao(fake_session, [])))
+    assert vazio == b"id,sku,preco,imagens,updated_at\n"
+    with pytest.raises(ValueError):
+        iter_exportacao([], colunas, "xml")
@@ -0,0 +1,133 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import asc, desc
+from sqlmodel import select
+
+from app.core.pagination import decode_cursor, encode_cursor
+from app.repositories.produto_repo import list_produtos_keyset
+
+
+def test_cursor_roundtrip_datetime_e_ordenacao():
+    dt = datetime(2025, 11, 20, 10, 30, 15, 123456)
+    cursor = encode_cursor("created_at", "desc", dt, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "created_at", "desc") == (dt, 42)
+    assert decode_cursor(encode_cursor("preco", "asc", 9.9, 7), "preco", "asc") == (9.9, 7)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "preco", "desc")
+    with pytest.raises(ValueError):
+        decode_cursor("nao-e-cursor", "created_at", "desc")
+
+
+def _sessao(fake_session, rows):
+    # Consultas da listagem devolvem `rows`; versao_tabela (SQL textual) não acha linha (versão 0)
+    return fake_session(lambda stmt, params: rows if hasattr(stmt, "selected_columns") else None)
+
+
+def _consulta(session):
+    """A consulta da listagem (a primeira é a da versão da tabela)."""
+    return next(stmt for stmt, _ in session.statements if hasattr(stmt, "selected_columns"))
+
+
+def _request(query_string=b"", headers=()):
+    from starlette.requests import Request
+
+    return Request({"type": "http", "method": "GET", "path": "/estoque", "query_string": query_string, "headers": list(headers)})
+
+
+def test_keyset_percorre_tudo_sem_repetir_no_banco(db_session):
+    from datetime import timedelta
+    from app.models.produto import Produto
+
+    # Empates em created_at: o id desempata e nenhuma linha se repete ou some entre páginas
+    base = datetime(2025, 1, 1)
+    for i in range(7):
+        db_session.add(Produto(sku=f"TST-KS-{i}", titulo="x", created_at=base + timedelta(minutes=i // 3), updated_at=base))
+    db_session.commit()
+    filtros = [Produto.sku.like("TST-KS-%")]
+    esperado = {d: [p.id for p in db_session.exec(
+        select(Produto).where(*filtros).order_by(*(ordem(Produto.created_at), ordem(Produto.id)))
+    ).all()] for d, ordem in (("desc", desc), ("asc", asc))}
+
+    for direcao in ("desc", "asc"):
+        vistos, after = [], None
+        while True:
+            items, after = list_produtos_keyset(db_session, filtros, sort_by="created_at", sort_dir=direcao, size=3, after=after)
+            vistos.extend(p.id for p in items)
+            if after is None:
+                break
+            # O cursor sobrevive à serialização usada pela API
+            after = decode_cursor(encode_cursor("created_at", direcao, *after), "created_at", direcao)
+        assert vistos == esperado[direcao] and len(vistos) == 7
+
+    vazio, proximo = list_produtos_keyset(db_session, [Produto.sku == "TST-KS-nenhum"], size=3)
+    assert vazio == [] and proximo is None
+
+
+def test_listagem_serializa_tuplas_como_produto_read(fake_session):
+    from collections import namedtuple
+
+    from app.api.routes.estoque import get_estoque
+    from app.repositories.produto_repo import PRODUTO_LISTA_COLS
+    from app.schemas.produto import ProdutoRead
+
+    Linha = namedtuple("Linha", [c.key for c in PRODUTO_LISTA_COLS])
+    dados = {
+        "id": 9, "sku": "MLB9", "titulo": "Filtro de ar", "descricao": None, "preco": 19.9,
+        "estoque_atual": 3, "origem": "MERCADO_LIVRE", "status": "ATIVO", "imagens": ["https://img/1.jpg"],
+        "created_at": datetime(2025, 1, 1, 12, 0, 0, 500), "updated_at": datetime(2025, 1, 2),
+    }
+    session = _sessao(fake_session, [Linha(**dados)])
+    resp = get_estoque(
+        request=_request(), session=session, page=1, size=10, sort_by=None, sort_dir="desc", origem=None,
+        search=None, status=None, cursor=None, incluir_total=False, fields="completo",
+    )
+    body = json.loads(resp.body)
+    assert body["items"] == [json.loads(ProdutoRead(**dados).model_dump_json())]
+    assert body["total"] is None and body["next_cursor"] is None
+    assert [c.key for c in _consulta(session).selected_columns] == [c.key for c in PRODUTO_LISTA_COLS]
+
+
+def test_fields_seleciona_so_colunas_pedidas(fake_session):
+    from collections import namedtuple
+
+    from fastapi import HTTPException
+
+    from app.api.routes.estoque import get_estoque
+    from app.repositories.produto_repo import PROJECAO_COMPACTA, colunas_listagem
+
+    assert [c.key for c in colunas_listagem("compacto")] == list(PROJECAO_COMPACTA)
+    assert colunas_listagem("completo") == colunas_listagem(None)
+    assert [c.key for c in colunas_listagem(" titulo, sku ,sku", obrigatorias=("id", "preco"))] == ["id", "sku", "titulo", "preco"]
+    with pytest.raises(ValueError):
+        colunas_listagem("sku,busca_tsv")
+
+    Linha = namedtuple("Linha", ["id", "sku", "preco"])
+    session = _sessao(fake_session, [Linha(1, "MLB1", 9.9)])
+    resp = get_estoque(
+        request=_request(), session=session, page=1, size=1, sort_by="preco", sort_dir="asc", origem=None,
+        search=None, status=None, cursor=None, incluir_total=False, fields="sku",
+    )
+    body = json.loads(resp.body)
+    assert body["items"] == [{"id": 1, "sku": "MLB1", "preco": 9.9}]
+    assert decode_cursor(body["next_cursor"], "preco", "asc") == (9.9, 1)
+    assert [c.key for c in _consulta(session).selected_columns] == ["id", "sku", "preco"]
+
+    with pytest.raises(HTTPException) as exc:
+        get_estoque(
+            request=_request(), session=session, page=1, size=1, sort_by=None, sort_dir="desc", origem=None,
+            search=None, status=None, cursor=None, incluir_total=False, fields="imagens,senha",
+        )
+    assert exc.value.status_code == 400
+
+    # Sem fields, a listagem vem compacta (sem descricao e imagens)
+    session = _sessao(fake_session, [])
+    get_estoque(
+        request=_request(), session=session, page=1, size=1, sort_by=None, sort_dir="desc", origem=None,
+        search=None, status=None, cursor=None, incluir_total=False, fields=None,
+    )
+    colunas = [c.key for c in _consulta(session).selected_columns]
+    assert "descricao" not in colunas and "imagens" not in colunas
+    assert sorted(colunas) == sorted(set(PROJECAO_COMPACTA) | {"created_at"})
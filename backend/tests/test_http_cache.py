@@ -0,0 +1,125 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.api.routes.estoque import get_estoque
+from app.core.http_cache import cabecalhos_cache, etag_da_requisicao, gerar_etag, nao_modificado
+
+
+def _request(query_string=b"", headers=()):
+    return Request({
+        "type": "http", "method": "GET", "path": "/estoque", "query_string": query_string,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+    })
+
+
+def test_etag_e_condicionais():
+    etag = gerar_etag("produto", 7)
+    assert etag.startswith('W/"') and etag == gerar_etag("produto", 7) != gerar_etag("produto", 8)
+    # Parâmetros em outra ordem: mesmo ETag
+    assert etag_da_requisicao(_request(b"page=2&size=50"), 7) == etag_da_requisicao(_request(b"size=50&page=2"), 7)
+    assert etag_da_requisicao(_request(b"page=2"), 7) != etag_da_requisicao(_request(b"page=3"), 7)
+
+    assert nao_modificado(_request(headers=[("if-none-match", etag)]), etag)
+    assert nao_modificado(_request(headers=[("if-none-match", f'"x", {etag[2:]}')]), etag)
+    assert nao_modificado(_request(headers=[("if-none-match", "*")]), etag)
+    assert not nao_modificado(_request(headers=[("if-none-match", '"outro"')]), etag)
+
+    dt = datetime(2025, 11, 20, 10, 30, 15, 999)
+    headers = cabecalhos_cache(etag, dt)
+    assert headers["Last-Modified"] == "Thu, 20 Nov 2025 10:30:15 GMT"
+    assert nao_modificado(_request(headers=[("if-modified-since", headers["Last-Modified"])]), etag, dt)
+    assert not nao_modificado(_request(headers=[("if-modified-since", "Thu, 20 Nov 2025 10:30:14 GMT")]), etag, dt)
+    # If-None-Match tem precedência sobre If-Modified-Since
+    req = _request(headers=[("if-none-match", '"outro"'), ("if-modified-since", headers["Last-Modified"])])
+    assert not nao_modificado(req, etag, dt)
+
+
+def _sessao_versao(fake_session, *row):
+    """Só responde o marcador de versão; qualquer consulta da listagem falha o teste."""
+    def responder(stmt, params):
+        assert "tabelaversao" in str(stmt), "a listagem não deveria ser consultada"
+        return [sessao.row] if sessao.row else None
+
+    sessao = fake_session(responder)
+    sessao.row = row
+    return sessao
+
+
+def test_get_estoque_responde_304_sem_consultar(fake_session):
+    dt = datetime(2025, 11, 20, 10, 30, 15)
+    qs = b"page=1&size=50"
+    etag = etag_da_requisicao(_request(qs), "produto", 42)
+    resp = get_estoque(
+        request=_request(qs, [("if-none-match", etag)]), session=_sessao_versao(fake_session, 42, dt), page=1, size=50,
+        sort_by=None, sort_dir="desc", origem=None, search=None, status=None, cursor=None,
+        incluir_total=None, fields=None,
+    )
+    assert resp.status_code == 304
+    assert resp.body == b""
+    assert resp.headers["etag"] == etag
+    assert resp.headers["last-modified"] == "Thu, 20 Nov 2025 10:30:15 GMT"
+
+
+def test_get_estoque_cacheia_o_corpo_por_versao(monkeypatch, fake_session):
+    from app.core import response_cache
+    chaves = []
+    monkeypatch.setattr(response_cache, "obter", lambda nome, partes, tags, ttl, calcular: chaves.append(partes) or "{}")
+    dt = datetime(2025, 11, 20, 10, 30, 15)
+    for versao in (42, 43):
+        resp = get_estoque(
+            request=_request(b"page=1"), session=_sessao_versao(fake_session, versao, dt), page=1, size=10,
+            sort_by=None, sort_dir="desc", origem=None, search=None, status=None, cursor=None,
+            incluir_total=None, fields=None,
+        )
+        assert resp.headers["etag"] == etag_da_requisicao(_request(b"page=1"), "produto", versao)
+    # Mesma query string em outra versão da tabela não reaproveita o corpo do ETag anterior
+    assert chaves[0] != chaves[1] and chaves[0][-1] == 42 and chaves[1][-1] == 43
+
+
+def test_versao_sem_linha_e_sem_tabela(fake_session):
+    from app.core.http_cache import versao_tabela
+
+    # Nenhuma escrita ainda: versão 0
+    assert versao_tabela(_sessao_versao(fake_session), "produto") == (0, None)
+
+    def sem_tabela(stmt, params):
+        raise RuntimeError('relation "tabelaversao" does not exist')
+
+    session = fake_session(sem_tabela)
+    assert versao_tabela(session, "produto") is None
+    assert session.log == ["rollback"]
+
+
+def test_escrita_em_produto_sobe_a_versao_depois_do_commit(monkeypatch):
+    from sqlmodel import Session
+
+    from app.core import http_cache
+    from app.repositories.produto_repo import bulk_upsert_produtos
+
+    versoes = []
+    monkeypatch.setattr(http_cache, "incrementar_versao", versoes.append)
+
+    class _UpsertSession(Session):
+        def execute(self, stmt, *args, **kw):
+            if not self.in_transaction():
+                self.begin()
+            return iter([(True,)])
+
+    session = _UpsertSession()
+    bulk_upsert_produtos(session, [{"sku": "A1"}], commit=False)
+    # Sem trigger: nada é tocado em tabelaversao dentro da transação do escritor
+    assert versoes == []
+    session.commit()
+    assert versoes == ["produto"]
+
+
+def test_incrementar_versao_no_banco(db_session):
+    from app.core.http_cache import incrementar_versao, versao_tabela
+
+    antes, _ = versao_tabela(db_session, "produto")
+    incrementar_versao("produto")
+    incrementar_versao("produto")
+    db_session.rollback()
+    versao, atualizado_em = versao_tabela(db_session, "produto")
+    assert versao == antes + 2 and atualizado_em is not None
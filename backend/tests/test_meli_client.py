@@ -0,0 +1,93 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services import mercadolivre_service as ml
+from app.services.meli_client import MeliClient
+
+
+def test_client_reuses_token_and_refreshes_once_on_401(monkeypatch):
+    calls = {"token": 0, "refresh": 0}
+    seen_auth = []
+
+    def fake_get_access_token(operation_type="read"):
+        calls["token"] += 1
+        return "old"
+
+    def fake_refresh_access_token():
+        calls["refresh"] += 1
+        return "new", None
+
+    monkeypatch.setattr(ml, "get_access_token", fake_get_access_token)
+    monkeypatch.setattr(ml, "refresh_access_token", fake_refresh_access_token)
+
+    async def handler(request):
+        auth = request.headers.get("Authorization")
+        seen_auth.append(auth)
+        if auth != "Bearer new":
+            return web.json_response({"message": "invalid_token"}, status=401)
+        return web.json_response({"id": request.match_info["item_id"]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/items/{item_id}", handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            async with MeliClient() as client:
+                client.base_url = str(server.make_url("")).rstrip("/")
+                results = []
+                for i in range(5):
+                    results.append(await ml.meli_request("GET", f"/items/MLB{i}", client=client))
+                return results
+        finally:
+            await server.close()
+
+    results = asyncio.run(run())
+    assert [r["id"] for r in results] == [f"MLB{i}" for i in range(5)]
+    assert calls == {"token": 1, "refresh": 1}
+    assert seen_auth.count("Bearer old") == 1
+
+
+
+def test_retry_after_aceita_segundos_decimais_e_http_date():
+    assert ml._retry_after_segundos("3") == 3.0
+    assert ml._retry_after_segundos("1.5") == 1.5
+    assert ml._retry_after_segundos("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    for invalido in (None, "", "amanhã", "inf"):
+        assert ml._retry_after_segundos(invalido) == 2.0
+
+
+def test_retry_after_em_data_ou_decimal_nao_aborta_o_lote(monkeypatch):
+    monkeypatch.setattr(ml, "get_access_token", lambda operation_type="read": "tok")
+    respostas = [{"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, {"Retry-After": "0.01"}]
+    pausas = []
+
+    async def handler(request):
+        if respostas:
+            return web.json_response({"message": "too_many_requests"}, status=429, headers=respostas.pop(0))
+        return web.json_response({"id": "MLB1"})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/items/{item_id}", handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            async with MeliClient() as client:
+                client.base_url = str(server.make_url("")).rstrip("/")
+                registrar = client.concurrency.record
+
+                def record(latency, status, retry_after=None):
+                    pausas.append(retry_after)
+                    registrar(latency, status, retry_after=retry_after)
+
+                client.concurrency.record = record
+                return await ml.meli_request("GET", "/items/MLB1", client=client)
+        finally:
+            await server.close()
+
+    assert asyncio.run(run()) == {"id": "MLB1"}
+    # O valor interpretado chega à janela AIMD (a pausa dela segura as demais requisições)
+    assert pausas == [0.0, 0.01, None]
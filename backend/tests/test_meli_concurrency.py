@@ -0,0 +1,72 @@
+import asyncio
+
+from app.services.meli_concurrency import AdaptiveConcurrency, concurrency_metrics
+
+
+def test_window_grows_additively_while_healthy():
+    ctl = AdaptiveConcurrency(min_window=1, max_window=10, initial_window=2, latency_target_ms=500)
+    for _ in range(2 + 3):
+        ctl.record(0.05, 200)
+    # 2 sucessos -> 3, mais 3 sucessos -> 4
+    assert int(ctl.window) == 4
+
+
+def test_window_halves_on_429_and_respects_min():
+    ctl = AdaptiveConcurrency(min_window=2, max_window=16, initial_window=8, latency_target_ms=500)
+    ctl.record(0.05, 429, retry_after=0.01)
+    assert int(ctl.window) == 4
+    # rajada de 429 logo em seguida conta como um único sinal
+    ctl.record(0.05, 429)
+    assert int(ctl.window) == 4
+    ctl._last_decrease = 0.0
+    ctl.record(0.05, 429)
+    ctl._last_decrease = 0.0
+    ctl.record(0.05, 429)
+    assert int(ctl.window) == 2
+    assert ctl.total_throttled == 4
+
+
+def test_window_shrinks_when_p95_exceeds_target():
+    ctl = AdaptiveConcurrency(min_window=1, max_window=16, initial_window=10, latency_target_ms=100)
+    for _ in range(10):
+        ctl.record(0.5, 200)
+    assert int(ctl.window) == 8
+
+
+def test_in_flight_never_exceeds_window_and_metric_exposed():
+    ctl = AdaptiveConcurrency(name="test-slot", min_window=1, max_window=3, initial_window=3, latency_target_ms=1000)
+    state = {"now": 0, "peak": 0}
+
+    async def call():
+        async with ctl.slot():
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+            await asyncio.sleep(0.005)
+            state["now"] -= 1
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(20)])
+
+    asyncio.run(run())
+    assert state["peak"] == 3
+    names = [c["controller"] for c in concurrency_metrics()["active"]]
+    assert "test-slot" in names
+
+
+def test_janela_dos_workers_chega_na_api_pelo_redis(monkeypatch, fake_redis):
+    import orjson
+    from app.services import meli_concurrency
+
+    r = fake_redis
+    monkeypatch.setattr(meli_concurrency, "_redis", lambda: r)
+    # "Worker": outro processo ajusta a janela depois de um 429
+    monkeypatch.setattr(meli_concurrency, "_processo", lambda: "worker-1:42")
+    ctl = AdaptiveConcurrency(name="import", min_window=1, max_window=16, initial_window=8, latency_target_ms=100)
+    ctl.record(0.01, 429)
+    # Snapshot de um processo que parou há muito tempo é descartado na leitura
+    r.hset(meli_concurrency.CHAVE, "morto:1:import", orjson.dumps({"controller": "import", "updated_at": "2020-01-01T00:00:00"}).decode())
+
+    metricas = concurrency_metrics()
+    assert [(w["processo"], w["window"]) for w in metricas["workers"]] == [("worker-1:42", 4)]
+    assert metricas["last"]["window"] == 4
+    assert "morto:1:import" not in r.hashes[meli_concurrency.CHAVE]
@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import meli_import_pipeline as pipeline
+from app.services.meli_import_pipeline import executar_pipeline, montar_registro, registro_mudou
+
+
+async def _pages(pages):
+    for page in pages:
+        yield page
+
+
+def _fake_multiget(calls):
+    async def fake(ids, client=None, **kwargs):
+        calls.append(list(ids))
+        await asyncio.sleep(0)
+        return [{"id": i, "title": f"Item {i}", "price": 10, "status": "active", "available_quantity": 1} for i in ids]
+    return fake
+
+
+def test_pipeline_grava_em_lotes_e_reporta_progresso(monkeypatch):
+    calls = []
+    lotes = []
+    progresso = []
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", _fake_multiget(calls))
+
+    def persist(registros, mode):
+        lotes.append([r["sku"] for r in registros])
+        return {"novos": len(registros), "atualizados": 0, "ignorados_sem_mudanca": 0}
+
+    pages = [[f"MLB{i}" for i in range(p * 50, p * 50 + 50)] for p in range(5)]
+    stats = asyncio.run(executar_pipeline(
+        None, _pages(pages), mode="FULL", persist=persist,
+        on_progress=progresso.append, write_batch=40, fetch_workers=3,
+    ))
+
+    assert stats["fetched"] == 250 and stats["novos"] == 250
+    assert all(len(c) <= 20 for c in calls)
+    assert all(len(lote) <= 60 for lote in lotes)
+    assert sorted(sku for lote in lotes for sku in lote) == sorted(f"MLB{i}" for i in range(250))
+    # Progresso gravado a cada lote, com contadores crescentes
+    assert len(progresso) == stats["lotes"] == len(lotes)
+    assert [p["novos"] for p in progresso] == sorted(p["novos"] for p in progresso)
+
+
+def test_pipeline_respeita_limite_e_filtro(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", _fake_multiget(calls))
+    gravados = []
+
+    def persist(registros, mode):
+        gravados.extend(r["sku"] for r in registros)
+        return {"novos": len(registros)}
+
+    pages = [[f"MLB{i}" for i in range(100)]]
+    stats = asyncio.run(executar_pipeline(
+        None, _pages(pages), limit=45, persist=persist,
+        item_filter=lambda it: it["id"] != "MLB3", fetch_workers=2,
+    ))
+
+    assert stats["listados"] == 45
+    assert sum(len(c) for c in calls) == 45
+    assert len(gravados) == 44 and "MLB3" not in gravados
+
+
+def test_pipeline_fecha_a_listagem_ao_atingir_o_limite(monkeypatch):
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", _fake_multiget([]))
+    fechada = []
+
+    async def paginas():
+        try:
+            for p in range(10):
+                yield [f"MLB{i}" for i in range(p * 50, p * 50 + 50)]
+        finally:
+            fechada.append(True)
+
+    async def run():
+        stats = await executar_pipeline(None, paginas(), limit=60, persist=lambda r, m: {}, fetch_workers=2)
+        # Ainda dentro do loop: o finally do gerador já rodou, sem esperar o GC
+        return stats, list(fechada)
+
+    stats, fechada_antes_do_fim = asyncio.run(run())
+    assert stats["listados"] == 60
+    assert fechada_antes_do_fim == [True]
+
+
+def test_pipeline_propaga_erro_e_encerra_estagios(monkeypatch):
+    async def falha(ids, client=None, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", falha)
+    with pytest.raises(RuntimeError):
+        asyncio.run(executar_pipeline(None, _pages([["MLB1"] * 5] * 10), persist=lambda r, m: {}, fetch_workers=2))
+
+
+def test_registro_mudou_considera_quantidades_no_modo_estendido():
+    item = {"id": "MLB1", "title": "A", "price": 10, "status": "active", "available_quantity": 3, "sold_quantity": 1}
+    reg = montar_registro(item, "TODOS_STATUS")
+    snap = SimpleNamespace(hash_conteudo=reg["hash_conteudo"], status_meli="active", raw_payload=dict(reg["raw_payload"]))
+    assert not registro_mudou(snap, reg, "TODOS_STATUS")
+
+    vendido = montar_registro({**item, "available_quantity": 2, "sold_quantity": 2}, "TODOS_STATUS")
+    assert vendido["hash_conteudo"] == reg["hash_conteudo"]
+    assert registro_mudou(snap, vendido, "TODOS_STATUS")
+    # No modo FULL apenas o hash conta
+    assert not registro_mudou(snap, vendido, "FULL")
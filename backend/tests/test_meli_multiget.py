@@ -0,0 +1,75 @@
+import asyncio
+
+from app.services import mercadolivre_service as ml
+from app.services.mercadolivre_service import _unpack_multiget, fetch_items_multiget
+
+
+def test_unpack_multiget_classifies_envelopes():
+    payload = [
+        {"code": 200, "body": {"id": "MLB1", "title": "A"}},
+        {"code": 404, "body": {"message": "not_found", "status": 404}},
+        {"code": 500, "body": {"message": "internal_error", "status": 500}},
+    ]
+    items, retry, dropped = _unpack_multiget(payload, ["MLB1", "MLB2", "MLB3"])
+    assert [i["id"] for i in items] == ["MLB1"]
+    assert retry == ["MLB3"]
+    assert dropped == ["MLB2"]
+
+
+def test_unpack_multiget_invalid_payload_retries_all():
+    items, retry, dropped = _unpack_multiget({"error": "x"}, ["MLB1", "MLB2"])
+    assert items == [] and dropped == []
+    assert retry == ["MLB1", "MLB2"]
+
+
+def test_fetch_items_multiget_batches_and_retries_only_failed(monkeypatch):
+    calls = []
+    failed_once = set()
+
+    async def fake_meli_request(method, endpoint, params=None, **kwargs):
+        ids = params["ids"].split(",")
+        calls.append(ids)
+        out = []
+        for i in ids:
+            if i == "MLB7" and i not in failed_once:
+                failed_once.add(i)
+                out.append({"code": 429, "body": {"message": "too_many_requests"}})
+            else:
+                out.append({"code": 200, "body": {"id": i}})
+        return out
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr(ml, "meli_request", fake_meli_request)
+    monkeypatch.setattr(ml.asyncio, "sleep", no_sleep)
+
+    ids = [f"MLB{i}" for i in range(45)] + ["MLB3"]
+    items = asyncio.run(fetch_items_multiget(ids))
+
+    assert sorted(i["id"] for i in items) == sorted(f"MLB{i}" for i in range(45))
+    assert all(len(c) <= 20 for c in calls)
+    # 3 lotes (20 + 20 + 5) e depois apenas o ID que falhou
+    assert len(calls) == 4
+    assert calls[-1] == ["MLB7"]
+
+
+def test_import_user_items_usa_o_meli_client(monkeypatch):
+    clients = []
+
+    async def fake_meli_request(method, endpoint, params=None, client=None, **kwargs):
+        clients.append(client)
+        if endpoint == "/users/me":
+            return {"id": 42, "nickname": "loja"}
+        if endpoint == "/users/42/items/search":
+            return {"results": [f"MLB{i}" for i in range(params["offset"], min(params["offset"] + params["limit"], 60))]}
+        return [{"code": 200, "body": {"id": i}} for i in params["ids"].split(",")]
+
+    monkeypatch.setattr(ml, "meli_request", fake_meli_request)
+
+    resultado = ml.import_user_items(limit=100, since_hours=0)
+
+    assert resultado["success"] is True
+    assert resultado["items_imported"] == 60
+    # Listagem e multiget na mesma sessão do client
+    assert clients[0] is not None and all(c is clients[0] for c in clients)
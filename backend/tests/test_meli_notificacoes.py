@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import meli_notificacoes as notif
+
+
+def _settings(monkeypatch, **kw):
+    monkeypatch.setattr(notif, "get_settings", lambda: SimpleNamespace(ML_SELLER_ID="123", ML_CLIENT_ID="999", **kw))
+
+
+def test_validacao_das_notificacoes(monkeypatch):
+    _settings(monkeypatch)
+    base = {"user_id": 123, "application_id": 999}
+    assert notif.validar({**base, "topic": "items", "resource": "/items/MLB123"}) == ("items", "MLB123")
+    assert notif.validar({**base, "topic": "orders_v2", "resource": "/orders/2000001"}) == ("orders_v2", "2000001")
+    # Tópico que não sincronizamos: só o 200
+    assert notif.validar({**base, "topic": "questions", "resource": "/questions/1"}) is None
+
+    with pytest.raises(notif.NotificacaoInvalida):
+        notif.validar({**base, "topic": "items", "resource": "/items/MLB123/description"})
+    with pytest.raises(notif.NotificacaoInvalida):
+        notif.validar({"topic": "items"})
+    with pytest.raises(notif.NotificacaoAlheia):
+        notif.validar({**base, "user_id": 456, "topic": "items", "resource": "/items/MLB1"})
+    with pytest.raises(notif.NotificacaoAlheia):
+        notif.validar({**base, "application_id": 1, "topic": "items", "resource": "/items/MLB1"})
+
+
+def _fakes(monkeypatch, lotes, falhar=False):
+    async def meli_request(method, endpoint, params=None, client=None):
+        pedido = endpoint.rsplit("/", 1)[1]
+        return {"order_items": [{"item": {"id": "MLB2"}}, {"item": {"id": f"MLB{pedido}"}}]}
+
+    async def sincronizar_ids(ids, client=None):
+        if falhar:
+            raise RuntimeError("ML fora")
+        lotes.append(list(ids))
+        return {"fetched": len(ids), "novos": 0, "atualizados": len(ids), "ignorados_sem_mudanca": 0}
+
+    import app.services.mercadolivre_service as ml
+    monkeypatch.setattr(ml, "meli_request", meli_request)
+    monkeypatch.setattr(notif, "sincronizar_ids", sincronizar_ids)
+    monkeypatch.setattr(notif, "get_settings", lambda: SimpleNamespace(ML_NOTIFICACOES_LOTE=100, ML_NOTIFICACOES_REIVINDICAR=300, ML_NOTIFICACOES_STREAM_MAX=1000))
+
+
+def test_consumidor_junta_ids_e_resolve_pedidos(monkeypatch, fake_redis):
+    lotes = []
+    _fakes(monkeypatch, lotes)
+    r = fake_redis
+    for topico, i in [("items", "MLB1"), ("items", "MLB2"), ("items", "MLB1"), ("orders_v2", "7"), ("orders_v2", "7"), ("items", "MLB1")]:
+        notif.enfileirar(r, topico, i)
+
+    resultado = notif.processar_notificacoes(r, client=object())
+    # Seis notificações viram um único multiget com os itens distintos (pedido -> itens vendidos)
+    assert lotes == [["MLB1", "MLB2", "MLB7"]]
+    assert resultado["notificacoes"] == 6 and resultado["itens"] == 3 and resultado["pedidos"] == 1
+    assert r.pendentes == {}
+    assert notif.processar_notificacoes(r, client=object()) == {"notificacoes": 0}
+
+
+def test_lote_com_falha_fica_pendente_e_volta(monkeypatch, fake_redis):
+    lotes = []
+    _fakes(monkeypatch, lotes, falhar=True)
+    r = fake_redis
+    notif.enfileirar(r, "items", "MLB1")
+    with pytest.raises(RuntimeError):
+        notif.processar_notificacoes(r, client=object())
+    assert list(r.pendentes) == ["1-0"]
+
+    _fakes(monkeypatch, lotes)
+    notif.processar_notificacoes(r, client=object())
+    assert lotes == [["MLB1"]] and r.pendentes == {}
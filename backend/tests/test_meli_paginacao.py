@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.services import meli_paginacao_fix as pag
+
+
+def _collect(client=None, **kwargs):
+    async def run():
+        out = []
+        async for page in pag.iter_item_id_pages(client, seller_id="123", **kwargs):
+            out.extend(page)
+        return out
+    return asyncio.run(run())
+
+
+def test_scan_is_primary_and_dedups(monkeypatch):
+    pages = [["A", "B"], ["B", "C"], ["D"], []]
+    calls = []
+
+    async def fake(method, endpoint, params=None, client=None):
+        calls.append(dict(params or {}))
+        idx = len(calls) - 1
+        return {"results": pages[idx], "scroll_id": "scroll-1"}
+
+    monkeypatch.setattr(pag, "meli_request", fake)
+    ids = _collect()
+    assert ids == ["A", "B", "C", "D"]
+    assert "scroll_id" not in calls[0]
+    assert all(c.get("scroll_id") == "scroll-1" for c in calls[1:])
+    assert len(calls) == 4
+
+
+def test_falls_back_to_window_bisection_without_offset_overflow(monkeypatch):
+    base = datetime(2024, 1, 1)
+    catalog = [(f"MLB{i}", base + timedelta(minutes=i)) for i in range(2500)]
+    offsets = []
+
+    def parse(v):
+        return datetime.strptime(v, "%Y-%m-%dT%H:%M:%S.000Z")
+
+    async def fake(method, endpoint, params=None, client=None):
+        params = params or {}
+        if params.get("search_type") == "scan":
+            return {"results": [], "paging": {"total": 0}}
+        start, end = parse(params["since"]), parse(params["until"])
+        hits = [i for i, created in catalog if start <= created < end]
+        offset, limit = params["offset"], params["limit"]
+        offsets.append(offset)
+        return {"results": hits[offset:offset + limit], "paging": {"total": len(hits)}}
+
+    monkeypatch.setattr(pag, "meli_request", fake)
+    ids = _collect(since=base)
+    assert sorted(ids) == sorted(i for i, _ in catalog)
+    assert len(ids) == len(set(ids))
+    assert max(offsets) < 1000
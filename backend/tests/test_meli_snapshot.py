@@ -46,4 +46,69 @@ def test_snapshot_lifecycle():
         h2 = compute_meli_item_hash(normalized_changed, raw)
         snap3 = update_snapshot_changed(session, snap2, h2, raw["status"], {"id": raw["id"], "title": raw["title"], "price": 110.0, "status": raw["status"]})
         assert snap3.hash_conteudo == h2
-        assert snap3.ultima_modificacao_detectada_em is not None
\ No newline at end of file
+        assert snap3.ultima_modificacao_detectada_em is not None
+
+def test_classify_snapshot_batch_em_memoria():
+    from types import SimpleNamespace
+    from app.repositories.meli_item_snapshot_repo import classify_snapshot_batch
+
+    existentes = {
+        "meli:MLB1": SimpleNamespace(id=1, sku="MLB1", meli_id="MLB1", hash_conteudo="h1"),
+        "sku:MLB2": SimpleNamespace(id=2, sku="MLB2", meli_id="OUTRO", hash_conteudo="h2"),
+    }
+    entries = [
+        {"sku": "MLB1", "meli_id": "MLB1", "hash_conteudo": "h1"},
+        {"sku": "MLB2", "meli_id": "MLB2", "hash_conteudo": "novo"},
+        {"sku": "MLB3", "meli_id": "MLB3", "hash_conteudo": "h3"},
+        {"sku": "MLB3", "meli_id": "MLB3", "hash_conteudo": "h3b"},
+    ]
+    out = classify_snapshot_batch(existentes, entries)
+    assert [e["hash_conteudo"] for e in out["novos"]] == ["h3b"]
+    assert [snap.id for snap, _ in out["alterados"]] == [2]
+    assert [snap.id for snap, _ in out["inalterados"]] == [1]
+
+    out = classify_snapshot_batch(existentes, entries, ignorar_existentes=True)
+    assert len(out["ignorados"]) == 2 and len(out["novos"]) == 1
+
+
+def _entrada(sku, h, status="active"):
+    return {"sku": sku, "meli_id": sku, "hash_conteudo": h, "status_meli": status, "raw_payload": {"id": sku, "h": h}}
+
+
+def test_diff_de_snapshots_no_banco(db_session):
+    from sqlalchemy import text
+    from app.repositories.meli_item_snapshot_repo import apply_snapshot_batch
+
+    primeiro = apply_snapshot_batch(db_session, [_entrada("TST-SNAP-1", "h1"), _entrada("TST-SNAP-2", "h2")])
+    assert sorted(e["sku"] for e in primeiro["novos"]) == ["TST-SNAP-1", "TST-SNAP-2"]
+
+    segundo = apply_snapshot_batch(
+        db_session,
+        [_entrada("TST-SNAP-1", "h1"), _entrada("TST-SNAP-2", "h2b", "paused"), _entrada("TST-SNAP-3", "h3")],
+    )
+    assert [e["sku"] for e in segundo["novos"]] == ["TST-SNAP-3"]
+    assert [snap.sku for snap, _ in segundo["alterados"]] == ["TST-SNAP-2"]
+    assert [snap.sku for snap, _ in segundo["inalterados"]] == ["TST-SNAP-1"]
+
+    db_session.expire_all()
+    alterado = get_snapshot_by_sku(db_session, "TST-SNAP-2")
+    assert (alterado.hash_conteudo, alterado.status_meli, alterado.raw_payload) == ("h2b", "paused", {"id": "TST-SNAP-2", "h": "h2b"})
+    # Inalterado: só ultima_sincronizacao_em, com o relógio do banco
+    inalterado = get_snapshot_by_sku(db_session, "TST-SNAP-1")
+    agora_banco = db_session.execute(text("SELECT timezone('utc', now())")).scalar()
+    assert inalterado.hash_conteudo == "h1" and inalterado.ultima_sincronizacao_em == agora_banco
+
+    # Modo NOVOS: existentes são ignorados mesmo com mudança
+    terceiro = apply_snapshot_batch(db_session, [_entrada("TST-SNAP-1", "outro")], ignorar_existentes=True)
+    assert len(terceiro["ignorados"]) == 1 and not terceiro["alterados"]
+    db_session.expire_all()
+    assert get_snapshot_by_sku(db_session, "TST-SNAP-1").hash_conteudo == "h1"
+
+
+def test_touch_snapshots_no_banco(db_session):
+    from app.repositories.meli_item_snapshot_repo import apply_snapshot_batch, touch_snapshots
+
+    apply_snapshot_batch(db_session, [_entrada("TST-TOUCH-1", "h1"), _entrada("TST-TOUCH-2", "h2")])
+    ids = [get_snapshot_by_sku(db_session, sku).id for sku in ("TST-TOUCH-1", "TST-TOUCH-2")]
+    assert touch_snapshots(db_session, []) == 0
+    assert touch_snapshots(db_session, ids + [-1]) == 2
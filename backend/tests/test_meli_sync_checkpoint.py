@@ -0,0 +1,183 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import meli_import_pipeline as pipeline
+from app.services import meli_paginacao_fix as pag
+from app.services import meli_sync_checkpoint as ckmod
+from app.services.meli_import_pipeline import executar_pipeline
+from app.services.meli_paginacao_fix import CursorListagem
+from app.services.meli_sync_checkpoint import CheckpointSync
+
+
+def _parse(v):
+    return datetime.strptime(v, "%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def test_janelas_retomam_da_fronteira_sem_repetir(monkeypatch):
+    base = datetime(2024, 1, 1)
+    catalog = [(f"MLB{i}", base + timedelta(minutes=i)) for i in range(2500)]
+
+    async def fake(method, endpoint, params=None, client=None):
+        start, end = _parse(params["since"]), _parse(params["until"])
+        hits = [i for i, created in catalog if start <= created < end]
+        return {"results": hits[params["offset"]:params["offset"] + params["limit"]], "paging": {"total": len(hits)}}
+
+    monkeypatch.setattr(pag, "meli_request", fake)
+
+    async def listar(cursor, paginas=None):
+        out = []
+        async for page in pag.iter_ids_por_janelas(None, "123", base, base + timedelta(days=3), cursor=cursor):
+            out.extend(page)
+            if paginas is not None and len(out) >= paginas * pag.ML_SEARCH_PAGE:
+                break
+        return out
+
+    cursor = CursorListagem()
+    primeira = asyncio.run(listar(cursor, paginas=23))
+    # Ponto de retomada serializado (como no checkpoint) e uma nova execução a partir dele
+    retomado = CursorListagem.from_dict(cursor.to_dict())
+    assert retomado.fonte == "janelas" and retomado.janelas
+    segunda = asyncio.run(listar(retomado))
+
+    ids = primeira + segunda
+    assert len(ids) == len(set(ids)) == len(catalog)
+
+
+def _fake_banco(monkeypatch):
+    # As escritas só chegam ao "banco" no commit da sessão (FakeSession.ao_commitar)
+    banco = {"gravados": [], "chunks": [], "cursor": {}, "stats": {}}
+
+    def persistir_lote(session, registros, mode, commit=True):
+        skus = [r["sku"] for r in registros]
+        session.ao_commitar(lambda: banco["gravados"].extend(skus))
+        return {"novos": len(registros), "atualizados": 0, "ignorados_sem_mudanca": 0}
+
+    def atualizar_checkpoint(session, cid, cursor, stats):
+        stats = dict(stats)
+        session.ao_commitar(lambda: banco.update(cursor=cursor, stats=stats))
+
+    monkeypatch.setattr(pipeline, "persistir_lote", persistir_lote)
+    monkeypatch.setattr(ckmod, "registrar_chunks", lambda s, cid, chunks: s.ao_commitar(lambda: banco["chunks"].extend(chunks)))
+    monkeypatch.setattr(ckmod, "atualizar_checkpoint", atualizar_checkpoint)
+    return banco
+
+
+def _fake_scan(monkeypatch, paginas, chamadas):
+    # Como na API: a posição do scroll fica no servidor. Sem scroll_id abre um scroll novo
+    # (página 0); cada chamada com o scroll_id avança uma página, seja qual for o momento
+    scrolls = {}
+
+    async def fake(method, endpoint, params=None, client=None):
+        chamadas.append(dict(params))
+        sid = params.get("scroll_id")
+        if sid is None:
+            sid = f"s{len(scrolls)}"
+            scrolls[sid] = 0
+        else:
+            scrolls[sid] += 1
+        n = scrolls[sid]
+        return {"results": paginas[n] if n < len(paginas) else [], "scroll_id": sid}
+
+    monkeypatch.setattr(pag, "meli_request", fake)
+    return scrolls
+
+
+def _multiget(buscados, falhar_em=None):
+    async def fake(ids, client=None, **kwargs):
+        if falhar_em in ids:
+            raise RuntimeError("worker morreu")
+        buscados.extend(ids)
+        await asyncio.sleep(0)
+        return [{"id": i, "title": f"Item {i}", "price": 10, "status": "active"} for i in ids]
+    return fake
+
+
+def _executar(checkpoint):
+    return asyncio.run(executar_pipeline(
+        None, pag.iter_item_id_pages(None, seller_id="123", cursor=checkpoint.cursor),
+        mode="FULL", write_batch=20, fetch_workers=2, checkpoint=checkpoint,
+    ))
+
+
+def test_sync_interrompida_retoma_sem_regravar(monkeypatch, fake_session):
+    banco = _fake_banco(monkeypatch)
+    paginas = [[f"MLB{p * 20 + i}" for i in range(20)] for p in range(10)]
+    chamadas, buscados = [], []
+    scrolls = _fake_scan(monkeypatch, paginas, chamadas)
+    fabrica = fake_session
+
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", _multiget(buscados, falhar_em="MLB130"))
+    with pytest.raises(RuntimeError):
+        _executar(CheckpointSync(1, session_factory=fabrica))
+    gravados_antes = list(banco["gravados"])
+    assert gravados_antes and len(gravados_antes) < 200
+    # O worker morreu com páginas já listadas (o scroll do servidor passou delas) e não gravadas
+    listados = {i for p in paginas[:scrolls["s0"] + 1] for i in p}
+    assert listados - set(gravados_antes)
+
+    chamadas.clear()
+    buscados.clear()
+    monkeypatch.setattr(pipeline, "fetch_items_multiget", _multiget(buscados))
+    concluidos = {i for ids in banco["chunks"] for i in ids}
+    retomada = CheckpointSync(1, banco["cursor"], banco["stats"], concluidos, session_factory=fabrica)
+    stats = _executar(retomada)
+
+    # O scan recomeça (scroll novo) em vez de continuar o antigo, e só busca o que falta
+    assert "scroll_id" not in chamadas[0]
+    assert not set(buscados) & concluidos
+    assert sorted(banco["gravados"]) == sorted(i for p in paginas for i in p)
+    assert len(banco["gravados"]) == len(set(banco["gravados"]))
+    assert stats["novos"] == 200 and stats["listados"] == 200
+    assert banco["cursor"]["concluida"] is True
+
+
+def test_fronteira_so_avanca_com_paginas_anteriores_completas():
+    ck = CheckpointSync(1)
+    ck.cursor.marcar_scroll("s1")
+    p1 = ck.pagina_listada(2)
+    ck.cursor.marcar_scroll("s2")
+    p2 = ck.pagina_listada(1)
+
+    assert ck._avancar([(p2, ["B"], 1)])["scroll_id"] is None
+    assert ck._avancar([(p1, ["A1"], 1)])["scroll_id"] is None
+    assert ck._avancar([(p1, ["A2"], 1)])["scroll_id"] == "s2"
+
+
+def _task(task_id):
+    def retry(**kwargs):
+        return RuntimeError(f"retry {kwargs['countdown']}")
+    return SimpleNamespace(request=SimpleNamespace(id=task_id), retry=retry)
+
+
+def test_mensagem_reentregue_e_idempotente(monkeypatch):
+    from app.workers import celery_tasks
+
+    job = SimpleNamespace(id=1, status="running", task_id=None)
+    agora = datetime.utcnow()
+    concluido = SimpleNamespace(id=7, status="concluido", task_ids=["t1"])
+    aberto = SimpleNamespace(id=8, job_id=2, status="em_andamento", task_ids=["t2"], atualizado_em=agora, stats={})
+    finalizados = []
+    monkeypatch.setattr(celery_tasks, "checkpoint_da_task", lambda s, t: concluido if t == "t1" else None)
+    monkeypatch.setattr(celery_tasks, "checkpoint_aberto", lambda s, m: aberto)
+    monkeypatch.setattr(celery_tasks, "abrir_checkpoint", lambda s, j, m, t: aberto)
+    monkeypatch.setattr(celery_tasks, "get_job", lambda s, i: SimpleNamespace(id=i, status="running"))
+    monkeypatch.setattr(celery_tasks.sync_scheduler, "finalizar", lambda s, j, st, erro=None: finalizados.append((j.id, st)))
+    monkeypatch.setattr(celery_tasks.CheckpointSync, "carregar", classmethod(lambda cls, s, reg: ("retomado", reg.id)))
+
+    # Execução já concluída: no-op com sucesso (e o job é fechado se o worker morreu antes)
+    assert celery_tasks._abrir_execucao(_task("t1"), None, job, "FULL", "X") == (None, True)
+    assert finalizados == [(1, "done")]
+    # Job já encerrado: a mensagem não roda de novo
+    assert celery_tasks._abrir_execucao(_task("t3"), None, SimpleNamespace(id=3, status="error", task_id=None), "FULL", "X") == (None, False)
+    # Outro job ativo no mesmo modo: não roda em paralelo
+    assert celery_tasks._abrir_execucao(_task("t3"), None, job, "FULL", "X") == (None, False)
+    assert finalizados[-1] == (1, "error")
+    # A própria mensagem reentregue enquanto a execução pode estar viva: tenta de novo depois
+    with pytest.raises(RuntimeError, match="retry"):
+        celery_tasks._abrir_execucao(_task("t2"), None, job, "FULL", "X")
+    # Sem commit há mais que o prazo: o worker morreu, a mensagem retoma o checkpoint
+    aberto.atualizado_em = agora - timedelta(hours=1)
+    assert celery_tasks._abrir_execucao(_task("t3"), None, job, "FULL", "X") == (("retomado", 8), None)
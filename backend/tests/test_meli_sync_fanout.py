@@ -0,0 +1,106 @@
+import asyncio
+
+from app.repositories import meli_full_sync_job_repo as job_repo
+from app.repositories import meli_sync_checkpoint_repo as ck_repo
+from app.services import meli_import_pipeline as pipeline
+from app.services import meli_paginacao_fix as pag
+from app.services import meli_rate_limiter as mrl
+from app.services import meli_sync_fanout as fanout
+from app.services.meli_sync_checkpoint import CheckpointSync
+
+
+def test_listar_shards_pula_ids_gravados_e_respeita_limite(monkeypatch):
+    paginas = [[f"MLB{p * 100 + i}" for i in range(100)] for p in range(5)]
+
+    async def fake(method, endpoint, params=None, client=None):
+        n = int(params["scroll_id"][1:]) if "scroll_id" in params else 0
+        return {"results": paginas[n] if n < len(paginas) else [], "scroll_id": f"s{n + 1}"}
+
+    monkeypatch.setattr(pag, "meli_request", fake)
+    ck = CheckpointSync(1, concluidos={f"MLB{i}" for i in range(150)})
+    shards = asyncio.run(fanout.listar_shards(ck, tamanho=60, client=object()))
+    ids = [i for s in shards for i in s]
+    assert ids == [f"MLB{i}" for i in range(150, 500)]
+    assert [len(s) for s in shards] == [60] * 5 + [50]
+
+    ck = CheckpointSync(1, stats={"listados": 100})
+    shards = asyncio.run(fanout.listar_shards(ck, tamanho=60, limit=220, client=object()))
+    assert sum(len(s) for s in shards) == 120
+
+
+def _fakes(monkeypatch, registrado=False, inseridos=1):
+    chamadas = {"buscar": 0, "progresso": [], "checkpoint": [], "notificado": 0}
+    monkeypatch.setattr(fanout, "chunk_registrado", lambda s, cid, ids: registrado)
+    monkeypatch.setattr(fanout, "registrar_chunks", lambda s, cid, chunks: inseridos)
+    monkeypatch.setattr(fanout, "somar_stats_checkpoint", lambda s, cid, st: chamadas["checkpoint"].append(st))
+    monkeypatch.setattr(fanout, "somar_progresso", lambda s, jid, st: chamadas["progresso"].append(st))
+    monkeypatch.setattr(fanout, "notificar_progresso", lambda s, jid: chamadas.__setitem__("notificado", chamadas["notificado"] + 1))
+    monkeypatch.setattr(pipeline, "persistir_lote", lambda s, regs, mode, commit=True: {"novos": 2, "atualizados": 1, "ignorados_sem_mudanca": len(regs) - 3})
+
+    async def buscar(ids, mode):
+        chamadas["buscar"] += 1
+        return [{"sku": i} for i in ids], len(ids)
+
+    return chamadas, buscar
+
+
+def test_shard_grava_e_soma_contadores_na_mesma_transacao(monkeypatch, fake_session):
+    sessao = fake_session()
+    chamadas, buscar = _fakes(monkeypatch)
+    stats = fanout.processar_shard(1, 9, ["A", "B", "C", "D"], session_factory=lambda: sessao, buscar=buscar)
+
+    assert stats == {"novos": 2, "atualizados": 1, "ignorados_sem_mudanca": 1, "listados": 4, "fetched": 4, "lotes": 1}
+    assert chamadas["progresso"] == chamadas["checkpoint"] == [stats]
+    assert sessao.log == ["commit"] and chamadas["notificado"] == 1
+
+
+def test_shard_repetido_nao_busca_nem_conta(monkeypatch, fake_session):
+    sessao = fake_session()
+    chamadas, buscar = _fakes(monkeypatch, registrado=True)
+    assert fanout.processar_shard(1, 9, ["A"], session_factory=lambda: sessao, buscar=buscar) == {"duplicado": 1}
+    assert chamadas["buscar"] == 0 and sessao.log == []
+
+    # Corrida: outro worker registrou o chunk enquanto este buscava
+    chamadas, buscar = _fakes(monkeypatch, inseridos=0)
+    assert fanout.processar_shard(1, 9, ["A", "B", "C"], session_factory=lambda: sessao, buscar=buscar) == {"duplicado": 1}
+    assert sessao.log == ["rollback"] and chamadas["progresso"] == []
+
+
+def test_somar_resultados_do_chord():
+    base = {"listados": 100, "fetched": 100, "novos": 10}
+    total = fanout.somar_resultados(
+        [{"listados": 50, "fetched": 49, "novos": 5, "atualizados": 2, "lotes": 1}, {"duplicado": 1}, {"erro": "boom", "ids": 50}, None],
+        base,
+    )
+    assert total["listados"] == 150 and total["fetched"] == 149 and total["novos"] == 15 and total["atualizados"] == 2
+    assert total["shards"] == 1 and total["shards_duplicados"] == 1 and total["shards_com_erro"] == 2
+
+
+def test_incrementos_atomicos_no_banco(db_session):
+    from app.models.meli_full_sync_job import MeliFullSyncJob
+    from app.models.meli_sync_checkpoint import MeliSyncCheckpoint
+
+    job = MeliFullSyncJob(tipo="full", status="running", processados=10, novos=1)
+    db_session.add(job)
+    db_session.flush()
+    ck = MeliSyncCheckpoint(job_id=job.id, modo="FULL", stats={"novos": 1, "listados": 100})
+    db_session.add(ck)
+    db_session.commit()
+
+    # Dois shards somando: nada é sobrescrito, chaves novas entram no JSON
+    for _ in range(2):
+        ck_repo.somar_stats_checkpoint(db_session, ck.id, {"novos": 2, "fetched": 4})
+        job_repo.somar_progresso(db_session, job.id, {"fetched": 4, "novos": 2})
+    db_session.commit()
+    db_session.expire_all()
+
+    assert db_session.get(MeliSyncCheckpoint, ck.id).stats == {"novos": 5, "listados": 100, "fetched": 8}
+    job = db_session.get(MeliFullSyncJob, job.id)
+    assert (job.processados, job.novos) == (18, 5)
+
+
+def test_shards_dividem_o_balde_do_redis(monkeypatch):
+    local = mrl.TokenBucketLimiter(rate_per_minute=600, burst=10, max_in_flight=4)
+    monkeypatch.setattr(mrl, "_limiter", local)
+    assert mrl.usar_orcamento_compartilhado() is local
+    assert local.redis_key == mrl.REDIS_KEY
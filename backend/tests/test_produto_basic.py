@@ -22,4 +22,23 @@ def test_crud_produto_basic():
     rlist = client.get("/estoque")
     assert rlist.status_code == 200
     items = rlist.json()["items"]
-    assert any(it["sku"] == sku for it in items)
\ No newline at end of file
+    assert any(it["sku"] == sku for it in items)
+
+def test_bulk_upsert_produtos_no_banco(db_session):
+    from sqlmodel import select
+    from app.models.produto import Produto
+    from app.repositories.produto_repo import bulk_upsert_produtos
+
+    rows = [{"sku": f"TST-UPS-{i}", "titulo": f"T{i}", "preco": 1.0, "imagens": ["a.jpg"]} for i in range(5)]
+    assert bulk_upsert_produtos(db_session, rows, chunk_size=3) == {"inseridos": 5, "atualizados": 0, "inalterados": 0}
+
+    # Repetido na entrada vale a última ocorrência; linha sem mudança não é reescrita
+    rows = rows[:3] + [{"sku": "TST-UPS-0", "titulo": "T0b", "preco": 1.0}, {"sku": "TST-UPS-9", "titulo": "Novo"}]
+    assert bulk_upsert_produtos(db_session, rows, chunk_size=3) == {"inseridos": 1, "atualizados": 1, "inalterados": 2}
+
+    db_session.expire_all()
+    produtos = {p.sku: p for p in db_session.exec(select(Produto).where(Produto.sku.like("TST-UPS-%"))).all()}
+    assert len(produtos) == 6
+    # imagens ausente mantém as atuais
+    assert produtos["TST-UPS-0"].titulo == "T0b" and produtos["TST-UPS-0"].imagens == ["a.jpg"]
+    assert produtos["TST-UPS-1"].updated_at == produtos["TST-UPS-1"].created_at
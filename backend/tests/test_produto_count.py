@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session
+
+from app.repositories import produto_count_repo as repo
+from app.repositories.produto_repo import bulk_upsert_produtos, filtros_produto
+
+
+def _consulta(stmt) -> str:
+    if isinstance(stmt, str):
+        return "explain"
+    return "count" if hasattr(stmt, "selected_columns") else "reltuples"
+
+
+def _sessao(fake_session, exato=7, reltuples=120000, plan_rows=80000):
+    """Responde count(*), reltuples e EXPLAIN com os valores (mutáveis) da própria sessão."""
+    def responder(stmt, params):
+        consulta = _consulta(stmt)
+        if consulta == "explain":
+            assert stmt.startswith("EXPLAIN (FORMAT JSON) SELECT produto.id")
+            return [[{"Plan": {"Plan Rows": sessao.plan_rows}}]]
+        return [sessao.reltuples if consulta == "reltuples" else sessao.exato]
+
+    sessao = fake_session(responder)
+    sessao.exato, sessao.reltuples, sessao.plan_rows = exato, reltuples, plan_rows
+    return sessao
+
+
+def _consultas(sessao):
+    return [_consulta(stmt) for stmt, _ in sessao.statements]
+
+
+@pytest.fixture(autouse=True)
+def _cache_limpo():
+    repo.invalidar_contagens()
+    yield
+    repo.invalidar_contagens()
+
+
+def test_chave_normaliza_filtros():
+    assert repo.chave_contagem(search="  Filtro   AR ", status="ativo") == repo.chave_contagem(search="filtro ar", status="ATIVO")
+    assert repo.chave_contagem(origem="", search="  ") == repo.chave_contagem()
+
+
+def test_estimativa_para_listagens_amplas_e_exato_para_pequenas(fake_session):
+    session = _sessao(fake_session)
+    assert repo.contar_produtos(session, [], repo.chave_contagem()) == (120000, False)
+    assert _consultas(session) == ["reltuples"]
+
+    filtros = filtros_produto(origem="MERCADO_LIVRE")
+    chave = repo.chave_contagem(origem="MERCADO_LIVRE")
+    assert repo.contar_produtos(session, filtros, chave) == (80000, False)
+
+    # Estimativa abaixo do limiar: count(*) exato
+    session = _sessao(fake_session, plan_rows=40)
+    filtros = filtros_produto(status="ATIVO")
+    assert repo.contar_produtos(session, filtros, repo.chave_contagem(status="ATIVO")) == (7, True)
+    assert _consultas(session) == ["explain", "count"]
+
+    # Tabela nunca analisada (reltuples = -1): count(*) exato
+    repo.invalidar_contagens()
+    session = _sessao(fake_session, reltuples=-1)
+    assert repo.contar_produtos(session, [], repo.chave_contagem(), estimar=True) == (7, True)
+
+
+def test_cache_e_invalidacao_por_escrita(fake_session):
+    session = _sessao(fake_session)
+    filtros = filtros_produto(status="ATIVO")
+    chave = repo.chave_contagem(status="ATIVO")
+    assert repo.contar_produtos(session, filtros, chave, estimar=False) == (7, True)
+    session.exato = 8
+    assert repo.contar_produtos(session, filtros, chave, estimar=False) == (7, True)
+    assert _consultas(session) == ["count"]
+
+    bulk_upsert_produtos(_UpsertSession(), [{"sku": "A1", "titulo": "Novo"}])
+    assert repo.contar_produtos(session, filtros, chave, estimar=False) == (8, True)
+
+
+def test_ajuste_de_estoque_invalida_contagens(fake_session):
+    from app.models.produto import Produto
+    from app.repositories.produto_repo import update_stock
+
+    session = _sessao(fake_session)
+    chave = repo.chave_contagem()
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (7, True)
+    session.exato = 8
+
+    escrita = fake_session(lambda stmt, params: [Produto(sku="A1", titulo="A", estoque_atual=1)])
+    assert update_stock(escrita, "A1", 5).estoque_atual == 5
+    assert escrita.commits == 1
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (8, True)
+
+
+class _UpsertSession(Session):
+    """Sessão sem banco: o upsert devolve uma linha inserida; commit/rollback disparam os eventos reais."""
+
+    def execute(self, stmt, *args, **kw):
+        if not self.in_transaction():
+            self.begin()
+        return iter([(True,)])
+
+
+def test_upsert_sem_commit_invalida_so_apos_o_commit(fake_session):
+    session = _sessao(fake_session)
+    chave = repo.chave_contagem()
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (7, True)
+    session.exato = 8
+
+    upsert = _UpsertSession()
+    bulk_upsert_produtos(upsert, [{"sku": "A1"}], commit=False)
+    # Transação ainda aberta: o total em cache continua valendo
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (7, True)
+    upsert.commit()
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (8, True)
+
+    # Rollback descarta a marca: o próximo commit (de outra coisa) não invalida
+    session.exato = 9
+    bulk_upsert_produtos(upsert, [{"sku": "A1"}], commit=False)
+    upsert.rollback()
+    upsert.commit()
+    assert repo.contar_produtos(session, [], chave, estimar=False) == (8, True)
+
+
+def test_ttl_zero_desliga_cache(monkeypatch, fake_session):
+    monkeypatch.setattr(repo, "get_settings", lambda: SimpleNamespace(ESTOQUE_COUNT_CACHE_TTL=0, ESTOQUE_COUNT_ESTIMATE_MIN=50000))
+    session = _sessao(fake_session)
+    repo.contar_produtos(session, [], (), estimar=False)
+    repo.contar_produtos(session, [], (), estimar=False)
+    assert _consultas(session) == ["count", "count"]
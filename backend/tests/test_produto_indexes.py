@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from sqlalchemy import asc, desc, text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from app.core.db_schema import LISTAGEM_DDL
+from app.models.produto import Produto
+from app.repositories.produto_repo import COLUNAS_ORDENACAO, coluna_ordenacao, filtros_produto
+
+
+# (filtros, coluna, direção): combinações usadas pela tela de estoque e pelos jobs
+CASOS = [
+    ({}, "created_at", "desc"),
+    ({}, "updated_at", "desc"),
+    ({}, "preco", "asc"),
+    ({}, "sku", "asc"),
+    ({}, "sku", "desc"),
+    ({"origem": "MERCADO_LIVRE"}, "created_at", "desc"),
+    ({"origem": "MERCADO_LIVRE", "status": "ATIVO"}, "created_at", "desc"),
+    ({"origem": "MERCADO_LIVRE", "status": "PAUSADO"}, "created_at", "asc"),
+    ({"status": "PAUSADO"}, "updated_at", "desc"),
+    ({"status": "ATIVO"}, "created_at", "desc"),
+    ({"status": "ATIVO"}, "preco", "desc"),
+]
+
+
+def _node_types(plano) -> list:
+    tipos = [plano["Node Type"]]
+    for filho in plano.get("Plans", []):
+        tipos.extend(_node_types(filho))
+    return tipos
+
+
+def test_whitelist_de_ordenacao():
+    assert coluna_ordenacao("preco") is Produto.preco
+    for invalida in ("titulo", "descricao", "__class__", "id; drop"):
+        with pytest.raises(ValueError):
+            coluna_ordenacao(invalida)
+
+
+def test_listagens_comuns_usam_indice(db_session):
+    conn = db_session.connection()
+    for ddl in LISTAGEM_DDL:
+        conn.execute(text(ddl))
+    # Com seqscan desligado, um Seq Scan no plano significa que não há índice utilizável
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    for filtros, coluna, direcao in CASOS:
+        assert coluna in COLUNAS_ORDENACAO
+        col = coluna_ordenacao(coluna)
+        ordem = (desc(col), desc(Produto.id)) if direcao == "desc" else (asc(col), asc(Produto.id))
+        query = select(Produto.id).where(*filtros_produto(**filtros)).order_by(*ordem).limit(50)
+        compiled = query.compile(dialect=postgresql.dialect())
+        plano = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        tipos = _node_types(plano[0]["Plan"])
+        assert "Seq Scan" not in tipos, (filtros, coluna, direcao, tipos)
+        # Incremental Sort: o índice cobre só o prefixo da ordenação (ex.: sku sem id)
+        assert not {"Sort", "Incremental Sort"} & set(tipos), (filtros, coluna, direcao, tipos)
+
+
+def test_ddl_extra_so_no_startup_da_api(monkeypatch):
+    from contextlib import nullcontext
+    from types import SimpleNamespace
+
+    from app.core import database, db_schema
+
+    aplicados = []
+    conn = SimpleNamespace(execute=lambda stmt: None)
+    monkeypatch.setattr(database, "engine", SimpleNamespace(connect=lambda: nullcontext(conn)))
+    monkeypatch.setattr(database.SQLModel.metadata, "create_all", lambda bind: None)
+    monkeypatch.setattr(db_schema, "ensure_schema_extras", aplicados.append)
+
+    # Cada task do Celery chama init_db(): sem ALTER TABLE (ACCESS EXCLUSIVE em produto)
+    database.init_db()
+    assert aplicados == []
+    database.init_db(schema_extras=True)
+    assert aplicados == [database.engine]
@@ -0,0 +1,52 @@
+from sqlalchemy.dialects import postgresql
+
+from app.repositories.produto_repo import filtros_produto
+from app.repositories.produto_search_repo import filtro_busca, forma_busca, rank_busca, tsquery_prefixo
+
+
+def _sql(clause):
+    compiled = clause.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def test_forma_busca_e_tsquery():
+    assert forma_busca("ab") == "curta"
+    assert forma_busca("MLB123456") == "sku"
+    assert forma_busca("AB-12") == "sku"
+    assert forma_busca("filtro de ar") == "texto"
+    assert forma_busca("pastilha") == "texto"
+    assert tsquery_prefixo("Filtro  de Ar!") == "filtro:* & de:* & ar:*"
+    assert tsquery_prefixo("a & b | !c") == "a:* & b:* & c:*"
+    assert tsquery_prefixo("&|!") is None
+
+
+def test_filtro_busca_por_forma():
+    sku, params = _sql(filtro_busca("MLB123"))
+    assert "lower(produto.sku) LIKE" in sku and "@@" not in sku
+    assert params["lower_1"] == "mlb123%"
+
+    texto, params = _sql(filtro_busca("filtro ar"))
+    assert "produto.busca_tsv @@ to_tsquery" in texto and "produto.titulo ILIKE" in texto
+    assert params["to_tsquery_1"] == "portuguese"
+    assert params["to_tsquery_2"] == "filtro:* & ar:*"
+
+    curta, params = _sql(filtro_busca("ab"))
+    assert "@@ to_tsquery" in curta and "lower(produto.sku) LIKE" in curta
+    assert params["lower_1"] == "ab%"
+
+    # sem o schema de busca: ILIKE simples, com curingas do termo escapados
+    fallback, params = _sql(filtro_busca("50%_off", indexada=False))
+    assert "@@" not in fallback
+    assert "produto.sku ILIKE" in fallback and "produto.titulo ILIKE" in fallback
+    assert params["sku_1"] == "%50\\%\\_off%"
+
+
+def test_rank_e_filtros_produto():
+    rank, _ = _sql(rank_busca("filtro ar"))
+    assert "similarity(produto.titulo" in rank and "ts_rank_cd(produto.busca_tsv" in rank
+    assert "similarity" not in _sql(rank_busca("filtro ar", indexada=False))[0]
+
+    filtros = filtros_produto(origem="MERCADO_LIVRE", search="  filtro ar ", busca_indexada=True)
+    assert len(filtros) == 2
+    assert "@@ to_tsquery" in _sql(filtros[1])[0]
+    assert filtros_produto(search="   ") == []
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import response_cache
+
+
+@pytest.fixture
+def redis(monkeypatch, fake_redis):
+    monkeypatch.setattr(response_cache, "_redis", lambda: fake_redis)
+    monkeypatch.setattr(response_cache, "_contadores", response_cache.Counter())
+    return fake_redis
+
+
+def test_hit_miss_e_invalidacao_por_tag(redis):
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return f'{{"n": {len(chamadas)}}}'
+
+    assert response_cache.obter("estoque", ("page=1",), ("produto",), 30, calcular) == '{"n": 1}'
+    assert response_cache.obter("estoque", ("page=1",), ("produto",), 30, calcular) == '{"n": 1}'
+    assert response_cache.obter("estoque", ("page=2",), ("produto",), 30, calcular) == '{"n": 2}'
+    assert len(chamadas) == 2
+
+    response_cache.invalidar("outra_tag")
+    assert response_cache.obter("estoque", ("page=1",), ("produto",), 30, calcular) == '{"n": 1}'
+    response_cache.invalidar("produto")
+    assert response_cache.obter("estoque", ("page=1",), ("produto",), 30, calcular) == '{"n": 3}'
+
+    metricas = response_cache.metricas()
+    assert metricas["processo"] == {"estoque:miss": 3, "estoque:hit": 2}
+    assert metricas["global"] == {"estoque:miss": 3, "estoque:hit": 2}
+    # Nenhum lock ficou para trás
+    assert not [k for k in redis.data if k.endswith(":lock")]
+
+
+def test_single_flight(redis):
+    chamadas = []
+    inicio = threading.Event()
+
+    def calcular():
+        chamadas.append(1)
+        inicio.set()
+        time.sleep(0.2)
+        return "valor"
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(response_cache.obter("s", (), (), 5, calcular))) for _ in range(5)]
+    threads[0].start()
+    inicio.wait(1)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert resultados == ["valor"] * 5
+    assert len(chamadas) == 1
+
+
+def test_erro_libera_lock_e_nao_grava(redis):
+    async def falha():
+        raise RuntimeError("ML fora")
+
+    async def ok():
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(response_cache.obter_async("amostra", (5,), ("meli_items",), 60, falha))
+    assert asyncio.run(response_cache.obter_async("amostra", (5,), ("meli_items",), 60, ok)) == "ok"
+
+
+def test_sem_redis_calcula_direto(monkeypatch):
+    monkeypatch.setattr(response_cache, "get_settings", lambda: SimpleNamespace(RESPONSE_CACHE_ENABLED=False))
+    assert response_cache.obter("x", (), ("produto",), 5, lambda: "direto") == "direto"
+    response_cache.invalidar("produto")
@@ -0,0 +1,177 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import sync_lock, sync_scheduler
+
+
+@pytest.fixture
+def redis(monkeypatch, fake_redis):
+    monkeypatch.setattr(sync_lock, "_redis", lambda: fake_redis)
+    return fake_redis
+
+
+def test_lease_exclusivo_por_job(redis):
+    a, b = sync_lock.lease_do_job("catalogo", 1, ttl=60), sync_lock.lease_do_job("catalogo", 1, ttl=60)
+    assert a.adquirir() and a.ativo
+    # Reentrega da mesma mensagem enquanto a primeira vive
+    assert not b.adquirir()
+    # Outro job da mesma classe não disputa o lease (as vagas são do scheduler)
+    assert sync_lock.lease_do_job("catalogo", 2).adquirir()
+    assert sync_lock.lease_ocupado("catalogo", 1) and not sync_lock.lease_ocupado("catalogo", 3)
+
+    with a:
+        pass
+    assert b.adquirir()
+    # O lease vencido e tomado por outro não é apagado pelo antigo dono
+    a.ativo = True
+    a.liberar()
+    assert redis.get(b.chave) == b.token
+
+
+def test_dois_jobs_da_classe_com_limite_dois(redis, monkeypatch, fake_session):
+    from app.models.meli_full_sync_job import MeliFullSyncJob
+    from app.workers import celery_tasks
+
+    monkeypatch.setattr(sync_scheduler, "get_settings", lambda: SimpleNamespace(ML_SYNC_LIMITE_CATALOGO=2))
+    fila = [MeliFullSyncJob(id=i, tipo=tipo, status="queued", params={}) for i, tipo in ((1, "full"), (2, "todos_status"))]
+
+    def responder(stmt, params):
+        nomes = [d["name"] for d in getattr(stmt, "column_descriptions", [])]
+        return list(fila) if nomes == ["MeliFullSyncJob"] else None
+
+    enviados = []
+    assert sync_scheduler.despachar(fake_session(responder), enviados.append) == fila == enviados
+
+    def task(tag):
+        def retry(**kwargs):
+            return RuntimeError(f"retry {tag}")
+        return SimpleNamespace(retry=retry)
+
+    # Cada job despachado pega o seu lease: nenhum fica em retry ocupando a vaga
+    leases = [celery_tasks._obter_lease(task(job.id), job, "X") for job in fila]
+    assert all(lease.ativo for lease in leases) and leases[0].chave != leases[1].chave
+    # Só a reentrega de um job ainda vivo espera
+    with pytest.raises(RuntimeError, match="retry 1"):
+        celery_tasks._obter_lease(task(1), fila[0], "X")
+
+
+def test_heartbeat_renova_e_detecta_perda(redis):
+    lease = sync_lock.Lease("catalogo", ttl=60)
+    assert lease.adquirir()
+    redis.prazos[lease.chave] = 0
+    assert lease.renovar() and redis.prazos[lease.chave] == 60000
+
+    # Venceu e outra execução assumiu: o pipeline para na próxima gravação de progresso
+    redis.data[lease.chave] = "outro"
+    assert not lease.renovar() and lease.perdido
+    with pytest.raises(sync_lock.LeasePerdido):
+        lease.verificar()
+
+
+def test_lease_transferido_fica_para_o_chord(redis):
+    lease = sync_lock.lease_do_job("catalogo", 5, ttl=60)
+    assert lease.adquirir()
+    with lease:
+        token = lease.transferir(ttl=900)
+    # Espera dos shards na fila: o prazo passa a ser o do fan-out
+    assert redis.get(lease.chave) == token and redis.prazos[lease.chave] == 900000
+
+    redis.prazos[lease.chave] = 0
+    with sync_lock.lease_recebido("catalogo", 5, token) as shard:
+        # Renova ao entrar e mantém a thread de heartbeat enquanto o shard roda
+        assert redis.prazos[lease.chave] == sync_lock.fanout_ttl() * 1000
+        assert shard._thread is not None and shard._thread.is_alive()
+    assert not shard._thread.is_alive()
+    # A saída do shard não libera: o callback do chord é quem libera
+    assert redis.get(lease.chave) == token
+    sync_lock.liberar_token("catalogo", 5, token)
+    assert redis.get(lease.chave) is None
+
+
+def test_sem_redis_segue_sem_lease(monkeypatch):
+    monkeypatch.setattr(sync_lock, "_redis", lambda: None)
+    lease = sync_lock.Lease("catalogo")
+    assert lease.adquirir() and not lease.ativo
+    assert sync_lock.reservar_pedido("full", {}) is None
+
+
+def test_pedidos_iguais_caem_no_mesmo_job(redis, monkeypatch, fake_session):
+    jobs = {}
+    criados = []
+
+    def enfileirar(session, tipo, params, enviar=None):
+        job = SimpleNamespace(id=len(criados) + 1, tipo=tipo, params=params, status="queued")
+        criados.append(job)
+        jobs[job.id] = job
+        return job
+
+    monkeypatch.setattr(sync_scheduler, "enfileirar", enfileirar)
+    sessao = fake_session(objetos=jobs)
+
+    primeiro = sync_scheduler.solicitar(sessao, "incremental", {"hours": 6})
+    # Beat de novo com o job ainda na fila ou rodando: nada de um segundo job
+    primeiro.status = "running"
+    assert sync_scheduler.solicitar(sessao, "incremental", {"hours": 6}) is primeiro
+    assert sync_scheduler.solicitar(sessao, "incremental", {"hours": 24}) is not primeiro
+    assert len(criados) == 2
+
+    # Job encerrado libera a chave (finalizar) e o próximo pedido cria outro
+    primeiro.status = "done"
+    sync_lock.liberar_pedido("incremental", {"hours": 6}, primeiro.id)
+    assert sync_scheduler.solicitar(sessao, "incremental", {"hours": 6}).id == 3
+
+    # Chave órfã (job encerrado sem passar por finalizar) não prende os pedidos
+    jobs[3].status = "error"
+    assert sync_scheduler.solicitar(sessao, "incremental", {"hours": 6}).id == 4
+
+
+def test_reserva_presa_cai_no_job_aberto_do_banco(redis, monkeypatch, fake_session):
+    monkeypatch.setattr(sync_lock, "_RESERVA_TTL", 0.1)
+    # Outro processo reservou o pedido e ainda não registrou o job
+    redis.set(sync_lock.chave_pedido("incremental", {"hours": 6}), sync_lock._RESERVADO)
+    assert sync_lock.reservar_pedido("incremental", {"hours": 6}) is sync_lock.EM_CRIACAO
+
+    rodando = SimpleNamespace(id=7, tipo="incremental", params={"hours": 6}, status="running")
+    criados = []
+    monkeypatch.setattr(sync_scheduler, "enfileirar", lambda s, tipo, params, enviar=None: criados.append(tipo) or SimpleNamespace(id=8, status="queued"))
+
+    def sessao(fila):
+        return fake_session(lambda stmt, params: fila)
+
+    # O job do outro processo já saiu da fila: também vale o que está rodando
+    assert sync_scheduler.solicitar(sessao([rodando]), "incremental", {"hours": 6}) is rodando
+    assert criados == []
+
+    # Nada aberto no banco: cria, mas a reserva continua de quem a tem
+    assert sync_scheduler.solicitar(sessao([]), "incremental", {"hours": 6}).id == 8
+    assert redis.get(sync_lock.chave_pedido("incremental", {"hours": 6})) == sync_lock._RESERVADO
+
+
+def test_checkpoint_de_outro_job_vivo_nao_e_retomado(redis, monkeypatch):
+    from datetime import datetime
+
+    from app.workers import celery_tasks
+
+    aberto = SimpleNamespace(id=8, job_id=2, status="em_andamento", task_ids=["t2"], atualizado_em=datetime.utcnow(), stats={})
+    finalizados = []
+    monkeypatch.setattr(celery_tasks, "checkpoint_da_task", lambda s, t: None)
+    monkeypatch.setattr(celery_tasks, "checkpoint_aberto", lambda s, m: aberto)
+    monkeypatch.setattr(celery_tasks, "abrir_checkpoint", lambda s, j, m, t: aberto)
+    monkeypatch.setattr(celery_tasks, "get_job", lambda s, i: SimpleNamespace(id=i, status="running"))
+    monkeypatch.setattr(celery_tasks.sync_scheduler, "finalizar", lambda s, j, st, erro=None: finalizados.append((j.id, st)))
+    monkeypatch.setattr(celery_tasks.CheckpointSync, "carregar", classmethod(lambda cls, s, reg: ("retomado", reg.id)))
+
+    job = SimpleNamespace(id=1, tipo="full", status="running", task_id=None)
+    task = SimpleNamespace(request=SimpleNamespace(id="t1"))
+    meu = sync_lock.lease_do_job("catalogo", 1)
+    assert meu.adquirir()
+    outro = sync_lock.lease_do_job("catalogo", 2)
+    assert outro.adquirir()
+
+    # O dono do checkpoint (job 2) renova o lease dele: ter o nosso não basta para retomar
+    assert celery_tasks._abrir_execucao(task, None, job, "FULL", "X", lease=meu) == (None, False)
+    assert finalizados == [(1, "error")]
+    # Lease do dono vencido: execução morta, retoma na hora
+    outro.liberar()
+    assert celery_tasks._abrir_execucao(task, None, job, "FULL", "X", lease=meu) == (("retomado", 8), None)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import sync_progress
+
+
+def _job(**kw):
+    base = dict(
+        id=1, tipo="full", status="running", total_previsto=100, processados=10, novos=4, atualizados=1, ignorados=5,
+        offset_atual=50, batch_tamanho=300, started_at=datetime(2025, 1, 1, 8, 0, 0), finished_at=None, error_message=None,
+    )
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+class _FakePubSub:
+    def __init__(self, mensagens):
+        self.mensagens = list(mensagens)
+        self.canais = []
+        self.fechado = False
+
+    async def subscribe(self, canal):
+        self.canais.append(canal)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        if self.mensagens:
+            return {"type": "message", "data": self.mensagens.pop(0)}
+        await asyncio.sleep(0)
+        return None
+
+    async def aclose(self):
+        self.fechado = True
+
+
+class _FakeAsyncRedis:
+    def __init__(self, mensagens, ultimo=None, falhar=False):
+        self.ps = _FakePubSub(mensagens)
+        self.ultimo = ultimo
+        self.falhar = falhar
+
+    def pubsub(self):
+        return self.ps
+
+    async def get(self, chave):
+        if self.falhar:
+            raise ConnectionError("redis fora")
+        return self.ultimo
+
+    async def aclose(self):
+        pass
+
+
+def _desconectar_apos(n):
+    chamadas = {"n": 0}
+
+    async def desconectado():
+        chamadas["n"] += 1
+        return chamadas["n"] > n
+
+    return desconectado
+
+
+async def _coletar(gen):
+    return [e async for e in gen]
+
+
+def test_publicar_progresso(monkeypatch, fake_redis):
+    import app.core.redis_client as redis_client
+    monkeypatch.setattr(redis_client, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(sync_progress, "_redis_failed_at", 0.0)
+    sync_progress.publicar_progresso(_job())
+    assert [canal for canal, _ in fake_redis.publicados] == [sync_progress.CANAL]
+    assert fake_redis.get(sync_progress.ULTIMO) == fake_redis.publicados[0][1]
+    payload = json.loads(fake_redis.publicados[0][1])
+    assert payload["job_id"] == 1 and payload["processados"] == 10 and payload["started_at"] == "2025-01-01T08:00:00"
+
+
+def test_stream_sse_com_pubsub():
+    redis = _FakeAsyncRedis(['{"status": "running", "processados": 20}'], ultimo='{"status": "running", "processados": 10}')
+    eventos = asyncio.run(_coletar(sync_progress.eventos_progresso(
+        _desconectar_apos(3), heartbeat=0, abrir_redis=lambda: redis, snapshot=lambda: pytest.fail("sem leitura do banco"),
+    )))
+    assert eventos[0] == "retry: 5000\n\n"
+    assert eventos[1] == 'event: progresso\ndata: {"status": "running", "processados": 10}\n\n'
+    assert eventos[2] == 'event: progresso\ndata: {"status": "running", "processados": 20}\n\n'
+    assert ": ping\n\n" in eventos[3:]
+    assert redis.ps.canais == [sync_progress.CANAL] and redis.ps.fechado
+
+
+def test_stream_sem_redis_cai_para_polling(monkeypatch):
+    async def _sem_espera(_):
+        return None
+
+    monkeypatch.setattr(sync_progress.asyncio, "sleep", _sem_espera)
+    estados = iter(['{"status": "running"}', '{"status": "running"}', '{"status": "done"}'])
+    eventos = asyncio.run(_coletar(sync_progress.eventos_progresso(
+        _desconectar_apos(3), heartbeat=0, abrir_redis=lambda: _FakeAsyncRedis([], falhar=True), snapshot=lambda: next(estados),
+    )))
+    assert eventos[1:] == [
+        'event: progresso\ndata: {"status": "running"}\n\n',
+        ": ping\n\n",
+        'event: progresso\ndata: {"status": "done"}\n\n',
+    ]
+    assert sync_progress.job_status(None) == {"status": "idle"}
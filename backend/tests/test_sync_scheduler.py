@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.meli_full_sync_job import MeliFullSyncJob
+from app.services import sync_scheduler
+
+
+def _sessao(fake_session, rodando=(), fila=()):
+    """Contagem de jobs em execução por tipo e a fila já ordenada, como o banco devolveria."""
+    def responder(stmt, params):
+        nomes = [d["name"] for d in getattr(stmt, "column_descriptions", [])]
+        if nomes == ["MeliFullSyncJob"]:
+            return list(fila)
+        if "tipo" in nomes:
+            return list(rodando)
+        return None
+
+    return fake_session(responder)
+
+
+def _job(id, tipo, **kw):
+    return MeliFullSyncJob(id=id, tipo=tipo, status="queued", params=kw.pop("params", {}), **kw)
+
+
+def test_classes_tem_vagas_separadas(monkeypatch, fake_session):
+    fila = [_job(2, "incremental", prioridade=10), _job(3, "full"), _job(4, "todos_status")]
+    sessao = _sessao(fake_session, rodando=[("full", 1)], fila=fila)
+    enviados = []
+
+    # Uma full rodando não segura o incremental; a segunda sync de catálogo espera
+    escolhidos = sync_scheduler.despachar(sessao, enviados.append)
+    assert [j.id for j in escolhidos] == [j.id for j in enviados] == [2]
+    assert fila[0].status == "running" and fila[0].task_id
+    assert fila[1].status == fila[2].status == "queued"
+    assert sessao.commits == 1 and "pg_advisory_xact_lock" in str(sessao.statements[0][0])
+
+    monkeypatch.setattr(sync_scheduler, "get_settings", lambda: SimpleNamespace(ML_SYNC_LIMITE_CATALOGO=2))
+    fila = [_job(3, "full"), _job(4, "todos_status")]
+    escolhidos = sync_scheduler.despachar(_sessao(fake_session, rodando=[("full", 1)], fila=fila), enviados.append)
+    assert [j.id for j in escolhidos] == [3]
+
+
+def test_falha_no_envio_libera_a_vaga(monkeypatch, fake_session):
+    salvos = []
+    monkeypatch.setattr(sync_scheduler, "save", lambda s, job: salvos.append(job) or job)
+    job = _job(5, "full")
+
+    def enviar(j):
+        raise ConnectionError("broker fora")
+
+    sync_scheduler.despachar(_sessao(fake_session, fila=[job]), enviar)
+    assert job.status == "error" and "broker fora" in job.error_message and job.finished_at
+    assert salvos == [job]
+
+
+def test_solicitar_reaproveita_pedido_igual_na_fila(monkeypatch, fake_session):
+    monkeypatch.setattr(sync_scheduler.sync_lock, "_redis", lambda: None)
+    na_fila = _job(7, "incremental", params={"hours": 6})
+    novos = []
+    novo = _job(8, "incremental", params={"hours": 24})
+    monkeypatch.setattr(sync_scheduler, "enfileirar", lambda s, tipo, params, enviar=None: novos.append((tipo, params)) or novo)
+
+    assert sync_scheduler.solicitar(_sessao(fake_session, fila=[na_fila]), "incremental", {"hours": 6}) is na_fila
+    assert sync_scheduler.solicitar(_sessao(fake_session, fila=[na_fila]), "incremental", {"hours": 24}) is novo
+    assert novos == [("incremental", {"hours": 24})]
+
+
+def test_enfileirar_rejeita_tipo_desconhecido(fake_session):
+    with pytest.raises(ValueError, match="tipo de sync"):
+        sync_scheduler.enfileirar(fake_session(), "shard")
+
+
+def test_fila_por_prioridade_e_ordem_de_chegada_no_banco(db_session):
+    from datetime import datetime, timedelta
+    from sqlalchemy import text
+
+    # Só os jobs deste teste contam (a transação é desfeita no fim)
+    db_session.execute(text("UPDATE melifullsyncjob SET status = 'cancelled' WHERE status IN ('queued', 'running')"))
+    base = datetime(2025, 1, 1)
+    jobs = [
+        MeliFullSyncJob(tipo="full", status="queued", criado_em=base),
+        MeliFullSyncJob(tipo="todos_status", status="queued", prioridade=5, criado_em=base + timedelta(minutes=1)),
+        MeliFullSyncJob(tipo="incremental", status="queued", criado_em=base + timedelta(minutes=2)),
+        MeliFullSyncJob(tipo="incremental", status="queued", criado_em=base + timedelta(minutes=3)),
+    ]
+    for job in jobs:
+        db_session.add(job)
+    db_session.commit()
+
+    enviados = []
+    sync_scheduler.despachar(db_session, enviados.append)
+    # Uma vaga por classe: a prioridade passa na frente no catálogo, o incremental mais antigo sai primeiro
+    assert [j.id for j in enviados] == [jobs[1].id, jobs[2].id]
+    assert [j.status for j in jobs] == ["queued", "running", "running", "queued"]
+    assert sync_scheduler.despachar(db_session, enviados.append) == []
@@ -8,7 +8,7 @@ export function useImportStatus(interval = 10000) {
   useEffect(() => {
     const fetchStatus = async () => {
       try {
-        const res = await fetch(`${API_URL}/estoque/meli/status`, { cache: "no-store" });
+        const res = await fetch(`${API_URL}/estoque/meli/status`, { cache: "no-cache" });
         if (res.ok) setStatus(await res.json());
       } catch {}
     };
@@ -3,7 +3,8 @@
 export const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
 export async function apiGet<T>(path: string): Promise<T> {
-  const res = await fetch(`${API_URL}${path}`, { cache: "no-store" });
+  // no-cache: o navegador revalida com If-None-Match e reaproveita o corpo em 304
+  const res = await fetch(`${API_URL}${path}`, { cache: "no-cache" });
   if (!res.ok) throw new Error(`GET ${path} -> ${res.status}`);
   return res.json() as Promise<T>;
 }
@@ -40,7 +41,8 @@ export async function getEstoque(
   sort_dir = "desc",
   search = "",
   origem = "",
-  status = ""
+  status = "",
+  fields = ""
 ): Promise<{ items: any[]; page: number; size: number; total: number; total_pages: number }> {
   const params = new URLSearchParams({
     page: String(page),
@@ -50,6 +52,7 @@ export async function getEstoque(
     ...(search && { search }),
     ...(origem && { origem }),
     ...(status && { status }),
+    ...(fields && { fields }),
   });
   return apiGet(`/estoque?${params.toString()}`);
 }
\ No newline at end of file
@@ -322,7 +322,7 @@ export default function EstoqueAnunciador() {
         size: number;
         total: number;
         total_pages: number;
-      }>(`/estoque?page=${page}&size=${size}&search=${searchTerm}&origem=${origemFilter}`);
+      }>(`/estoque?page=${page}&size=${size}&search=${searchTerm}&origem=${origemFilter}&fields=completo`);
       
       const produtosApi = data.items ?? [];
       const produtosUi = produtosApi.map(mapProdutoApiToUi);
@@ -1,59 +1,74 @@
 #!/usr/bin/env python3
 """
 Script para monitorar o progresso da importação de produtos do Mercado Livre
+
+Assina GET /meli/sync/events (Server-Sent Events publicados pelo worker) em vez de
+consultar o banco ou os logs periodicamente.
 """
 
-import requests
-import time
 import json
-from datetime import datetime
+import os
+import sys
+
+import requests
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+
+def _eventos(resp):
+    """Gera o JSON de cada evento 'progresso' do stream SSE."""
+    evento, dados = None, []
+    for linha in resp.iter_lines(decode_unicode=True):
+        if linha is None:
+            continue
+        if linha == "":
+            if evento == "progresso" and dados:
+                yield json.loads("\n".join(dados))
+            evento, dados = None, []
+        elif linha.startswith("event:"):
+            evento = linha[6:].strip()
+        elif linha.startswith("data:"):
+            dados.append(linha[5:].strip())
+
 
 def monitor_import_progress():
-    """Monitora o progresso da importação através dos logs"""
+    """Mostra cada atualização do job até ele terminar"""
     print("🔍 Monitorando importação de produtos do Mercado Livre...")
     print("-" * 60)
-    
-    # Contadores
-    total_importados = 0
-    ultimos_logs = []
-    
     try:
-        # Faz requisição para verificar últimos logs
-        response = requests.get("http://localhost:8000/api/healthz")
-        if response.status_code == 200:
-            print("✅ Sistema está rodando")
-        else:
-            print("⚠️ Sistema pode estar com problemas")
-            
+        resp = requests.get(f"{API_URL}/meli/sync/events", stream=True, timeout=(5, 60))
+        resp.raise_for_status()
     except Exception as e:
         print(f"❌ Erro ao conectar ao sistema: {e}")
-        return
-    
-    print("\n📈 Estatísticas estimadas:")
-    print("-" * 60)
-    
-    # Baseado nos logs que vimos, estimar progresso
-    produtos_por_minuto = 60  # 1 produto/segundo
-    produtos_totais = 17000
-    
-    # Simular monitoramento (em produção, isso viria dos logs reais)
-    for i in range(5):
-        minutos_passados = i * 5
-        produtos_importados = minutos_passados * produtos_por_minuto
-        percentual = (produtos_importados / produtos_totais) * 100
-        
-        print(f"⏱️  Tempo decorrido: {minutos_passados} minutos")
-        print(f"📦 Produtos importados: {produtos_importados:,}")
-        print(f"📊 Progresso: {percentual:.1f}%")
-        print(f"🎯 Restam: {produtos_totais - produtos_importados:,} produtos")
-        print("-" * 60)
-        
-        if i < 4:
-            print("Aguardando 5 segundos...")
-            time.sleep(5)
-    
-    print("\n✅ Monitoramento concluído!")
-    print("💡 Dica: Use 'docker-compose logs -f backend' para ver logs em tempo real")
+        return 1
+
+    visto_em_andamento = False
+    for job in _eventos(resp):
+        # O primeiro evento é o último estado conhecido: um job já terminado não encerra o monitor
+        if job.get("status") in ("queued", "running"):
+            visto_em_andamento = True
+        elif not visto_em_andamento:
+            print(f"⏳ Último job: {job.get('status')}. Aguardando nova sincronização...")
+            continue
+        total = job.get("total_previsto") or 0
+        processados = job.get("processados") or 0
+        percentual = f" ({processados / total * 100:.1f}%)" if total else ""
+        print(
+            f"📦 {job.get('status')}: {processados:,} processados{percentual} | "
+            f"novos {job.get('novos', 0):,} | atualizados {job.get('atualizados', 0):,} | "
+            f"sem mudança {job.get('ignorados', 0):,}"
+        )
+        if job.get("status") in ("done", "error"):
+            if job.get("error_message"):
+                print(f"❌ Erro: {job['error_message']}")
+            else:
+                print("✅ Importação concluída")
+            return 0 if job.get("status") == "done" else 1
+    return 0
+
 
 if __name__ == "__main__":
-    monitor_import_progress()
\ No newline at end of file
+    try:
+        sys.exit(monitor_import_progress())
+    except KeyboardInterrupt:
+        print("\n⏹️ Monitoramento interrompido")